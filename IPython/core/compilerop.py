@@ -36,6 +36,7 @@
 import linecache
 import operator
 import time
+import weakref
 
 #-----------------------------------------------------------------------------
 # Constants
@@ -91,6 +92,59 @@ def __init__(self):
         # stdlib that call it outside our control go through our codepath
         # (otherwise we'd lose our tracebacks).
         linecache.checkcache = check_linecache_ipython
+
+        # Whether to evict cells from the linecache once no code object
+        # compiled from them is alive: no function defined in them, and no
+        # traceback through them.
+        self.evict_unreferenced = False
+        # The number of live code objects compiled from each cell
+        self._live_code = {}
+        # Cells whose last code object has been freed
+        self._unreferenced = set()
+        # Weak references to the code objects, kept for their callbacks. They
+        # are keyed by id: equal code objects from different cells have equal
+        # weak references, and a set would keep only one of them.
+        self._code_refs = {}
+
+    def __call__(self, source, filename, symbol):
+        codeob = codeop.Compile.__call__(self, source, filename, symbol)
+        if self.evict_unreferenced and filename in linecache._ipython_cache:
+            self._track_code(codeob, filename)
+        return codeob
+
+    def _track_code(self, code, name):
+        """Count the code object, and the code objects nested in it, as live"""
+        def freed(ref):
+            self._code_refs.pop(id(ref), None)
+            self._live_code[name] -= 1
+            if not self._live_code[name]:
+                self._unreferenced.add(name)
+
+        todo = [code]
+        while todo:
+            code = todo.pop()
+            todo.extend(c for c in code.co_consts if isinstance(c, type(code)))
+            self._live_code[name] = self._live_code.get(name, 0) + 1
+            try:
+                ref = weakref.ref(code, freed)
+                self._code_refs[id(ref)] = ref
+            except TypeError:
+                # no weak references to code objects: the cell is never evicted
+                pass
+
+    def evict_unreferenced_cells(self):
+        """Remove the cells none of whose code objects is alive from the linecache
+
+        Only cells compiled while evict_unreferenced is True are evicted.
+        """
+        while self._unreferenced:
+            name = self._unreferenced.pop()
+            if self._live_code.get(name):
+                # compiled again
+                continue
+            self._live_code.pop(name, None)
+            linecache.cache.pop(name, None)
+            linecache._ipython_cache.pop(name, None)
         
     def ast_parse(self, source, filename='<unknown>', symbol='exec'):
         """Parse code to an AST with the current compiler flags active.
@@ -127,6 +181,8 @@ def cache(self, code, number=0):
         The name of the cached code (as a string). Pass this as the filename
         argument to compilation, so that tracebacks are correctly hooked up.
         """
+        if self.evict_unreferenced:
+            self.evict_unreferenced_cells()
         name = code_name(code, number)
         entry = (len(code), time.time(),
                  [line+'\n' for line in code.splitlines()], name)
@@ -55,6 +55,7 @@
 
 import __main__
 import glob
+from bisect import bisect_left
 import inspect
 import itertools
 import keyword
@@ -205,6 +206,89 @@ def penalize_magics_key(word):
     return word
 
 
+class PrefixIndex(object):
+    """Words kept sorted, to find the ones starting with a prefix
+
+    Finding them takes O(log n) plus the number of matches, instead of
+    comparing the prefix to every word.
+    """
+
+    def __init__(self, words=()):
+        self.words = sorted(set(words))
+
+    def add(self, word):
+        words = self.words
+        i = bisect_left(words, word)
+        if i == len(words) or words[i] != word:
+            words.insert(i, word)
+
+    def remove(self, word):
+        words = self.words
+        i = bisect_left(words, word)
+        if i < len(words) and words[i] == word:
+            del words[i]
+
+    def matches(self, prefix):
+        """The words starting with prefix, sorted"""
+        words = self.words
+        start = lo = bisect_left(words, prefix)
+        hi = len(words)
+        # the words starting with prefix are contiguous: find where they end
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if words[mid].startswith(prefix):
+                lo = mid + 1
+            else:
+                hi = mid
+        return words[start:lo]
+
+
+class NamespaceIndex(object):
+    """A :class:`PrefixIndex` of the names in a namespace
+
+    The index is updated with the names added and removed since the last
+    update when the namespace changes size, when it is another namespace, or
+    after :meth:`invalidate`. Names are checked against the namespace, so
+    deleted names never match, but a name added while another one is deleted
+    is only indexed after :meth:`invalidate`.
+    """
+
+    def __init__(self):
+        self.ns = None
+        self.names = set()
+        self.index = PrefixIndex()
+        self._size = None
+
+    def invalidate(self):
+        self._size = None
+
+    def matches(self, ns, prefix):
+        """The names in ns starting with prefix, sorted"""
+        if ns is not self.ns or len(ns) != self._size:
+            self.update(ns)
+        return [ name for name in self.index.matches(prefix) if name in ns ]
+
+    def update(self, ns):
+        names = set(k for k in ns if isinstance(k, string_types))
+        added = names - self.names
+        removed = self.names - names
+        if ns is not self.ns or len(added) + len(removed) > len(names) // 4:
+            self.index = PrefixIndex(names)
+        else:
+            for name in removed:
+                self.index.remove(name)
+            for name in added:
+                self.index.add(name)
+        self.ns = ns
+        self.names = names
+        self._size = len(ns)
+
+
+# Vocabularies which don't change
+_keyword_index = PrefixIndex(keyword.kwlist)
+_latex_index = PrefixIndex(latex_symbols)
+
+
 @undoc
 class Bunch(object): pass
 
@@ -309,6 +393,10 @@ def __init__(self, namespace=None, global_namespace=None, **kwargs):
         else:
             self.global_namespace = global_namespace
 
+        self._builtins_index = NamespaceIndex()
+        self._namespace_index = NamespaceIndex()
+        self._global_namespace_index = NamespaceIndex()
+
         super(Completer, self).__init__(**kwargs)
 
     def complete(self, text, state):
@@ -339,17 +427,24 @@ def global_matches(self, text):
 
         """
         #print 'Completer->global_matches, txt=%r' % text # dbg
-        matches = []
-        match_append = matches.append
-        n = len(text)
-        for lst in [keyword.kwlist,
-                    builtin_mod.__dict__.keys(),
-                    self.namespace.keys(),
-                    self.global_namespace.keys()]:
-            for word in lst:
-                if word[:n] == text and word != "__builtins__":
-                    match_append(word)
-        return matches
+        matches = _keyword_index.matches(text)
+        for index, ns in [(self._builtins_index, builtin_mod.__dict__),
+                          (self._namespace_index, self.namespace),
+                          (self._global_namespace_index, self.global_namespace)]:
+            matches.extend(index.matches(ns, text))
+        return [ word for word in matches if word != "__builtins__" ]
+
+    def namespace_changed(self):
+        """Tell the completer that names may have been added to or removed
+        from its namespaces, e.g. after executing code.
+
+        Names added or removed are found anyway when the size of a namespace
+        changes, so this is only needed for completing names added while
+        others were removed.
+        """
+        for index in [self._builtins_index, self._namespace_index,
+                      self._global_namespace_index]:
+            index.invalidate()
 
     def attr_matches(self, text):
         """Compute matches when text contains a dot.
@@ -581,6 +676,9 @@ def __init__(self, shell=None, namespace=None, global_namespace=None,
         #use this if positional argument name is also needed
         #= re.compile(r'[\s|\[]*(\w+)(?:\s*=?\s*.*)')
 
+        self._line_magics_index = NamespaceIndex()
+        self._cell_magics_index = NamespaceIndex()
+
         # All active matcher routines for completion
         self.matchers = [self.python_matches,
                          self.file_matches,
@@ -692,8 +790,8 @@ def magic_matches(self, text):
         # Get all shell magics now rather than statically, so magics loaded at
         # runtime show up too.
         lsm = self.shell.magics_manager.lsmagic()
-        line_magics = lsm['line']
-        cell_magics = lsm['cell']
+        line_magics = self._line_magics_index
+        cell_magics = self._cell_magics_index
         pre = self.magic_escape
         pre2 = pre+pre
         
@@ -703,9 +801,9 @@ def magic_matches(self, text):
         # - no prefix: do both
         # In other words, line magics are skipped if the user gives %% explicitly
         bare_text = text.lstrip(pre)
-        comp = [ pre2+m for m in cell_magics if m.startswith(bare_text)]
+        comp = [ pre2+m for m in cell_magics.matches(lsm['cell'], bare_text)]
         if not text.startswith(pre2):
-            comp += [ pre+m for m in line_magics if m.startswith(bare_text)]
+            comp += [ pre+m for m in line_magics.matches(lsm['line'], bare_text)]
         return comp
 
     def python_matches(self,text):
@@ -971,7 +1069,7 @@ def latex_matches(self, text):
             else:
                 # If a user has partially typed a latex symbol, give them
                 # a full list of options \al -> [\aleph, \alpha]
-                matches = [k for k in latex_symbols if k.startswith(s)]
+                matches = _latex_index.matches(s)
                 return s, matches
         return u'', []
 
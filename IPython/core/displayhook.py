@@ -9,19 +9,35 @@
 
 from __future__ import print_function
 
+import numbers
 import sys
+from collections import OrderedDict
 
 from IPython.core.formatters import _safe_get_formatter_method
 from IPython.config.configurable import Configurable
 from IPython.utils import io
 from IPython.utils.py3compat import builtin_mod
-from IPython.utils.traitlets import Instance
+from IPython.utils.traitlets import Instance, Integer
 from IPython.utils.warn import warn
 
 # TODO: Move the various attributes (cache_size, [others now moved]). Some
 # of these are also attributes of InteractiveShell. They should be on ONE object
 # only and the other objects should ask that one object for their values.
 
+def _sizeof(obj):
+    """The approximate size of an object in bytes
+
+    The ``nbytes`` of arrays, or the shallow size of other objects.
+    """
+    nbytes = getattr(obj, 'nbytes', None)
+    if isinstance(nbytes, numbers.Integral):
+        return nbytes
+    try:
+        return sys.getsizeof(obj)
+    except TypeError:
+        return 0
+
+
 class DisplayHook(Configurable):
     """The custom IPython displayhook to replace sys.displayhook.
 
@@ -31,6 +47,16 @@ class DisplayHook(Configurable):
 
     shell = Instance('IPython.core.interactiveshell.InteractiveShellABC')
 
+    cache_bytes = Integer(0, config=True,
+        help="""The maximum total size, in bytes, of the outputs kept in Out.
+
+        The oldest outputs, and their ``_<n>`` variables, are dropped first, so
+        that large results don't stay alive forever. Sizes are approximate: the
+        ``nbytes`` of arrays, or the shallow size of other objects.
+        0 doesn't limit the size.
+        """
+    )
+
     def __init__(self, shell=None, cache_size=1000, **kwargs):
         super(DisplayHook, self).__init__(shell=shell, **kwargs)
 
@@ -47,6 +73,9 @@ def __init__(self, shell=None, cache_size=1000, **kwargs):
             self.do_full_cache = 1
 
         self.cache_size = cache_size
+        # the approximate size of the outputs in Out, by prompt number, oldest first
+        self._output_sizes = OrderedDict()
+        self._output_bytes = 0
 
         # we need a reference to the user-level namespace
         self.shell = shell
@@ -203,6 +232,20 @@ def update_user_ns(self, result):
                 to_main[new_result] = result
                 self.shell.push(to_main, interactive=False)
                 self.shell.user_ns['_oh'][self.prompt_count] = result
+                if self.cache_bytes:
+                    self._limit_cache_bytes(self.prompt_count, result)
+
+    def _limit_cache_bytes(self, n, result):
+        """Drop the oldest outputs beyond cache_bytes, keeping the last one"""
+        size = _sizeof(result)
+        self._output_bytes += size - self._output_sizes.pop(n, 0)
+        self._output_sizes[n] = size
+        oh = self.shell.user_ns['_oh']
+        while self._output_bytes > self.cache_bytes and len(self._output_sizes) > 1:
+            old, old_size = self._output_sizes.popitem(last=False)
+            self._output_bytes -= old_size
+            oh.pop(old, None)
+            self.shell.user_ns.pop('_%i' % old, None)
 
     def log_output(self, format_dict):
         """Log the output."""
@@ -259,6 +302,8 @@ def flush(self):
         oh = self.shell.user_ns.get('_oh', None)
         if oh is not None:
             oh.clear()
+        self._output_sizes.clear()
+        self._output_bytes = 0
 
         # Release our own references to objects:
         self._, self.__, self.___ = '', '', ''
@@ -17,6 +17,7 @@
 import datetime
 import os
 import re
+import time
 try:
     import sqlite3
 except ImportError:
@@ -33,7 +34,7 @@
 from IPython.utils.path import locate_profile
 from IPython.utils import py3compat
 from IPython.utils.traitlets import (
-    Any, Bool, Dict, Instance, Integer, List, Unicode, TraitError,
+    Any, Bool, Dict, Float, Instance, Integer, List, Unicode, TraitError,
 )
 from IPython.utils.warn import warn
 
@@ -75,15 +76,24 @@ def needs_sqlite(f, self, *a, **kw):
     class DatabaseError(Exception):
         "Dummy exception when sqlite could not be imported. Should never occur."
 
+def _is_locked(e):
+    """Whether an SQLite error is due to another connection locking the database"""
+    msg = str(e).lower()
+    return 'locked' in msg or 'busy' in msg
+
 @decorator
 def catch_corrupt_db(f, self, *a, **kw):
     """A decorator which wraps HistoryAccessor method calls to catch errors from
     a corrupt SQLite database, move the old database out of the way, and create
     a new one.
+
+    A database locked by another process isn't corrupt: that error is raised.
     """
     try:
         return f(self, *a, **kw)
-    except DatabaseError:
+    except DatabaseError as e:
+        if _is_locked(e):
+            raise
         if os.path.isfile(self.hist_file):
             # Try to move the file out of the way
             base,ext = os.path.splitext(self.hist_file)
@@ -140,6 +150,44 @@ class HistoryAccessor(Configurable):
         """
     )
 
+    search_index = Bool(True, config=True,
+        help="""Index the history database for searching.
+
+        Adds indexes of the source of inputs, used by searches for patterns
+        starting with text, and, if SQLite has FTS5 with the trigram tokenizer
+        (SQLite >= 3.34), a full-text index used by searches for patterns
+        starting with a wildcard. Existing databases are indexed in place.
+        Searches have the same glob semantics with or without indexes.
+        """
+    )
+    # Whether the database has a full-text index
+    _fts = Bool(False)
+    # The number of rows indexed per transaction when updating the full-text index
+    _fts_batch = 10000
+
+    journal_mode = Unicode(u'', config=True,
+        help="""The SQLite journal mode of the history database, e.g. 'WAL'.
+
+        In WAL mode, reading the history doesn't block writing it and vice
+        versa, which helps when many kernels share one history database.
+        WAL doesn't work on network filesystems. The mode is stored in the
+        database, so it applies to all connections once set.
+        By default, the mode of the database is left unchanged.
+        """
+    )
+
+    write_retries = Integer(5, config=True,
+        help="""The number of times to retry writing to the history database
+        while it is locked by other processes, after the connection's timeout.
+        """
+    )
+
+    retry_delay = Float(0.1, config=True,
+        help="""The delay in seconds before retrying to write to a locked
+        history database, doubled after each retry.
+        """
+    )
+
     # The SQLite database
     db = Any()
     def _db_changed(self, name, old, new):
@@ -207,6 +255,12 @@ def init_db(self):
         kwargs = dict(detect_types=sqlite3.PARSE_DECLTYPES|sqlite3.PARSE_COLNAMES)
         kwargs.update(self.connection_options)
         self.db = sqlite3.connect(self.hist_file, **kwargs)
+        self._retry_locked(self._init_tables)
+        if self.search_index:
+            self._init_search_index()
+
+    def _init_tables(self):
+        self.configure_connection(self.db)
         self.db.execute("""CREATE TABLE IF NOT EXISTS sessions (session integer
                         primary key autoincrement, start timestamp,
                         end timestamp, num_cmds integer, remark text)""")
@@ -220,6 +274,92 @@ def init_db(self):
                         PRIMARY KEY (session, line))""")
         self.db.commit()
 
+    def configure_connection(self, conn):
+        """Set the journal mode of a connection to the database"""
+        if not self.journal_mode:
+            return
+        conn.execute("PRAGMA journal_mode=%s" % self.journal_mode)
+        if self.journal_mode.lower() == 'wal':
+            # durable at checkpoints, which is enough for history
+            conn.execute("PRAGMA synchronous=NORMAL")
+
+    def _retry_locked(self, f, *args):
+        """Call f(*args), retrying while the database is locked by other processes
+
+        Waits retry_delay before the first retry, doubling it after each one.
+        """
+        delay = self.retry_delay
+        for i in range(self.write_retries):
+            try:
+                return f(*args)
+            except sqlite3.OperationalError as e:
+                if not _is_locked(e):
+                    raise
+            time.sleep(delay)
+            delay *= 2
+        return f(*args)
+
+    def _init_search_index(self):
+        """Create the search indexes, if they don't exist
+
+        The full-text index is filled by :meth:`update_search_index`.
+        """
+        try:
+            with self.db:
+                self.db.execute("CREATE INDEX IF NOT EXISTS history_source_raw "
+                                "ON history (source_raw)")
+                self.db.execute("CREATE INDEX IF NOT EXISTS history_source "
+                                "ON history (source)")
+        except sqlite3.OperationalError as e:
+            # e.g. a read-only database
+            warn("Couldn't index the history for searching: %s" % e)
+            return
+        try:
+            with self.db:
+                # indexes the history table, whose rows have to be added
+                # with update_search_index
+                self.db.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS history_fts
+                        USING fts5(source, source_raw, content='history',
+                        tokenize='trigram case_sensitive 1')""")
+                # the rowid of the last row of history in history_fts
+                self.db.execute("""CREATE TABLE IF NOT EXISTS history_fts_state
+                        (last_rowid integer)""")
+                if self.db.execute("SELECT * FROM history_fts_state").fetchone() is None:
+                    self.db.execute("INSERT INTO history_fts_state VALUES (0)")
+        except sqlite3.OperationalError:
+            # no FTS5, or no trigram tokenizer
+            self._fts = False
+        else:
+            self._fts = True
+
+    def update_search_index(self, conn=None):
+        """Add the rows of history written since the last update to the full-text index
+
+        Called by the history saving thread, after writing the history,
+        so rows written by other processes are indexed too.
+        """
+        if not self._fts:
+            return
+        if conn is None:
+            conn = self.db
+        while True:
+            try:
+                with conn:
+                    # lock out other processes updating the index
+                    conn.execute("BEGIN IMMEDIATE")
+                    last, = conn.execute("SELECT last_rowid FROM history_fts_state").fetchone()
+                    stop, = conn.execute("SELECT max(rowid) FROM history").fetchone()
+                    if stop is None or stop <= last:
+                        return
+                    stop = min(stop, last + self._fts_batch)
+                    conn.execute("""INSERT INTO history_fts (rowid, source, source_raw)
+                            SELECT rowid, source, source_raw FROM history
+                            WHERE rowid > ? AND rowid <= ?""", (last, stop))
+                    conn.execute("UPDATE history_fts_state SET last_rowid=?", (stop,))
+            except sqlite3.OperationalError:
+                # the database is locked: the next update will catch up
+                return
+
     def writeout_cache(self):
         """Overridden by HistoryManager to dump the cache before certain
         database lookups."""
@@ -345,12 +485,21 @@ def search(self, pattern="*", raw=True, search_raw=True,
         -------
         Tuples as :meth:`get_range`
         """
-        tosearch = "source_raw" if search_raw else "source"
-        if output:
-            tosearch = "history." + tosearch
+        column = "source_raw" if search_raw else "source"
+        tosearch = "history." + column if output else column
         self.writeout_cache()
         sqlform = "WHERE %s GLOB ?" % tosearch
         params = (pattern,)
+        if self._fts and pattern[:1] in ('*', '?', '['):
+            # Patterns starting with text use the index of the column;
+            # the others are matched in the full-text index, and in the rows
+            # not indexed yet.
+            sqlform += (" AND history.rowid IN ("
+                "SELECT rowid FROM history_fts WHERE history_fts.{0} GLOB ? "
+                "UNION ALL SELECT rowid FROM history "
+                "WHERE rowid > (SELECT last_rowid FROM history_fts_state))"
+            ).format(column)
+            params += (pattern,)
         if unique:
             sqlform += ' GROUP BY {0}'.format(tosearch)
         if n is not None:
@@ -430,7 +579,8 @@ class HistoryManager(HistoryAccessor):
     # An instance of the IPython shell we are attached to
     shell = Instance('IPython.core.interactiveshell.InteractiveShellABC')
     # Lists to hold processed and raw history. These start with a blank entry
-    # so that we can index them starting from 1
+    # so that we can index them starting from 1. Inputs spilled to the
+    # database (see input_hist_length) are None.
     input_hist_parsed = List([""])
     input_hist_raw = List([""])
     # A list of directories visited during session
@@ -457,6 +607,18 @@ def _dir_hist_default(self):
         help="Write to database every x commands (higher values save disk access & power).\n"
         "Values of 1 or less effectively disable caching."
     )
+    input_hist_length = Integer(0, config=True,
+        help="""The number of inputs of the current session kept in memory.
+
+        Older inputs, their text outputs and their ``_i<n>`` variables are
+        dropped from memory, and read back from the history database when
+        needed, so that long-running sessions don't grow without limit.
+        In[n] is None for dropped inputs. 0 keeps every input in memory.
+        """
+    )
+    # The index of the first input not spilled yet
+    _spilled = Integer(1)
+
     # The input and output caches
     db_input_cache = List()
     db_output_cache = List()
@@ -491,6 +653,8 @@ def __init__(self, shell=None, config=None, **traits):
         self.save_flag = threading.Event()
         self.db_input_cache_lock = threading.Lock()
         self.db_output_cache_lock = threading.Lock()
+        # Serializes writers, without blocking store_inputs and store_output
+        self.db_write_lock = threading.Lock()
         if self.enabled and self.hist_file != ':memory:':
             self.save_thread = HistorySavingThread(self)
             self.save_thread.start()
@@ -510,19 +674,23 @@ def new_session(self, conn=None):
         """Get a new session number."""
         if conn is None:
             conn = self.db
-        
-        with conn:
-            cur = conn.execute("""INSERT INTO sessions VALUES (NULL, ?, NULL,
-                            NULL, "") """, (datetime.datetime.now(),))
-            self.session_number = cur.lastrowid
-            
+
+        def insert():
+            with conn:
+                cur = conn.execute("""INSERT INTO sessions VALUES (NULL, ?, NULL,
+                                NULL, "") """, (datetime.datetime.now(),))
+                return cur.lastrowid
+        self.session_number = self._retry_locked(insert)
+
     def end_session(self):
         """Close the database session, filling in the end time and line count."""
         self.writeout_cache()
-        with self.db:
-            self.db.execute("""UPDATE sessions SET end=?, num_cmds=? WHERE
-                            session==?""", (datetime.datetime.now(),
-                            len(self.input_hist_parsed)-1, self.session_number))
+        def update():
+            with self.db:
+                self.db.execute("""UPDATE sessions SET end=?, num_cmds=? WHERE
+                                session==?""", (datetime.datetime.now(),
+                                len(self.input_hist_parsed)-1, self.session_number))
+        self._retry_locked(update)
         self.session_number = 0
                             
     def name_session(self, name):
@@ -543,6 +711,7 @@ def reset(self, new_session=True):
                 self.end_session()
             self.input_hist_parsed[:] = [""]
             self.input_hist_raw[:] = [""]
+            self._spilled = 1
             self.new_session()
     
     # ------------------------------
@@ -590,12 +759,27 @@ def _get_range_session(self, start=1, stop=None, raw=True, output=False):
         elif stop < 0:
             stop += n
         
+        spilled = {}
+        if start < self._spilled:
+            spilled = self._get_spilled(start, min(stop, self._spilled), raw, output)
         for i in range(start, stop):
-            if output:
+            if input_hist[i] is None:
+                line = spilled.get(i, (None, None) if output else None)
+            elif output:
                 line = (input_hist[i], self.output_hist_reprs.get(i))
             else:
                 line = input_hist[i]
             yield (0, i, line)
+
+    def _get_spilled(self, start, stop, raw, output):
+        """Read inputs of the current session dropped from memory from the database
+
+        Returns a dict of lines by line number.
+        """
+        self.writeout_cache()
+        rows = super(HistoryManager, self).get_range(self.session_number,
+                                                     start, stop, raw, output)
+        return dict((line, entry) for _, line, entry in rows)
     
     def get_range(self, session=0, start=1, stop=None, raw=True,output=False):
         """Retrieve input by session.
@@ -662,6 +846,8 @@ def store_inputs(self, line_num, source, source_raw=None):
 
         self.input_hist_parsed.append(source)
         self.input_hist_raw.append(source_raw)
+        if self.input_hist_length:
+            self._spill_inputs()
 
         with self.db_input_cache_lock:
             self.db_input_cache.append((line_num, source, source_raw))
@@ -685,6 +871,20 @@ def store_inputs(self, line_num, source, source_raw=None):
         if self.shell is not None:
             self.shell.push(to_main, interactive=False)
 
+    def _spill_inputs(self):
+        """Drop the inputs beyond input_hist_length from memory
+
+        They are in the database, or in the input cache written to it.
+        """
+        stop = len(self.input_hist_parsed) - self.input_hist_length
+        user_ns = self.shell.user_ns if self.shell is not None else {}
+        for i in range(self._spilled, stop):
+            self.input_hist_parsed[i] = None
+            self.input_hist_raw[i] = None
+            self.output_hist_reprs.pop(i, None)
+            user_ns.pop('_i%i' % i, None)
+        self._spilled = max(self._spilled, stop)
+
     def store_output(self, line_num):
         """If database output logging is enabled, this saves all the
         outputs from the indicated prompt number to the database. It's
@@ -704,49 +904,74 @@ def store_output(self, line_num):
         if self.db_cache_size <= 1:
             self.save_flag.set()
 
-    def _writeout_input_cache(self, conn):
+    def _writeout_input_cache(self, conn, inputs):
         with conn:
-            for line in self.db_input_cache:
-                conn.execute("INSERT INTO history VALUES (?, ?, ?, ?)",
-                                (self.session_number,)+line)
+            conn.executemany("INSERT INTO history VALUES (?, ?, ?, ?)",
+                [ (self.session_number,)+line for line in inputs ])
+        if inputs:
+            self.update_search_index(conn)
 
-    def _writeout_output_cache(self, conn):
+    def _writeout_output_cache(self, conn, outputs):
         with conn:
-            for line in self.db_output_cache:
-                conn.execute("INSERT INTO output_history VALUES (?, ?, ?)",
-                                (self.session_number,)+line)
+            conn.executemany("INSERT INTO output_history VALUES (?, ?, ?)",
+                [ (self.session_number,)+line for line in outputs ])
 
     @needs_sqlite
     def writeout_cache(self, conn=None):
-        """Write any entries in the cache to the database."""
+        """Write any entries in the cache to the database.
+
+        The caches are taken under their locks, and written without holding
+        them, so that retrying while the database is locked doesn't block
+        :meth:`store_inputs` and :meth:`store_output`. Entries which can't
+        be written because the database is still locked are put back in
+        the caches, to be written with the next ones. Writers are serialized,
+        so that when this returns, the entries taken by a concurrent writer
+        have been written too.
+        """
         if conn is None:
             conn = self.db
 
+        with self.db_write_lock:
+            self._writeout_caches(conn)
+
+    def _writeout_caches(self, conn):
         with self.db_input_cache_lock:
+            inputs = self.db_input_cache
+            self.db_input_cache = []
+        try:
+            self._retry_locked(self._writeout_input_cache, conn, inputs)
+        except sqlite3.IntegrityError:
+            self.new_session(conn)
+            print("ERROR! Session/line number was not unique in",
+                  "database. History logging moved to new session",
+                                            self.session_number)
             try:
-                self._writeout_input_cache(conn)
+                # Try writing to the new session. If this fails, don't
+                # recurse
+                self._retry_locked(self._writeout_input_cache, conn, inputs)
             except sqlite3.IntegrityError:
-                self.new_session(conn)
-                print("ERROR! Session/line number was not unique in",
-                      "database. History logging moved to new session",
-                                                self.session_number)
-                try:
-                    # Try writing to the new session. If this fails, don't
-                    # recurse
-                    self._writeout_input_cache(conn)
-                except sqlite3.IntegrityError:
-                    pass
-            finally:
-                self.db_input_cache = []
+                pass
+        except sqlite3.OperationalError as e:
+            if not _is_locked(e):
+                raise
+            # still locked: write the inputs with the next ones
+            with self.db_input_cache_lock:
+                self.db_input_cache[:0] = inputs
+            warn("The history database is locked, history will be written later.")
 
         with self.db_output_cache_lock:
-            try:
-                self._writeout_output_cache(conn)
-            except sqlite3.IntegrityError:
-                print("!! Session/line number for output was not unique",
-                      "in database. Output will not be stored.")
-            finally:
-                self.db_output_cache = []
+            outputs = self.db_output_cache
+            self.db_output_cache = []
+        try:
+            self._retry_locked(self._writeout_output_cache, conn, outputs)
+        except sqlite3.IntegrityError:
+            print("!! Session/line number for output was not unique",
+                  "in database. Output will not be stored.")
+        except sqlite3.OperationalError as e:
+            if not _is_locked(e):
+                raise
+            with self.db_output_cache_lock:
+                self.db_output_cache[:0] = outputs
 
 
 class HistorySavingThread(threading.Thread):
@@ -772,6 +997,11 @@ def run(self):
             self.db = sqlite3.connect(self.history_manager.hist_file,
                             **self.history_manager.connection_options
             )
+            self.history_manager._retry_locked(
+                self.history_manager.configure_connection, self.db)
+            # index the rows written before, e.g. by other processes,
+            # or before the database had a full-text index
+            self.history_manager.update_search_index(self.db)
             while True:
                 self.history_manager.save_flag.wait()
                 if self.stop_now:
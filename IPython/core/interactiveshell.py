@@ -249,6 +249,17 @@ class InteractiveShell(SingletonConfigurable):
         time re-flushing a too small cache than working
         """
     )
+    evict_unreferenced_cells = CBool(False, config=True, help=
+        """
+        Drop the source of executed cells from memory once no function defined
+        in them and no traceback through them is alive. Their source is kept
+        for tracebacks otherwise, so memory grows with every cell executed.
+        """
+    )
+    def _evict_unreferenced_cells_changed(self, name, old, new):
+        if hasattr(self, 'compile'):
+            self.compile.evict_unreferenced = new
+
     color_info = CBool(True, config=True, help=
         """
         Use colors for displaying information about objects. Because this
@@ -576,6 +587,7 @@ def init_instance_attrs(self):
 
         # command compiler
         self.compile = CachingCompiler()
+        self.compile.evict_unreferenced = self.evict_unreferenced_cells
 
         # Make an empty namespace, which extension writers can rely on both
         # existing and NEVER being used by ipython itself.  This gives them a
@@ -2044,6 +2056,8 @@ def init_completer(self):
                                      parent=self,
                                      )
         self.configurables.append(self.Completer)
+        # executed code can add and remove names at the same time
+        self.events.register('post_execute', self.Completer.namespace_changed)
 
         # Add custom completers to the basic ones built into IPCompleter
         sdisp = self.strdispatchers.get('complete_command', StrDispatch())
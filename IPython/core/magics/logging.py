@@ -127,10 +127,10 @@ def logstart(self, parameter_s=''):
                 # lost those already (no time machine here).
                 logger.timestamp = False
 
-            if log_raw_input:
-                input_hist = self.shell.history_manager.input_hist_raw
-            else:
-                input_hist = self.shell.history_manager.input_hist_parsed
+            # inputs dropped from memory are read back from the database
+            hm = self.shell.history_manager
+            input_hist = [u''] + [ source or u'' for _, _, source
+                                   in hm.get_range(raw=log_raw_input) ]
 
             if log_output:
                 log_write = logger.log_write
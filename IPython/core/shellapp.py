@@ -105,6 +105,17 @@
 nosep_config.InteractiveShell.separate_out2 = ''
 
 shell_flags['nosep']=(nosep_config, "Eliminate all spacing between prompts.")
+
+bounded_memory_config = Config()
+bounded_memory_config.InteractiveShell.evict_unreferenced_cells = True
+bounded_memory_config.HistoryManager.input_hist_length = 1000
+bounded_memory_config.DisplayHook.cache_bytes = 100 * 1024 * 1024
+
+shell_flags['bounded-memory'] = (bounded_memory_config,
+    """Bound the memory used by long-running sessions: drop the source of cells
+    no longer referenced, keep the last 1000 inputs in memory (older ones stay
+    in the history database), and at most 100 MB of outputs in Out."""
+)
 shell_flags['pylab'] = (
     {'InteractiveShellApp' : {'pylab' : 'auto'}},
     """Pre-load matplotlib and numpy for interactive use with
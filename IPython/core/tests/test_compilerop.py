@@ -15,6 +15,7 @@
 from __future__ import print_function
 
 # Stdlib imports
+import gc
 import linecache
 import sys
 
@@ -73,3 +74,40 @@ def test_compiler_check_cache():
             break
     else:
         raise AssertionError('Entry for input-99 missing from linecache')
+
+def test_evict_unreferenced():
+    """Cells are evicted from the linecache once their code objects are freed
+    """
+    cp = compilerop.CachingCompiler()
+    cp.evict_unreferenced = True
+    ns = {}
+    name1 = cp.cache('def f(): pass', 101)
+    exec(cp('def f(): pass', name1, 'exec'), ns)
+    name2 = cp.cache('x = 1', 102)
+    exec(cp('x = 1', name2, 'exec'), ns)
+    # cell 1 is kept: f is alive
+    cp.cache('y = 2', 103)
+    nt.assert_in(name1, linecache._ipython_cache)
+    nt.assert_not_in(name2, linecache._ipython_cache)
+    nt.assert_not_in(name2, linecache.cache)
+    del ns['f']
+    cp.cache('z = 3', 104)
+    nt.assert_not_in(name1, linecache._ipython_cache)
+
+def test_evict_rerun_cell():
+    """Cells re-running the same code are evicted once their code is freed
+    """
+    cp = compilerop.CachingCompiler()
+    cp.evict_unreferenced = True
+    ns = {}
+    names = []
+    for n in range(111, 116):
+        name = cp.cache('def f(): return 1', n)
+        exec(cp('def f(): return 1', name, 'exec'), ns)
+        names.append(name)
+    del ns['f']
+    gc.collect()
+    cp.cache('z = 3', 116)
+    for name in names:
+        nt.assert_not_in(name, linecache._ipython_cache)
+    nt.assert_equal(cp._code_refs, {})
@@ -148,6 +148,51 @@ def test_latex_completions():
     nt.assert_in('\\aleph', matches)
 
 
+def test_prefix_index():
+    index = completer.PrefixIndex(['beta', 'alpha', 'alphabet', 'al'])
+    nt.assert_equal(index.matches('al'), ['al', 'alpha', 'alphabet'])
+    nt.assert_equal(index.matches('alpha'), ['alpha', 'alphabet'])
+    nt.assert_equal(index.matches('gamma'), [])
+    nt.assert_equal(index.matches(''), ['al', 'alpha', 'alphabet', 'beta'])
+    index.add('alp')
+    index.add('alp')
+    index.remove('alpha')
+    index.remove('delta')
+    nt.assert_equal(index.matches('al'), ['al', 'alp', 'alphabet'])
+
+
+def test_namespace_index():
+    index = completer.NamespaceIndex()
+    ns = dict(('x%i' % i, i) for i in range(100))
+    nt.assert_equal(index.matches(ns, 'x1'), ['x1'] + ['x1%i' % i for i in range(10)])
+    # updated incrementally when the size changes
+    ns['x1a'] = 1
+    del ns['x10']
+    del ns['x11']
+    nt.assert_equal(index.matches(ns, 'x1'), ['x1'] + ['x1%i' % i for i in range(2, 10)] + ['x1a'])
+    # deleted names never match
+    del ns['x12']
+    ns['x1b'] = 1
+    nt.assert_not_in('x12', index.matches(ns, 'x1'))
+    # added names with the same size are indexed after invalidate
+    index.invalidate()
+    nt.assert_in('x1b', index.matches(ns, 'x1'))
+    # non-string keys are ignored
+    ns[1] = 1
+    nt.assert_in('x1b', index.matches(ns, 'x1'))
+
+
+def test_namespace_changes_completed():
+    ip = get_ipython()
+    ip.run_cell(u'zzcompleted_a = 1')
+    _, matches = ip.complete(u'zzcompleted')
+    nt.assert_equal(matches, [u'zzcompleted_a'])
+    ip.run_cell(u'del zzcompleted_a; zzcompleted_b = 1')
+    _, matches = ip.complete(u'zzcompleted')
+    nt.assert_equal(matches, [u'zzcompleted_b'])
+    ip.run_cell(u'del zzcompleted_b')
+
+
 class CompletionSplitterTestCase(unittest.TestCase):
     def setUp(self):
         self.sp = completer.CompletionSplitter()
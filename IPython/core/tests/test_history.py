@@ -8,8 +8,11 @@
 # stdlib
 import io
 import os
+import sqlite3
 import sys
 import tempfile
+import threading
+import time
 from datetime import datetime
 
 # third party
@@ -18,7 +21,7 @@
 # our own packages
 from IPython.config.loader import Config
 from IPython.utils.tempdir import TemporaryDirectory
-from IPython.core.history import HistoryManager, extract_hist_ranges
+from IPython.core.history import HistoryAccessor, HistoryManager, extract_hist_ranges
 from IPython.utils import py3compat
 
 def setUp():
@@ -143,6 +146,179 @@ def test_history():
             ip.history_manager = hist_manager_ori
 
 
+def test_input_hist_length():
+    ip = get_ipython()
+    with TemporaryDirectory() as tmpdir:
+        hist_manager_ori = ip.history_manager
+        hist_file = os.path.join(tmpdir, 'history.sqlite')
+        try:
+            ip.history_manager = hm = HistoryManager(shell=ip, hist_file=hist_file,
+                                                     input_hist_length=2)
+            hist = [u'a=1', u'b=2', u'c=3', u'd=4']
+            for i, h in enumerate(hist, start=1):
+                hm.store_inputs(i, h)
+            # only the last two inputs are in memory
+            nt.assert_equal(hm.input_hist_raw, ['', None, None, u'c=3', u'd=4'])
+            nt.assert_not_in('_i1', ip.user_ns)
+            nt.assert_equal(ip.user_ns['_i3'], u'c=3')
+            # the others are read from the database
+            grs = hm._get_range_session
+            nt.assert_equal(list(grs()), list(zip([0]*4, [1,2,3,4], hist)))
+            nt.assert_equal(list(grs(start=2, stop=4)), [(0, 2, u'b=2'), (0, 3, u'c=3')])
+            nt.assert_equal(list(grs(output=True))[0], (0, 1, (u'a=1', None)))
+        finally:
+            # Ensure saving thread is shut down before we try to clean up the files
+            hm.save_thread.stop()
+            hm.db.close()
+            ip.history_manager = hist_manager_ori
+
+def test_search_index():
+    with TemporaryDirectory() as tmpdir:
+        hist_file = os.path.join(tmpdir, 'history.sqlite')
+        # a database from before the search indexes
+        noindex = HistoryAccessor(hist_file=hist_file, search_index=False)
+        with noindex.db:
+            noindex.db.executemany("INSERT INTO history VALUES (1, ?, ?, ?)",
+                [(1, u'a=1', u'a=1'), (2, u'b=a*2', u'b=a*2'), (3, u'print(b)', u'print(b)')])
+        try:
+            hist = HistoryAccessor(hist_file=hist_file)
+            patterns = [u'*', u'*=*', u'b*', u'*print*', u'*a?2', u'[ab]=*']
+            def searches(accessor):
+                return [ list(accessor.search(p)) for p in patterns ]
+            expected = searches(noindex)
+            # found before and after the rows are added to the full-text index
+            nt.assert_equal(searches(hist), expected)
+            hist.update_search_index()
+            nt.assert_equal(searches(hist), expected)
+            nt.assert_equal(list(hist.search(u'*print*')), [(1, 3, u'print(b)')])
+            if hist._fts:
+                last, = hist.db.execute("SELECT last_rowid FROM history_fts_state").fetchone()
+                nt.assert_equal(last, 3)
+        finally:
+            noindex.db.close()
+            hist.db.close()
+
+def test_wal_journal_mode():
+    with TemporaryDirectory() as tmpdir:
+        hist_file = os.path.join(tmpdir, 'history.sqlite')
+        hist = HistoryAccessor(hist_file=hist_file, journal_mode=u'WAL')
+        try:
+            mode, = hist.db.execute("PRAGMA journal_mode").fetchone()
+            nt.assert_equal(mode, 'wal')
+        finally:
+            hist.db.close()
+
+def test_retry_locked():
+    hist = HistoryAccessor(hist_file=':memory:', retry_delay=0)
+    calls = []
+    def locked_twice():
+        calls.append(1)
+        if len(calls) <= 2:
+            raise sqlite3.OperationalError("database is locked")
+        return 'written'
+    nt.assert_equal(hist._retry_locked(locked_twice), 'written')
+    nt.assert_equal(len(calls), 3)
+    # other errors aren't retried
+    def fails():
+        calls.append(1)
+        raise sqlite3.OperationalError("no such table: spam")
+    del calls[:]
+    with nt.assert_raises(sqlite3.OperationalError):
+        hist._retry_locked(fails)
+    nt.assert_equal(len(calls), 1)
+
+def test_writeout_locked():
+    ip = get_ipython()
+    with TemporaryDirectory() as tmpdir:
+        hist_file = os.path.join(tmpdir, 'history.sqlite')
+        hm = HistoryManager(shell=ip, hist_file=hist_file, write_retries=1,
+                            retry_delay=0, connection_options={'timeout': 0.01})
+        other = sqlite3.connect(hist_file)
+        try:
+            hm.store_inputs(1, u'a=1')
+            hm.store_inputs(2, u'b=2')
+            other.execute("BEGIN EXCLUSIVE")
+            hm.writeout_cache()
+            # kept for the next write
+            nt.assert_equal(len(hm.db_input_cache), 2)
+            other.rollback()
+            hm.writeout_cache()
+            nt.assert_equal(hm.db_input_cache, [])
+            rows = hm.db.execute("SELECT line, source_raw FROM history "
+                                 "WHERE session==?", (hm.session_number,)).fetchall()
+            nt.assert_equal(rows, [(1, u'a=1'), (2, u'b=2')])
+            # locked isn't corrupt: the database isn't moved away
+            nt.assert_equal(os.listdir(tmpdir), ['history.sqlite'])
+        finally:
+            other.close()
+            hm.save_thread.stop()
+            hm.db.close()
+
+def test_store_while_write_retries():
+    ip = get_ipython()
+    with TemporaryDirectory() as tmpdir:
+        hist_file = os.path.join(tmpdir, 'history.sqlite')
+        # the saving thread isn't woken up by storing two inputs
+        hm = HistoryManager(shell=ip, hist_file=hist_file, db_cache_size=10,
+                            write_retries=2, retry_delay=0.2,
+                            connection_options={'timeout': 0.01})
+        other = sqlite3.connect(hist_file)
+        def write():
+            conn = sqlite3.connect(hist_file, timeout=0.01)
+            try:
+                hm.writeout_cache(conn)
+            finally:
+                conn.close()
+        try:
+            hm.store_inputs(1, u'a=1')
+            other.execute("BEGIN EXCLUSIVE")
+            writer = threading.Thread(target=write)
+            writer.start()
+            time.sleep(0.05)
+            # the writer is retrying, which doesn't block storing inputs
+            tic = time.time()
+            hm.store_inputs(2, u'b=2')
+            nt.assert_less(time.time() - tic, 0.1)
+            writer.join()
+            # the input which wasn't written is put back before the new one
+            nt.assert_equal([ line[0] for line in hm.db_input_cache ], [1, 2])
+        finally:
+            other.close()
+            hm.save_thread.stop()
+            hm.db.close()
+
+def test_writeout_waits_for_writer():
+    ip = get_ipython()
+    with TemporaryDirectory() as tmpdir:
+        hist_file = os.path.join(tmpdir, 'history.sqlite')
+        hm = HistoryManager(shell=ip, hist_file=hist_file, db_cache_size=10,
+                            write_retries=2, retry_delay=0.2,
+                            connection_options={'timeout': 0.01})
+        other = sqlite3.connect(hist_file)
+        def write():
+            conn = sqlite3.connect(hist_file, timeout=0.01)
+            try:
+                hm.writeout_cache(conn)
+            finally:
+                conn.close()
+        try:
+            hm.store_inputs(1, u'a=1')
+            other.execute("BEGIN EXCLUSIVE")
+            writer = threading.Thread(target=write)
+            writer.start()
+            time.sleep(0.05)
+            other.rollback()
+            # the writer has taken the input, and is waiting to retry
+            hm.writeout_cache()
+            rows = hm.db.execute("SELECT line FROM history WHERE session==?",
+                                 (hm.session_number,)).fetchall()
+            nt.assert_equal(rows, [(1,)])
+            writer.join()
+        finally:
+            other.close()
+            hm.save_thread.stop()
+            hm.db.close()
+
 def test_extract_hist_ranges():
     instr = "1 2/3 ~4/5-6 ~4/7-~4/9 ~9/2-~7/5 ~10/"
     expected = [(0, 1, 2),  # 0 == current session
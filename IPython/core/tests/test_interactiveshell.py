@@ -318,6 +318,21 @@ def test_silent_noadvance(self):
         ip.run_cell("1", store_history=True)
         self.assertEqual(ec+1, ip.execution_count)
     
+    def test_output_cache_bytes(self):
+        """The oldest outputs are dropped beyond DisplayHook.cache_bytes"""
+        hook = ip.displayhook
+        hook.cache_bytes = 1000
+        try:
+            ip.run_cell("b'x' * 600", store_history=True)
+            first = ip.execution_count - 1
+            self.assertIn(first, ip.user_ns['Out'])
+            ip.run_cell("b'y' * 600", store_history=True)
+            self.assertNotIn(first, ip.user_ns['Out'])
+            self.assertNotIn('_%i' % first, ip.user_ns)
+            self.assertEqual(ip.user_ns['Out'][first + 1], b'y' * 600)
+        finally:
+            hook.cache_bytes = 0
+
     def test_silent_nodisplayhook(self):
         """run_cell(silent=True) doesn't trigger displayhook"""
         d = dict(called=False)
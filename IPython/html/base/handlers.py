@@ -17,7 +17,8 @@
     from httplib import responses
 
 from jinja2 import TemplateNotFound
-from tornado import web
+from tornado import gen, web
+from tornado.concurrent import Future
 
 try:
     from tornado.log import app_log
@@ -161,6 +162,10 @@ def session_manager(self):
     def kernel_spec_manager(self):
         return self.settings['kernel_spec_manager']
 
+    @property
+    def export_service(self):
+        return self.settings['export_service']
+
     #---------------------------------------------------------------
     # CORS
     #---------------------------------------------------------------
@@ -326,31 +331,52 @@ def json_errors(method):
     1. Set the HTTP status code based on the HTTPError
     2. Create and return a JSON body with a message field describing
        the error in a human readable form.
+    
+    Coroutines are supported: if the method returns a Future,
+    errors raised by the coroutine are handled in the same way.
     """
     @functools.wraps(method)
     def wrapper(self, *args, **kwargs):
         try:
             result = method(self, *args, **kwargs)
-        except web.HTTPError as e:
-            status = e.status_code
-            message = e.log_message
-            self.log.warn(message)
-            self.set_status(e.status_code)
-            self.finish(json.dumps(dict(message=message)))
         except Exception:
-            self.log.error("Unhandled error in API request", exc_info=True)
-            status = 500
-            message = "Unknown server error"
-            t, value, tb = sys.exc_info()
-            self.set_status(status)
-            tb_text = ''.join(traceback.format_exception(t, value, tb))
-            reply = dict(message=message, traceback=tb_text)
-            self.finish(json.dumps(reply))
+            _finish_json_error(self)
         else:
+            if isinstance(result, Future):
+                return _json_errors_async(self, result)
             return result
     return wrapper
 
 
+@gen.coroutine
+def _json_errors_async(handler, future):
+    """Wait for a handler coroutine, finishing with a JSON error if it fails"""
+    try:
+        result = yield future
+    except Exception:
+        _finish_json_error(handler)
+    else:
+        raise gen.Return(result)
+
+
+def _finish_json_error(handler):
+    """Finish a request with the JSON error for the exception being handled"""
+    t, e, tb = sys.exc_info()
+    if isinstance(e, web.HTTPError):
+        message = e.log_message
+        handler.log.warn(message)
+        handler.set_status(e.status_code)
+        handler.finish(json.dumps(dict(message=message)))
+    else:
+        handler.log.error("Unhandled error in API request", exc_info=True)
+        status = 500
+        message = "Unknown server error"
+        handler.set_status(status)
+        tb_text = ''.join(traceback.format_exception(t, e, tb))
+        reply = dict(message=message, traceback=tb_text)
+        handler.finish(json.dumps(reply))
+
+
 
 #-----------------------------------------------------------------------------
 # File handler
@@ -15,9 +15,10 @@
 import tornado
 from tornado import gen, ioloop, web, websocket
 
+from IPython.core.release import kernel_protocol_version_info
 from IPython.kernel.zmq.session import Session
 from IPython.utils.jsonutil import date_default, extract_dates
-from IPython.utils.py3compat import cast_unicode
+from IPython.utils.py3compat import cast_bytes, cast_unicode
 
 from .handlers import IPythonHandler
 
@@ -42,7 +43,12 @@ def serialize_binary_message(msg):
     msg = msg.copy()
     buffers = list(msg.pop('buffers'))
     bmsg = json.dumps(msg, default=date_default).encode('utf8')
-    buffers.insert(0, bmsg)
+    return _pack_binary_message(bmsg, buffers)
+
+
+def _pack_binary_message(bmsg, buffers):
+    """Pack the JSON bytes of a message and its buffers into a binary blob"""
+    buffers = [bmsg] + list(buffers)
     nbufs = len(buffers)
     offsets = [4 * (nbufs + 1)]
     for buf in buffers[:-1]:
@@ -80,6 +86,66 @@ def deserialize_binary_message(bmsg):
     return msg
 
 
+def relay_reply(session, msg_list):
+    """Relay a message from a ZMQ socket to a websocket without decoding its content
+
+    The signature is checked and only the header is parsed. The JSON parts of
+    the message are spliced into the websocket message as they are, so the
+    content, which can be large, is never decoded and encoded again.
+
+    Returns None if the message can't be relayed as it is: if it isn't JSON,
+    or has to be adapted from another version of the message protocol.
+    """
+    if session.unpacker.lower() != 'json':
+        return None
+    idents, msg_list = session.feed_identities(msg_list)
+    if len(msg_list) < 5:
+        raise TypeError("malformed message, must have at least 5 elements")
+    msg_list = [ getattr(m, 'bytes', m) for m in msg_list ]
+    p_header, p_parent, p_metadata, p_content = msg_list[1:5]
+    header = session.unpack(p_header)
+    version = header.get('version')
+    if version is None or int(version.split('.')[0]) != kernel_protocol_version_info[0]:
+        return None
+    session.check_signature(msg_list)
+    parts = [
+        b'{"header":', p_header,
+        b',"msg_id":', cast_bytes(json.dumps(header['msg_id'])),
+        b',"msg_type":', cast_bytes(json.dumps(header['msg_type'])),
+        b',"parent_header":', p_parent,
+        b',"metadata":', p_metadata,
+        b',"content":', p_content,
+    ]
+    buffers = msg_list[5:]
+    if buffers:
+        parts.append(b'}')
+        return _pack_binary_message(b''.join(parts), buffers)
+    else:
+        # the same keys as a JSON message
+        parts.append(b',"buffers":[]}')
+        return b''.join(parts).decode('utf8')
+
+
+def reserialize_reply(session, msg_list, relay=True):
+    """Reserialize a message from a ZMQ socket for a websocket
+
+    If `relay` is True, the message is relayed without decoding its content
+    (see :func:`relay_reply`) when possible. Otherwise it is deserialized with
+    session, and serialized as JSON, or as a binary message if it has buffers.
+    """
+    if relay:
+        msg = relay_reply(session, list(msg_list))
+        if msg is not None:
+            return msg
+    idents, msg_list = session.feed_identities(msg_list)
+    msg = session.deserialize(msg_list)
+    if msg['buffers']:
+        return serialize_binary_message(msg)
+    else:
+        smsg = json.dumps(msg, default=date_default)
+        return cast_unicode(smsg)
+
+
 class ZMQStreamHandler(websocket.WebSocketHandler):
     
     def check_origin(self, origin):
@@ -126,6 +192,11 @@ def clear_cookie(self, *args, **kwargs):
         """meaningless for websockets"""
         pass
 
+    @property
+    def relay_messages(self):
+        """Whether to relay messages without decoding their content"""
+        return self.settings.get('relay_messages', True)
+
     def _reserialize_reply(self, msg_list):
         """Reserialize a reply message using JSON.
 
@@ -134,14 +205,7 @@ def _reserialize_reply(self, msg_list):
         should be used by self._on_zmq_reply to build messages that can
         be sent back to the browser.
         """
-        idents, msg_list = self.session.feed_identities(msg_list)
-        msg = self.session.deserialize(msg_list)
-        if msg['buffers']:
-            buf = serialize_binary_message(msg)
-            return buf
-        else:
-            smsg = json.dumps(msg, default=date_default)
-            return cast_unicode(smsg)
+        return reserialize_reply(self.session, msg_list, relay=self.relay_messages)
 
     def _on_zmq_reply(self, msg_list):
         # Sometimes this gets triggered when the on_close method is scheduled in the
@@ -7,15 +7,59 @@
 import mimetypes
 import json
 import base64
+import re
 
-from tornado import web
+from tornado import gen, web
+from tornado.iostream import StreamClosedError
 
 from IPython.html.base.handlers import IPythonHandler
 
+# files are read and sent in chunks of this many bytes
+CHUNK_SIZE = 1024 * 1024
+
+_range_pat = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """Parse the Range header of a request for a file of `size` bytes
+
+    Only single byte ranges are supported.
+
+    Returns
+    -------
+    (start, end) : the range of bytes to send, with end exclusive,
+        or None if the whole file should be sent.
+
+    Raises a 416 HTTPError if the range can't be satisfied.
+    """
+    if not header:
+        return None
+    m = _range_pat.match(header.strip())
+    if m is None:
+        # multiple or malformed ranges: ignore them, and send everything
+        return None
+    first, last = m.groups()
+    if first:
+        start = int(first)
+        end = int(last) + 1 if last else size
+    elif last:
+        # suffix range: the last N bytes
+        start = max(size - int(last), 0)
+        end = size
+    else:
+        return None
+    end = min(end, size)
+    if start >= end:
+        raise web.HTTPError(416)
+    return start, end
+
+
 class FilesHandler(IPythonHandler):
     """serve files via ContentsManager"""
 
     @web.authenticated
+    @web.asynchronous
+    @gen.coroutine
     def get(self, path):
         cm = self.settings['contents_manager']
         if cm.is_hidden(path):
@@ -23,18 +67,22 @@ def get(self, path):
             raise web.HTTPError(404)
 
         path, name = os.path.split(path)
-        model = cm.get_model(name, path)
-        
+
         if self.get_argument("download", False):
             self.set_header('Content-Disposition','attachment; filename="%s"' % name)
-        
-        if model['type'] == 'notebook':
-            self.set_header('Content-Type', 'application/json')
+
+        if name.endswith('.ipynb') or cm.path_exists(u'%s/%s' % (path, name)):
+            self._write_model(cm.get_model(name, path))
         else:
             cur_mime = mimetypes.guess_type(name)[0]
             if cur_mime is not None:
                 self.set_header('Content-Type', cur_mime)
-        
+            yield self._stream_file(cm, name, path)
+
+    def _write_model(self, model):
+        """Write the content of a notebook or directory model"""
+        if model['type'] == 'notebook':
+            self.set_header('Content-Type', 'application/json')
         if model['format'] == 'base64':
             b64_bytes = model['content'].encode('ascii')
             self.write(base64.decodestring(b64_bytes))
@@ -44,6 +92,54 @@ def get(self, path):
             self.write(model['content'])
         self.flush()
 
+    @gen.coroutine
+    def _stream_file(self, cm, name, path):
+        """Send a file in chunks, honoring single byte-range requests.
+
+        Each chunk is flushed to the client before the next one is read,
+        so the memory used per request is bounded by CHUNK_SIZE.
+        """
+        f = cm.open_file(name, path)
+        try:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            self.set_header('Accept-Ranges', 'bytes')
+            try:
+                byte_range = parse_range(self.request.headers.get('Range'), size)
+            except web.HTTPError as e:
+                # not send_error, which would clear the Content-Range header
+                self.set_status(e.status_code)
+                self.set_header('Content-Range', 'bytes */%i' % size)
+                self.finish()
+                return
+            if byte_range is None:
+                start, end = 0, size
+            else:
+                start, end = byte_range
+                self.set_status(206)
+                self.set_header('Content-Range', 'bytes %i-%i/%i' % (start, end - 1, size))
+            self.set_header('Content-Length', end - start)
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                self.write(chunk)
+                flushed = self.flush()
+                if flushed is None:
+                    # tornado < 4: wait for the write buffer to drain
+                    flushed = gen.Task(self.flush)
+                try:
+                    yield flushed
+                except StreamClosedError:
+                    self.log.debug("Client closed connection while downloading %s/%s", path, name)
+                    return
+        finally:
+            f.close()
+
+
 default_handlers = [
     (r"/files/(.*)", FilesHandler),
-]
\ No newline at end of file
+]
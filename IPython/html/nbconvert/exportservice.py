@@ -0,0 +1,217 @@
+"""Exporting notebooks with nbconvert outside of the notebook server's IOLoop.
+
+Conversions run in a pool of worker processes, which keep one exporter per
+format, so its templates are only loaded once. Results are cached, keyed by
+the content of the notebook, the format and the config, so downloading the
+same notebook again doesn't convert it again.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import hashlib
+import json
+import multiprocessing
+import signal
+import time
+from collections import OrderedDict
+
+from tornado import ioloop
+from tornado.concurrent import Future
+
+from IPython.config.configurable import LoggingConfigurable
+from IPython.utils.py3compat import cast_bytes, PY3
+from IPython.utils.traitlets import Any, Dict, Float, Integer
+
+
+class ExportError(Exception):
+    """nbconvert failed to export a notebook"""
+    pass
+
+
+#-----------------------------------------------------------------------------
+# In the worker processes
+#-----------------------------------------------------------------------------
+
+# The config of the exporters, and the exporters by format
+_worker_config = None
+_exporters = {}
+
+
+def _set_worker_config(config):
+    """Set the config of the exporters, discarding the exporters"""
+    global _worker_config
+    _worker_config = config
+    _exporters.clear()
+
+
+def _init_worker(config):
+    """Initialize a worker process with the config of the exporters"""
+    # the server handles interrupts, and terminates the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _set_worker_config(config)
+
+
+def _export(format, nb_json):
+    """Export a notebook given as JSON
+
+    Returns (result, None), or (None, error message) if the export failed,
+    because exceptions can't always be sent back from a worker.
+    """
+    try:
+        from IPython.nbconvert.exporters.export import exporter_map
+        from IPython.nbformat.current import to_notebook_json
+        exporter = _exporters.get(format)
+        if exporter is None:
+            exporter = _exporters[format] = exporter_map[format](config=_worker_config)
+        nb = to_notebook_json(json.loads(nb_json))
+        output, resources = exporter.from_notebook_node(nb)
+    except Exception as e:
+        return None, u"%s: %s" % (e.__class__.__name__, e)
+    result = {
+        'output': output,
+        'outputs': resources.get('outputs') or {},
+        'output_extension': resources['output_extension'],
+        'output_mimetype': exporter.output_mimetype,
+    }
+    return result, None
+
+
+#-----------------------------------------------------------------------------
+# In the notebook server
+#-----------------------------------------------------------------------------
+
+def _result_size(result):
+    return len(result['output']) + sum(len(data) for data in result['outputs'].values())
+
+
+class ExportService(LoggingConfigurable):
+    """Export notebooks in worker processes, caching the results"""
+
+    processes = Integer(2, config=True,
+        help="""The number of worker processes exporting notebooks.
+
+        0 exports notebooks in the notebook server's process,
+        which blocks the server during exports.
+        """
+    )
+
+    cache_size = Integer(64 * 1024 * 1024, config=True,
+        help="""The maximum total size, in bytes, of the cached exports.
+
+        The least recently used exports are evicted first. 0 disables the cache.
+        """
+    )
+
+    export_timeout = Float(300, config=True,
+        help="""How long to wait for an export, in seconds, before failing it.
+
+        A worker process killed while exporting, e.g. because it ran out of memory,
+        never replies. 0 waits forever.
+        """
+    )
+
+    _pool = Any()
+    # key: result, least recently used first
+    _cache = Any()
+    _cache_bytes = Integer(0)
+    # key: Future of exports in progress
+    _pending = Dict()
+
+    def _config_changed(self, name, old, new):
+        # exporters in the workers have the old config
+        self.shutdown()
+        self._clear_cache()
+
+    def start(self):
+        """Start the worker processes, if they aren't started"""
+        if self.processes and self._pool is None:
+            self.log.debug("Starting %i nbconvert worker processes", self.processes)
+            self._pool = multiprocessing.Pool(self.processes,
+                initializer=_init_worker, initargs=(self.config,),
+            )
+        elif not self.processes and _worker_config is not self.config:
+            _set_worker_config(self.config)
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    def _key(self, format, nb_json):
+        h = hashlib.sha1(cast_bytes(nb_json))
+        h.update(cast_bytes(format))
+        h.update(cast_bytes(repr(self.config)))
+        return h.hexdigest()
+
+    def export(self, format, nb):
+        """Export a notebook
+
+        Returns a Future for a dict with keys output, outputs (the resource files),
+        output_extension and output_mimetype. The Future raises ExportError
+        if nbconvert fails.
+        """
+        nb_json = json.dumps(nb, sort_keys=True)
+        key = self._key(format, nb_json)
+        future = Future()
+        if self._cache is not None and key in self._cache:
+            self.log.debug("Serving cached %s export", format)
+            result = self._cache.pop(key)
+            self._cache[key] = result
+            future.set_result(result)
+            return future
+        if key in self._pending:
+            return self._pending[key]
+
+        self.start()
+        if self._pool is None:
+            self._finish(key, future, _export(format, nb_json))
+            return future
+
+        self._pending[key] = future
+        loop = ioloop.IOLoop.current()
+        callback = lambda reply: loop.add_callback(self._finish, key, future, reply)
+        kwargs = {}
+        if PY3:
+            # errors outside of _export, e.g. a result which can't be pickled
+            kwargs['error_callback'] = lambda e: callback(
+                (None, u"%s: %s" % (e.__class__.__name__, e)))
+        self._pool.apply_async(_export, (format, nb_json), callback=callback, **kwargs)
+        if self.export_timeout:
+            timeout = loop.add_timeout(time.time() + self.export_timeout,
+                lambda : self._finish(key, future,
+                    (None, u"The export timed out after %gs" % self.export_timeout)),
+            )
+            future.add_done_callback(lambda f: loop.remove_timeout(timeout))
+        return future
+
+    def _finish(self, key, future, reply):
+        if self._pending.get(key) is future:
+            del self._pending[key]
+        if future.done():
+            # the export timed out before
+            return
+        result, error = reply
+        if error is not None:
+            future.set_exception(ExportError(error))
+            return
+        self._keep(key, result)
+        future.set_result(result)
+
+    def _keep(self, key, result):
+        """Cache an export, evicting the least recently used ones beyond cache_size"""
+        size = _result_size(result)
+        if size > self.cache_size:
+            return
+        if self._cache is None:
+            self._cache = OrderedDict()
+        self._cache[key] = result
+        self._cache_bytes += size
+        while self._cache_bytes > self.cache_size:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= _result_size(evicted)
+
+    def _clear_cache(self):
+        self._cache = None
+        self._cache_bytes = 0
@@ -7,7 +7,7 @@
 import os
 import zipfile
 
-from tornado import web
+from tornado import gen, web
 
 from ..base.handlers import (
     IPythonHandler, FilesRedirectHandler,
@@ -16,6 +16,7 @@
 from IPython.nbformat.current import to_notebook_json
 
 from IPython.utils.py3compat import cast_bytes
+from .exportservice import ExportError
 
 def find_resource_files(output_files_dir):
     files = []
@@ -52,8 +53,8 @@ def respond_zip(handler, name, output, resources):
     handler.finish(buffer.getvalue())
     return True
 
-def get_exporter(format, **kwargs):
-    """get an exporter, raising appropriate errors"""
+def get_exporter_class(format):
+    """get the class of the exporter for a format, raising appropriate errors"""
     # if this fails, will raise 500
     try:
         from IPython.nbconvert.exporters.export import exporter_map
@@ -61,34 +62,51 @@ def get_exporter(format, **kwargs):
         raise web.HTTPError(500, "Could not import nbconvert: %s" % e)
     
     try:
-        Exporter = exporter_map[format]
+        return exporter_map[format]
     except KeyError:
         # should this be 400?
         raise web.HTTPError(404, u"No exporter for format: %s" % format)
-    
+
+def get_exporter(format, **kwargs):
+    """get an exporter, raising appropriate errors"""
+    Exporter = get_exporter_class(format)
     try:
         return Exporter(**kwargs)
     except Exception as e:
         raise web.HTTPError(500, "Could not construct Exporter: %s" % e)
 
+@gen.coroutine
+def export(handler, format, nb):
+    """Export a notebook with the export service of the server
+
+    Returns a Future for (output, resources, output_mimetype).
+    """
+    get_exporter_class(format)
+    try:
+        result = yield handler.export_service.export(format, nb)
+    except ExportError as e:
+        raise web.HTTPError(500, "nbconvert failed: %s" % e)
+    resources = {
+        'outputs': result['outputs'],
+        'output_extension': result['output_extension'],
+    }
+    raise gen.Return((result['output'], resources, result['output_mimetype']))
+
 class NbconvertFileHandler(IPythonHandler):
 
     SUPPORTED_METHODS = ('GET',)
     
     @web.authenticated
+    @web.asynchronous
+    @gen.coroutine
     def get(self, format, path='', name=None):
         
-        exporter = get_exporter(format, config=self.config, log=self.log)
-        
         path = path.strip('/')
         model = self.contents_manager.get_model(name=name, path=path)
 
         self.set_header('Last-Modified', model['last_modified'])
         
-        try:
-            output, resources = exporter.from_notebook_node(model['content'])
-        except Exception as e:
-            raise web.HTTPError(500, "nbconvert failed: %s" % e)
+        output, resources, output_mimetype = yield export(self, format, model['content'])
 
         if respond_zip(self, name, output, resources):
             return
@@ -100,9 +118,9 @@ def get(self, format, path='', name=None):
                                'attachment; filename="%s"' % filename)
 
         # MIME type
-        if exporter.output_mimetype:
+        if output_mimetype:
             self.set_header('Content-Type',
-                            '%s; charset=utf-8' % exporter.output_mimetype)
+                            '%s; charset=utf-8' % output_mimetype)
 
         self.finish(output)
 
@@ -110,24 +128,21 @@ class NbconvertPostHandler(IPythonHandler):
     SUPPORTED_METHODS = ('POST',)
 
     @web.authenticated 
+    @web.asynchronous
+    @gen.coroutine
     def post(self, format):
-        exporter = get_exporter(format, config=self.config)
-        
         model = self.get_json_body()
         nbnode = to_notebook_json(model['content'])
         
-        try:
-            output, resources = exporter.from_notebook_node(nbnode)
-        except Exception as e:
-            raise web.HTTPError(500, "nbconvert failed: %s" % e)
+        output, resources, output_mimetype = yield export(self, format, nbnode)
 
         if respond_zip(self, nbnode.metadata.name, output, resources):
             return
 
         # MIME type
-        if exporter.output_mimetype:
+        if output_mimetype:
             self.set_header('Content-Type',
-                            '%s; charset=utf-8' % exporter.output_mimetype)
+                            '%s; charset=utf-8' % output_mimetype)
 
         self.finish(output)
 
@@ -0,0 +1,120 @@
+"""Tests for exporting notebooks in worker processes"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import signal
+from unittest import TestCase
+
+from tornado import ioloop
+
+from IPython.nbformat.current import (new_notebook, new_worksheet,
+                                      new_code_cell)
+from IPython.testing.decorators import skipif
+from IPython.utils.py3compat import PY3
+
+from ..exportservice import ExportService, ExportError
+
+
+def make_notebook(source=u'print(2*6)'):
+    nb = new_notebook(name='testnb')
+    nb.worksheets = [new_worksheet(cells=[new_code_cell(input=source)])]
+    return nb
+
+
+class TestExportService(TestCase):
+
+    processes = 1
+
+    def setUp(self):
+        self.service = ExportService(processes=self.processes)
+        self.run_sync = ioloop.IOLoop.instance().run_sync
+
+    def tearDown(self):
+        self.service.shutdown()
+
+    def export(self, format, nb):
+        return self.run_sync(lambda : self.service.export(format, nb))
+
+    def test_export(self):
+        result = self.export('python', make_notebook())
+        self.assertIn(u'print(2*6)', result['output'])
+        self.assertEqual(result['output_extension'], 'py')
+        self.assertEqual(result['output_mimetype'], 'text/x-python')
+
+    def test_cache(self):
+        nb = make_notebook()
+        first = self.export('python', nb)
+        # cached exports are served without exporting again
+        self.assertIs(self.export('python', nb), first)
+        # a different notebook or format is exported again
+        self.assertIsNot(self.export('python', make_notebook(u'1+1')), first)
+        self.assertIsNot(self.export('rst', nb), first)
+
+    def test_cache_eviction(self):
+        nb = make_notebook()
+        first = self.export('python', nb)
+        self.service.cache_size = len(first['output']) + 1
+        self.export('python', make_notebook(u'1+1'))
+        self.assertIsNot(self.export('python', nb), first)
+
+    def test_error(self):
+        with self.assertRaises(ExportError):
+            self.export('nosuchformat', make_notebook())
+
+
+class TestInProcessExportService(TestExportService):
+
+    processes = 0
+
+    def test_sigint_handled(self):
+        handler = signal.signal(signal.SIGINT, signal.default_int_handler)
+        try:
+            self.service.config = self.service.config.copy()
+            self.export('python', make_notebook())
+            # only worker processes ignore interrupts
+            self.assertIs(signal.getsignal(signal.SIGINT), signal.default_int_handler)
+        finally:
+            signal.signal(signal.SIGINT, handler)
+
+
+class LostTaskPool(object):
+    """Stand-in for a Pool whose worker died: tasks never complete"""
+
+    def apply_async(self, func, args, callback=None, error_callback=None):
+        pass
+
+    def terminate(self):
+        pass
+
+
+class FailingPool(LostTaskPool):
+    """Stand-in for a Pool failing to send results back"""
+
+    def apply_async(self, func, args, callback=None, error_callback=None):
+        error_callback(TypeError("can't pickle result"))
+
+
+class TestExportFailures(TestCase):
+
+    def setUp(self):
+        self.service = ExportService(processes=1, export_timeout=0.1)
+        self.run_sync = ioloop.IOLoop.instance().run_sync
+
+    def export(self):
+        return self.run_sync(lambda : self.service.export('python', make_notebook()),
+            timeout=5)
+
+    def test_timeout(self):
+        self.service._pool = LostTaskPool()
+        with self.assertRaises(ExportError):
+            self.export()
+        self.assertEqual(self.service._pending, {})
+
+    @skipif(not PY3, "Pool.apply_async has no error_callback on Python 2")
+    def test_error_callback(self):
+        self.service._pool = FailingPool()
+        self.service.export_timeout = 0
+        with self.assertRaises(ExportError):
+            self.export()
+        self.assertEqual(self.service._pending, {})
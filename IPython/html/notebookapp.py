@@ -59,6 +59,7 @@
 from .services.contents.filemanager import FileContentsManager
 from .services.clusters.clustermanager import ClusterManager
 from .services.sessions.sessionmanager import SessionManager
+from .nbconvert.exportservice import ExportService
 
 from .base.handlers import AuthenticatedFileHandler, FileFindHandler
 
@@ -305,6 +306,7 @@ class NotebookApp(BaseIPythonApplication):
     classes = [
         KernelManager, ProfileDir, Session, MappingKernelManager,
         ContentsManager, FileContentsManager, NotebookNotary,
+        ExportService,
     ]
     flags = Dict(flags)
     aliases = Dict(aliases)
@@ -666,6 +668,10 @@ def init_kernel_argv(self):
     def init_configurables(self):
         # force Session default to be secure
         default_secure(self.config)
+        self.export_service = ExportService(parent=self, log=self.log)
+        # start the nbconvert workers before the server has sockets and kernels,
+        # including the kernels of restored sessions
+        self.export_service.start()
         kls = import_item(self.kernel_manager_class)
         self.kernel_manager = kls(
             parent=self, log=self.log, kernel_argv=self.kernel_argv,
@@ -677,6 +683,7 @@ def init_configurables(self):
         self.session_manager = kls(parent=self, log=self.log,
                                    kernel_manager=self.kernel_manager,
                                    contents_manager=self.contents_manager)
+        self.session_manager.restore_sessions()
         kls = import_item(self.cluster_manager_class)
         self.cluster_manager = kls(parent=self, log=self.log)
         self.cluster_manager.update_profiles()
@@ -702,6 +709,7 @@ def init_webapp(self):
         if self.allow_origin_pat:
             self.tornado_settings['allow_origin_pat'] = re.compile(self.allow_origin_pat)
         self.tornado_settings['allow_credentials'] = self.allow_credentials
+        self.tornado_settings['export_service'] = self.export_service
         
         self.web_app = NotebookWebApplication(
             self, self.kernel_manager, self.contents_manager,
@@ -929,12 +937,19 @@ def start(self):
                 b = lambda : browser.open(url_path_join(self.connection_url, uri),
                                           new=2)
                 threading.Thread(target=b).start()
+        # start the idle kernels of the pool, once the server is up
+        ioloop.IOLoop.instance().add_callback(self.kernel_manager.fill_pool)
+        ioloop.IOLoop.instance().add_callback(self.kernel_manager.start_culler)
+        start_checkpoint_gc = getattr(self.contents_manager, 'start_checkpoint_gc', None)
+        if start_checkpoint_gc is not None:
+            ioloop.IOLoop.instance().add_callback(start_checkpoint_gc)
         try:
             ioloop.IOLoop.instance().start()
         except KeyboardInterrupt:
             info("Interrupted...")
         finally:
             self.cleanup_kernels()
+            self.export_service.shutdown()
             self.remove_server_info_file()
 
 
@@ -0,0 +1,382 @@
+"""Content-addressed, deduplicated storage for file checkpoints.
+
+Checkpoints are split into chunks, which are stored once per distinct content
+as blobs named by their hash, so checkpoints of mostly unchanged files share
+most of their storage, across checkpoints and across files.
+
+- Notebooks are split at cell and output granularity.
+  The JSON of each cell (without its outputs) and of each output is a blob,
+  and the rest of the notebook is kept in the checkpoint's manifest.
+- Other files are split into fixed-size chunks.
+
+Layout of the store directory::
+
+    blobs/<hash[:2]>/<hash[2:]>
+    manifests/<hash of the file's API path>/path
+    manifests/<hash of the file's API path>/<checkpoint id>.json
+
+The store counts the references to each blob, so that the blobs dropped by
+deleting checkpoints are removed by :meth:`CheckpointStore.collect`, without
+reading every manifest. :meth:`CheckpointStore.gc` reads them all, to remove the
+blobs left unreferenced otherwise, e.g. by another process sharing the store.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import copy
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+
+from IPython.utils.io import atomic_writing
+from IPython.utils.path import ensure_dir_exists
+from IPython.utils.py3compat import cast_bytes, cast_unicode
+
+
+def _hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def _dumps(obj):
+    """Canonical JSON bytes of an object"""
+    return cast_bytes(json.dumps(obj, sort_keys=True, separators=(',', ':')))
+
+
+def _cell_lists(nb):
+    """The lists of cells of a notebook, for any nbformat version"""
+    if 'worksheets' in nb:
+        return [ ws.get('cells', []) for ws in nb['worksheets'] ]
+    return [ nb.get('cells', []) ]
+
+
+def _blob_refs(manifest):
+    """The hashes of the blobs referenced by a manifest"""
+    if manifest['format'] == 'file':
+        return list(manifest['chunks'])
+    refs = []
+    for cells in _cell_lists(manifest['notebook']):
+        for ref in cells:
+            refs.append(ref['cell'])
+            refs.extend(ref.get('outputs', []))
+    return refs
+
+
+class CheckpointStore(object):
+    """Content-addressed, deduplicated storage of checkpoints
+
+    Parameters
+    ----------
+    root : str
+        The directory of the store.
+    chunk_size : int
+        The size of the chunks into which files that aren't notebooks are split.
+    log : logger
+    """
+
+    # Unreferenced blobs younger than this (in seconds) are not garbage-collected,
+    # in case another process sharing the store is creating a checkpoint.
+    gc_min_age = 600
+
+    def __init__(self, root, chunk_size=1024 * 1024, log=None):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.log = log
+        self._lock = threading.RLock()
+        # the number of references to each blob, loaded on first use
+        self._refs = None
+        # blobs whose last reference was dropped, for collect
+        self._dropped = set()
+
+    # blobs
+
+    def _blob_path(self, h):
+        return os.path.join(self.root, 'blobs', h[:2], h[2:])
+
+    def put_blob(self, data):
+        """Store a blob, unless it is already stored. Returns its hash."""
+        h = _hash(data)
+        blob_path = self._blob_path(h)
+        try:
+            # reused blobs are touched, so that they are not collected
+            # before the manifest referencing them is written
+            os.utime(blob_path, None)
+        except OSError:
+            ensure_dir_exists(os.path.dirname(blob_path))
+            with atomic_writing(blob_path, text=False) as f:
+                f.write(data)
+        return h
+
+    def get_blob(self, h):
+        with io.open(self._blob_path(h), 'rb') as f:
+            return f.read()
+
+    # manifests
+
+    def _manifest_dir(self, api_path):
+        key = _hash(cast_bytes(api_path.strip('/')))
+        return os.path.join(self.root, 'manifests', key)
+
+    def _manifest_path(self, api_path, checkpoint_id):
+        return os.path.join(self._manifest_dir(api_path), checkpoint_id + '.json')
+
+    def _write_manifest(self, api_path, manifest):
+        manifest_dir = self._manifest_dir(api_path)
+        ensure_dir_exists(manifest_dir)
+        path_file = os.path.join(manifest_dir, 'path')
+        with io.open(path_file, 'w', encoding='utf-8') as f:
+            f.write(cast_unicode(api_path.strip('/')))
+        with atomic_writing(self._manifest_path(api_path, manifest['id']), encoding='utf-8') as f:
+            f.write(cast_unicode(json.dumps(manifest)))
+
+    def _read_manifest(self, manifest_file):
+        with io.open(manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _manifest_files(self, manifest_dir):
+        if not os.path.isdir(manifest_dir):
+            return []
+        return [ os.path.join(manifest_dir, f) for f in os.listdir(manifest_dir)
+            if f.endswith('.json') ]
+
+    def _all_manifests(self):
+        """Yield the manifests of every checkpoint in the store"""
+        for stored_path, manifest_dir in self._stored_paths():
+            for manifest_file in self._manifest_files(manifest_dir):
+                try:
+                    yield self._read_manifest(manifest_file)
+                except (IOError, OSError, ValueError):
+                    continue
+
+    def _stored_paths(self):
+        """Yield (api_path, manifest dir) for every file with checkpoints"""
+        manifests = os.path.join(self.root, 'manifests')
+        if not os.path.isdir(manifests):
+            return
+        for key in os.listdir(manifests):
+            manifest_dir = os.path.join(manifests, key)
+            try:
+                with io.open(os.path.join(manifest_dir, 'path'), encoding='utf-8') as f:
+                    yield f.read(), manifest_dir
+            except (IOError, OSError):
+                continue
+
+    # reference counts
+
+    def _load_refs(self):
+        """Count the references to each blob, if they aren't counted yet"""
+        with self._lock:
+            if self._refs is None:
+                refs = Counter()
+                for manifest in self._all_manifests():
+                    refs.update(_blob_refs(manifest))
+                self._refs = refs
+
+    def _drop_refs(self, manifest_files):
+        """Drop the references of manifests about to be deleted"""
+        self._load_refs()
+        for manifest_file in manifest_files:
+            try:
+                manifest = self._read_manifest(manifest_file)
+            except (IOError, OSError, ValueError):
+                continue
+            for h in _blob_refs(manifest):
+                self._refs[h] -= 1
+                if self._refs[h] <= 0:
+                    del self._refs[h]
+                    self._dropped.add(h)
+
+    # checkpoints
+
+    def create(self, api_path, os_path, checkpoint_id):
+        """Create a checkpoint of the file at os_path. Returns its manifest."""
+        with self._lock:
+            manifest = None
+            if os_path.endswith('.ipynb'):
+                manifest = self._split_notebook(os_path)
+            if manifest is None:
+                manifest = self._split_file(os_path)
+            manifest['id'] = checkpoint_id
+            manifest['created'] = time.time()
+            self._write_manifest(api_path, manifest)
+            if self._refs is not None:
+                self._refs.update(_blob_refs(manifest))
+            return manifest
+
+    def _split_notebook(self, os_path):
+        """Store the cells and outputs of a notebook, returning its manifest
+
+        Returns None if the notebook can't be parsed.
+        """
+        try:
+            with io.open(os_path, 'r', encoding='utf-8') as f:
+                nb = json.load(f)
+            cell_lists = _cell_lists(nb)
+        except (ValueError, TypeError, AttributeError):
+            return None
+        for cells in cell_lists:
+            for i, cell in enumerate(cells):
+                ref = {}
+                if 'outputs' in cell:
+                    ref['outputs'] = [ self.put_blob(_dumps(output)) for output in cell['outputs'] ]
+                    cell = dict(cell)
+                    del cell['outputs']
+                ref['cell'] = self.put_blob(_dumps(cell))
+                cells[i] = ref
+        return {'format': 'notebook', 'notebook': nb}
+
+    def _split_file(self, os_path):
+        """Store the chunks of a file, returning its manifest"""
+        chunks = []
+        with io.open(os_path, 'rb') as f:
+            while True:
+                data = f.read(self.chunk_size)
+                if not data:
+                    break
+                chunks.append(self.put_blob(data))
+        return {'format': 'file', 'chunks': chunks}
+
+    def get(self, api_path, checkpoint_id):
+        """Get the manifest of a checkpoint, or None if there is no such checkpoint"""
+        manifest_file = self._manifest_path(api_path, checkpoint_id)
+        if not os.path.isfile(manifest_file):
+            return None
+        return self._read_manifest(manifest_file)
+
+    def list(self, api_path):
+        """List the manifests of the checkpoints of a file, oldest first"""
+        manifests = []
+        for manifest_file in self._manifest_files(self._manifest_dir(api_path)):
+            try:
+                manifests.append(self._read_manifest(manifest_file))
+            except (IOError, OSError, ValueError):
+                if self.log:
+                    self.log.warn("Unreadable checkpoint manifest %s", manifest_file)
+        manifests.sort(key=lambda m: m['created'])
+        return manifests
+
+    def read(self, manifest):
+        """Return the content of a checkpoint as bytes"""
+        if manifest['format'] == 'file':
+            return b''.join(self.get_blob(h) for h in manifest['chunks'])
+        nb = copy.deepcopy(manifest['notebook'])
+        for cells in _cell_lists(nb):
+            for i, ref in enumerate(cells):
+                cell = json.loads(self.get_blob(ref['cell']).decode('utf8'))
+                if 'outputs' in ref:
+                    cell['outputs'] = [ json.loads(self.get_blob(h).decode('utf8'))
+                        for h in ref['outputs'] ]
+                cells[i] = cell
+        # same formatting as the nbformat JSON writer
+        return cast_bytes(json.dumps(nb, sort_keys=True, indent=1, separators=(',', ': ')))
+
+    def restore(self, manifest, os_path):
+        """Restore the file at os_path from a checkpoint"""
+        if manifest['format'] == 'file':
+            with atomic_writing(os_path, text=False) as f:
+                for h in manifest['chunks']:
+                    f.write(self.get_blob(h))
+        else:
+            data = self.read(manifest)
+            with atomic_writing(os_path, text=False) as f:
+                f.write(data)
+
+    def delete(self, api_path, checkpoint_id):
+        """Delete a checkpoint. Its blobs are only removed by collect or gc."""
+        with self._lock:
+            manifest_file = self._manifest_path(api_path, checkpoint_id)
+            if os.path.isfile(manifest_file):
+                self._drop_refs([manifest_file])
+                os.unlink(manifest_file)
+            manifest_dir = self._manifest_dir(api_path)
+            if not self._manifest_files(manifest_dir):
+                shutil.rmtree(manifest_dir, ignore_errors=True)
+
+    def _matching(self, api_path):
+        """(api_path, manifest dir) of the file at api_path, or of files in that directory"""
+        api_path = api_path.strip('/')
+        for stored_path, manifest_dir in self._stored_paths():
+            if stored_path == api_path or stored_path.startswith(api_path + '/'):
+                yield stored_path, manifest_dir
+
+    def delete_all(self, api_path):
+        """Delete all checkpoints of a file, or of all files in a directory"""
+        with self._lock:
+            for stored_path, manifest_dir in list(self._matching(api_path)):
+                self._drop_refs(self._manifest_files(manifest_dir))
+                shutil.rmtree(manifest_dir, ignore_errors=True)
+
+    def move(self, old_path, new_path):
+        """Move the checkpoints of a file, or of all files in a directory"""
+        old_path = old_path.strip('/')
+        new_path = new_path.strip('/')
+        with self._lock:
+            for stored_path, manifest_dir in list(self._matching(old_path)):
+                moved_path = new_path + stored_path[len(old_path):]
+                for manifest_file in self._manifest_files(manifest_dir):
+                    self._write_manifest(moved_path, self._read_manifest(manifest_file))
+                shutil.rmtree(manifest_dir, ignore_errors=True)
+
+    def _remove_blob(self, h, now):
+        """Remove a blob, unless it is younger than gc_min_age. Returns whether it was removed."""
+        blob_path = self._blob_path(h)
+        try:
+            if now - os.stat(blob_path).st_mtime < self.gc_min_age:
+                return False
+            os.unlink(blob_path)
+        except OSError:
+            return False
+        return True
+
+    def collect(self):
+        """Remove the blobs whose last reference was dropped by deleting checkpoints
+
+        This only looks at those blobs, so it is cheap enough to call
+        whenever checkpoints are deleted. The references are counted
+        on first use, by reading every manifest.
+        Returns the number of blobs removed.
+        """
+        with self._lock:
+            self._load_refs()
+            dropped, self._dropped = self._dropped, set()
+            now = time.time()
+            removed = 0
+            for h in dropped:
+                # blobs referenced again since, or too young, are left to gc
+                if not self._refs.get(h) and self._remove_blob(h, now):
+                    removed += 1
+            return removed
+
+    def gc(self):
+        """Remove blobs not referenced by any checkpoint
+
+        This reads every manifest and lists every blob, so it should be run
+        away from request handlers. Checkpoints can be created and deleted
+        meanwhile: blobs reused by new checkpoints are touched when they are
+        reused, so they are younger than gc_min_age.
+        Returns the number of blobs removed.
+        """
+        self._load_refs()
+        referenced = set()
+        for manifest in self._all_manifests():
+            referenced.update(_blob_refs(manifest))
+        blobs = os.path.join(self.root, 'blobs')
+        if not os.path.isdir(blobs):
+            return 0
+        removed = 0
+        now = time.time()
+        for prefix in os.listdir(blobs):
+            blob_dir = os.path.join(blobs, prefix)
+            for rest in os.listdir(blob_dir):
+                h = prefix + rest
+                if h in referenced:
+                    continue
+                with self._lock:
+                    if not self._refs.get(h) and self._remove_blob(h, now):
+                        removed += 1
+        return removed
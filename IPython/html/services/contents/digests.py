@@ -0,0 +1,86 @@
+"""Content digests of notebooks and cells, for incremental saving and loading.
+
+Validating a notebook against the schema and signing it both walk the whole
+notebook in Python, which takes seconds for notebooks with large outputs.
+Digests of the canonical JSON of each cell are computed by the C JSON encoder
+and are cheap in comparison, so they are used to skip validating cells that
+have already been validated, and signing notebooks that have already been signed.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from IPython.utils.py3compat import cast_bytes
+
+
+def _canonical(obj):
+    """Canonical JSON bytes of an object"""
+    return cast_bytes(json.dumps(obj, sort_keys=True, separators=(',', ':'), default=repr))
+
+
+def cell_digest(cell):
+    """Return the digest of a cell's content"""
+    return hashlib.sha256(_canonical(cell)).hexdigest()
+
+
+def cells_of(nb):
+    """Return the list of cells of each worksheet of a notebook"""
+    return [ ws.get('cells', []) for ws in nb.get('worksheets', []) ]
+
+
+def notebook_digest(nb, exclude=('signature',)):
+    """Return the digest of a notebook's content
+
+    The notebook-level metadata keys in `exclude` are not included.
+    """
+    metadata = dict((k, v) for k, v in nb.get('metadata', {}).items() if k not in exclude)
+    skeleton = dict(nb, metadata=metadata)
+    skeleton['worksheets'] = [ dict(ws, cells=len(cells))
+        for ws, cells in zip(nb.get('worksheets', []), cells_of(nb)) ]
+    h = hashlib.sha256(_canonical(skeleton))
+    for cells in cells_of(nb):
+        for cell in cells:
+            h.update(cast_bytes(cell_digest(cell)))
+    return h.hexdigest()
+
+
+class DigestCache(object):
+    """A bounded, thread-safe mapping of digests to values
+
+    The least recently used digests are dropped first.
+    """
+
+    def __init__(self, size=10000):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.pop(key, None)
+            if value is None:
+                return default
+            self._data[key] = value
+            return value
+
+    def set(self, key, value=True):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,199 @@
+"""Single-pass, cached directory listings for the FileContentsManager.
+
+Listing a directory with glob + per-entry checks costs a dozen stat calls per
+entry, which adds up quickly for large directories on network filesystems.
+:func:`scan_directory` lists a directory with one stat per entry,
+and :class:`ListingCache` avoids even that for directories that have not
+changed since they were last listed.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        # backport for Python < 3.5
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+from IPython.html.utils import UF_HIDDEN
+
+
+def scan_directory(os_path):
+    """Yield (name, stat_result) for each entry of a directory.
+
+    Symlinks are followed, and broken symlinks are yielded with a stat of None.
+    Uses :func:`os.scandir` where available.
+    """
+    if scandir is not None:
+        for entry in scandir(os_path):
+            try:
+                st = entry.stat()
+            except OSError:
+                st = None
+            yield entry.name, st
+    else:
+        for name in os.listdir(os_path):
+            try:
+                st = os.stat(os.path.join(os_path, name))
+            except OSError:
+                st = None
+            yield name, st
+
+
+def entry_is_hidden(os_path, name, st):
+    """Is an entry of a (not hidden) directory hidden?
+
+    This is the single-entry equivalent of :func:`IPython.html.utils.is_hidden`,
+    which would check every parent directory again.
+    """
+    if name.startswith('.'):
+        return True
+    if getattr(st, 'st_flags', 0) & UF_HIDDEN:
+        return True
+    # directories that can't be listed are hidden
+    if stat.S_ISDIR(st.st_mode) and not os.access(os.path.join(os_path, name), os.R_OK | os.X_OK):
+        return True
+    return False
+
+
+class ListingCache(object):
+    """A cache of directory listings, keyed by directory path.
+
+    A cached listing is only used while the mtime of its directory is unchanged.
+    Changing the content of a file doesn't change the mtime of its directory,
+    so where inotify is available (via pyinotify) cached directories are
+    watched, and dropped from the cache on any change to their entries.
+    Without inotify, cached listings expire after `ttl` seconds.
+
+    Parameters
+    ----------
+    ttl : float
+        How long listings are cached for, if directories can't be watched.
+    max_dirs : int
+        The maximum number of directories to cache.
+        The least recently cached directories are dropped first.
+    use_inotify : bool
+        Whether to watch cached directories with inotify, if available.
+    """
+
+    # inotify events that change the listing of a directory
+    _mask = 0
+    if pyinotify is not None:
+        _mask = (pyinotify.IN_CREATE | pyinotify.IN_DELETE | pyinotify.IN_MODIFY |
+            pyinotify.IN_ATTRIB | pyinotify.IN_MOVED_FROM | pyinotify.IN_MOVED_TO |
+            pyinotify.IN_CLOSE_WRITE | pyinotify.IN_DELETE_SELF | pyinotify.IN_MOVE_SELF)
+
+    def __init__(self, ttl=5, max_dirs=1000, use_inotify=True, log=None, clock=time.time):
+        self.ttl = ttl
+        self.max_dirs = max_dirs
+        self.log = log
+        self.clock = clock
+        self._listings = OrderedDict()
+        # files may be saved on a background thread
+        self._lock = threading.RLock()
+        self._watches = {}
+        self._notifier = None
+        if use_inotify and pyinotify is not None:
+            try:
+                self._wm = pyinotify.WatchManager()
+                self._notifier = pyinotify.Notifier(self._wm, self._handle_event, timeout=0)
+            except Exception:
+                if self.log:
+                    self.log.warn("Could not watch directories with inotify", exc_info=True)
+
+    @property
+    def watching(self):
+        """Whether cached directories are watched for changes"""
+        return self._notifier is not None
+
+    def get(self, os_path, dir_stat):
+        """Return the cached listing of a directory, or None.
+
+        `dir_stat` is the current stat of the directory.
+        """
+        with self._lock:
+            self._process_events()
+            cached = self._listings.get(os_path)
+            if cached is None:
+                return None
+            mtime, expires, listing = cached
+            if mtime != dir_stat.st_mtime or (expires is not None and self.clock() > expires):
+                self.invalidate(os_path)
+                return None
+            return listing
+
+    def set(self, os_path, dir_stat, listing):
+        """Cache the listing of a directory, taken when it had stat `dir_stat`."""
+        with self._lock:
+            now = self.clock()
+            expires = None
+            if self.watching:
+                if not self._watch(os_path):
+                    return
+            else:
+                # With a coarse mtime resolution, a change made within the same
+                # second as the listing would go unnoticed: don't cache those.
+                if now - dir_stat.st_mtime < 2:
+                    return
+                expires = now + self.ttl
+            self._listings.pop(os_path, None)
+            self._listings[os_path] = (dir_stat.st_mtime, expires, listing)
+            while len(self._listings) > self.max_dirs:
+                oldest = next(iter(self._listings))
+                self.invalidate(oldest)
+
+    def invalidate(self, os_path=None):
+        """Drop the cached listing of a directory, or of all directories."""
+        with self._lock:
+            if os_path is None:
+                for path in list(self._listings):
+                    self.invalidate(path)
+                return
+            self._listings.pop(os_path, None)
+            wd = self._watches.pop(os_path, None)
+            if wd is not None and wd >= 0:
+                try:
+                    self._wm.rm_watch(wd, quiet=True)
+                except Exception:
+                    pass
+
+    def _watch(self, os_path):
+        """Start watching a directory. Returns whether it is watched."""
+        if os_path in self._watches:
+            return True
+        wdd = self._wm.add_watch(os_path, self._mask, quiet=True)
+        wd = wdd.get(os_path, -1)
+        if wd < 0:
+            # e.g. out of inotify watches
+            return False
+        self._watches[os_path] = wd
+        return True
+
+    def _handle_event(self, event):
+        # event.path is the watched directory
+        self._listings.pop(event.path, None)
+        if event.mask & (pyinotify.IN_DELETE_SELF | pyinotify.IN_MOVE_SELF | pyinotify.IN_IGNORED):
+            self.invalidate(event.path)
+
+    def _process_events(self):
+        """Apply pending inotify events, without blocking."""
+        if self._notifier is None:
+            return
+        while self._notifier.check_events(timeout=0):
+            self._notifier.read_events()
+        self._notifier.process_events()
@@ -4,19 +4,30 @@
 # Distributed under the terms of the Modified BSD License.
 
 import base64
+from contextlib import contextmanager
 import io
 import os
-import glob
 import shutil
+import stat
+import threading
+import time
+import uuid
 
-from tornado import web
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
 
+from tornado import ioloop, web
+
+from .checkpointstore import CheckpointStore
+from .dircache import ListingCache, entry_is_hidden, scan_directory
 from .manager import ContentsManager
 from IPython.nbformat import current
 from IPython.utils.io import atomic_writing
 from IPython.utils.path import ensure_dir_exists
-from IPython.utils.traitlets import Unicode, Bool, TraitError
-from IPython.utils.py3compat import getcwd
+from IPython.utils.traitlets import Unicode, Bool, Dict, Float, Instance, Integer, TraitError
+from IPython.utils.py3compat import getcwd, unicode_type
 from IPython.utils import tz
 from IPython.html.utils import is_hidden, to_os_path, url_path_join
 
@@ -50,6 +61,102 @@ def _root_dir_changed(self, name, old, new):
         """
     )
 
+    checkpoint_store_dir = Unicode(config=True,
+        help="""The directory of the checkpoint store.
+
+        Checkpoints of all files are stored there, deduplicated:
+        notebooks are stored cell by cell and output by output,
+        and other files in chunks, and identical cells, outputs and chunks
+        are only stored once, across checkpoints and across files.
+
+        By default, it is the `store` subdirectory of the checkpoint directory
+        of the root directory.
+        """
+    )
+    def _checkpoint_store_dir_default(self):
+        return os.path.join(self.root_dir, self.checkpoint_dir, 'store')
+
+    max_checkpoints = Integer(5, config=True,
+        help="""The maximum number of checkpoints to keep per file.
+
+        When a checkpoint is created beyond this number, the oldest ones are deleted.
+        """
+    )
+    checkpoint_store = Instance(CheckpointStore)
+    def _checkpoint_store_default(self):
+        return CheckpointStore(self.checkpoint_store_dir, log=self.log)
+
+    checkpoint_gc_interval = Integer(3600, config=True,
+        help="""The interval, in seconds, at which to remove the unreferenced blobs
+        of the checkpoint store on a background thread.
+
+        Blobs are removed when the checkpoints referencing them are deleted,
+        but some can be left, e.g. by another process sharing the store.
+        0 disables it.
+        """
+    )
+    _checkpoint_gc = None
+    _checkpoint_gc_running = False
+
+    cache_listings = Bool(True, config=True,
+        help="""Cache directory listings.
+
+        Cached listings are invalidated when the directory changes,
+        via inotify where available (requires pyinotify),
+        or else after `listing_cache_ttl` seconds.
+        """
+    )
+    listing_cache_ttl = Float(5, config=True,
+        help="How long (in seconds) directory listings are cached, if inotify is not available."
+    )
+    listing_cache_size = Integer(1000, config=True,
+        help="The maximum number of directory listings to cache."
+    )
+    listing_cache = Instance(ListingCache)
+    def _listing_cache_default(self):
+        return ListingCache(ttl=self.listing_cache_ttl,
+            max_dirs=self.listing_cache_size,
+            log=self.log,
+        )
+
+    def _hide_globs_changed(self):
+        # listings are cached after filtering
+        self.listing_cache.invalidate()
+
+    def _invalidate_listing(self, os_path):
+        """Drop the cached listing of the directory containing os_path"""
+        self.listing_cache.invalidate(os.path.dirname(os_path))
+
+    background_save = Bool(True, config=True,
+        help="""Save files on a background thread, when saved via the REST API,
+        so that saving large notebooks doesn't block the server.
+
+        Requires concurrent.futures (the futures package on Python 2).
+        """
+    )
+    _save_executor = None
+
+    save_metrics = Dict(
+        help="""Timings of the stages of saving files, by stage.
+
+        Each stage has a count, and the total, max and last duration in seconds.
+        """
+    )
+
+    @contextmanager
+    def _timed(self, stage):
+        """Record the duration of a stage of saving in save_metrics"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            dt = time.time() - start
+            m = self.save_metrics.setdefault(stage, dict(count=0, total=0., max=0., last=0.))
+            m['count'] += 1
+            m['total'] += dt
+            m['max'] = max(m['max'], dt)
+            m['last'] = dt
+
     def _copy(self, src, dest):
         """copy src to dest
 
@@ -205,20 +312,60 @@ def _dir_model(self, name, path='', content=True):
         model['type'] = 'directory'
         dir_path = u'{}/{}'.format(path, name)
         if content:
-            model['content'] = contents = []
-            for os_path in glob.glob(self._get_os_path('*', dir_path)):
-                name = os.path.basename(os_path)
-                # skip over broken symlinks in listing
-                if not os.path.exists(os_path):
-                    self.log.warn("%s doesn't exist", os_path)
-                    continue
-                if self.should_list(name) and not is_hidden(os_path, self.root_dir):
-                    contents.append(self.get_model(name=name, path=dir_path, content=False))
-
+            dir_path = dir_path.strip('/')
+            model['content'] = [
+                self._listing_model(entry, dir_path) for entry in self._list_dir(os_path)
+            ]
             model['format'] = 'json'
 
         return model
 
+    def _list_dir(self, os_path):
+        """List the visible entries of a directory
+
+        Returns a list of (name, type, mtime, ctime) tuples,
+        from a single pass over the directory or from the listing cache.
+        """
+        dir_stat = os.stat(os_path)
+        if self.cache_listings:
+            listing = self.listing_cache.get(os_path, dir_stat)
+            if listing is not None:
+                return listing
+
+        listing = []
+        for name, st in scan_directory(os_path):
+            if st is None:
+                # skip over broken symlinks in listing
+                self.log.warn("%s doesn't exist", os.path.join(os_path, name))
+                continue
+            if not self.should_list(name) or entry_is_hidden(os_path, name, st):
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                type_ = 'directory'
+            elif name.endswith('.ipynb'):
+                type_ = 'notebook'
+            else:
+                type_ = 'file'
+            listing.append((name, type_, st.st_mtime, st.st_ctime))
+
+        if self.cache_listings:
+            self.listing_cache.set(os_path, dir_stat, listing)
+        return listing
+
+    def _listing_model(self, entry, path):
+        """Build a model without content from an entry of _list_dir"""
+        name, type_, mtime, ctime = entry
+        return {
+            'name': name,
+            'path': path,
+            'type': type_,
+            'last_modified': tz.utcfromtimestamp(mtime),
+            'created': tz.utcfromtimestamp(ctime),
+            'content': None,
+            'format': None,
+            'message': None,
+        }
+
     def _file_model(self, name, path='', content=True):
         """Build a model for a file
 
@@ -295,18 +442,34 @@ def get_model(self, name, path='', content=True):
     def _save_notebook(self, os_path, model, name='', path=''):
         """save a notebook file"""
         # Save the notebook file
-        nb = current.to_notebook_json(model['content'])
+        with self._timed('convert'):
+            nb = current.to_notebook_json(model['content'])
 
-        self.check_and_sign(nb, name, path)
+        with self._timed('sign'):
+            self.check_and_sign(nb, name, path)
 
         if 'name' in nb['metadata']:
             nb['metadata']['name'] = u''
 
-        with atomic_writing(os_path, encoding='utf-8') as f:
-            current.write(nb, f, version=nb.nbformat)
+        with self._timed('write'):
+            with atomic_writing(os_path, encoding='utf-8') as f:
+                current.write(nb, f, version=nb.nbformat)
+
+    def open_file(self, name, path=''):
+        """Open a file for reading, as a binary file object"""
+        path = path.strip('/')
+        os_path = self._get_os_path(name, path)
+        if not os.path.isfile(os_path):
+            raise web.HTTPError(404, u'No such file: %s/%s' % (path, name))
+        return io.open(os_path, 'rb')
 
     def _save_file(self, os_path, model, name='', path=''):
-        """save a non-notebook file"""
+        """save a non-notebook file
+
+        Large files can be saved in chunks, numbered from 1 in model['chunk'],
+        with -1 for the last chunk.
+        The first chunk replaces the file, and later chunks are appended to it.
+        """
         fmt = model.get('format', None)
         if fmt not in {'text', 'base64'}:
             raise web.HTTPError(400, "Must specify format of file contents as 'text' or 'base64'")
@@ -319,8 +482,15 @@ def _save_file(self, os_path, model, name='', path=''):
                 bcontent = base64.decodestring(b64_bytes)
         except Exception as e:
             raise web.HTTPError(400, u'Encoding error saving %s: %s' % (os_path, e))
-        with atomic_writing(os_path, text=False) as f:
-            f.write(bcontent)
+        chunk = model.get('chunk', None)
+        if chunk is None or chunk == 1:
+            with atomic_writing(os_path, text=False) as f:
+                f.write(bcontent)
+        else:
+            if not os.path.isfile(os_path):
+                raise web.HTTPError(400, u'Cannot append chunk %i to missing file %s' % (chunk, os_path))
+            with io.open(os_path, 'ab') as f:
+                f.write(bcontent)
 
     def _save_directory(self, os_path, model, name='', path=''):
         """create a directory"""
@@ -333,17 +503,43 @@ def _save_directory(self, os_path, model, name='', path=''):
         else:
             self.log.debug("Directory %r already exists", os_path)
 
+    def save_async(self, model, name='', path=''):
+        """Save the file model on a background thread.
+
+        Returns a Future for the model with no content.
+        Saves happen one at a time, in order.
+        """
+        if not self.background_save or ThreadPoolExecutor is None:
+            return super(FileContentsManager, self).save_async(model, name, path)
+        if self._save_executor is None:
+            self._save_executor = ThreadPoolExecutor(1)
+        return self._save_executor.submit(self.save, model, name, path)
+
     def save(self, model, name='', path=''):
         """Save the file model and return the model with no content."""
+        with self._timed('save'):
+            model = self._save(model, name, path)
+        self.log.debug("Saved %s/%s in %.3fs",
+            path.strip('/'), name, self.save_metrics['save']['last'])
+        return model
+
+    def _save(self, model, name='', path=''):
+        """Save the file model (the untimed part of save)"""
         path = path.strip('/')
 
         if 'type' not in model:
             raise web.HTTPError(400, u'No file type provided')
         if 'content' not in model and model['type'] != 'directory':
             raise web.HTTPError(400, u'No file content provided')
+        chunk = model.get('chunk', None)
+        if chunk is not None:
+            if model['type'] != 'file':
+                raise web.HTTPError(400, u'Only files can be saved in chunks')
+            if not isinstance(chunk, int) or chunk == 0 or chunk < -1:
+                raise web.HTTPError(400, u'Invalid chunk: %r' % chunk)
 
         # One checkpoint should always exist
-        if self.file_exists(name, path) and not self.list_checkpoints(name, path):
+        if chunk in (None, 1) and self.file_exists(name, path) and not self.list_checkpoints(name, path):
             self.create_checkpoint(name, path)
 
         new_path = model.get('path', path).strip('/')
@@ -367,10 +563,13 @@ def save(self, model, name='', path=''):
             raise
         except Exception as e:
             raise web.HTTPError(400, u'Unexpected error while saving file: %s %s' % (os_path, e))
+        finally:
+            self._invalidate_listing(os_path)
 
         validation_message = None
         if model['type'] == 'notebook':
-            self.validate_notebook_model(model)
+            with self._timed('validate'):
+                self.validate_notebook_model(model)
             validation_message = model.get('message', None)
 
         model = self.get_model(new_name, new_path, content=False)
@@ -406,19 +605,22 @@ def delete(self, name, path=''):
             raise web.HTTPError(404, u'File does not exist: %s' % os_path)
 
         # clear checkpoints
-        for checkpoint in self.list_checkpoints(name, path):
-            checkpoint_id = checkpoint['id']
-            cp_path = self.get_checkpoint_path(checkpoint_id, name, path)
-            if os.path.isfile(cp_path):
-                self.log.debug("Unlinking checkpoint %s", cp_path)
-                os.unlink(cp_path)
+        cp_path = self.get_checkpoint_path(u'checkpoint', name, path)
+        if os.path.isfile(cp_path):
+            self.log.debug("Unlinking checkpoint %s", cp_path)
+            os.unlink(cp_path)
+        # of the file, or of all the files in the directory
+        self.checkpoint_store.delete_all(self._api_path(name, path))
+        self.checkpoint_store.collect()
 
         if os.path.isdir(os_path):
             self.log.debug("Removing directory %s", os_path)
             shutil.rmtree(os_path)
+            self.listing_cache.invalidate(os_path)
         else:
             self.log.debug("Unlinking file %s", os_path)
             rm(os_path)
+        self._invalidate_listing(os_path)
 
     def rename(self, old_name, old_path, new_name, new_path):
         """Rename a file."""
@@ -439,21 +641,34 @@ def rename(self, old_name, old_path, new_name, new_path):
             shutil.move(old_os_path, new_os_path)
         except Exception as e:
             raise web.HTTPError(500, u'Unknown error renaming file: %s %s' % (old_os_path, e))
+        finally:
+            self._invalidate_listing(old_os_path)
+            self._invalidate_listing(new_os_path)
+        self.listing_cache.invalidate(old_os_path)
 
         # Move the checkpoints
-        old_checkpoints = self.list_checkpoints(old_name, old_path)
-        for cp in old_checkpoints:
-            checkpoint_id = cp['id']
-            old_cp_path = self.get_checkpoint_path(checkpoint_id, old_name, old_path)
-            new_cp_path = self.get_checkpoint_path(checkpoint_id, new_name, new_path)
-            if os.path.isfile(old_cp_path):
-                self.log.debug("Renaming checkpoint %s -> %s", old_cp_path, new_cp_path)
-                shutil.move(old_cp_path, new_cp_path)
+        old_cp_path = self.get_checkpoint_path(u'checkpoint', old_name, old_path)
+        new_cp_path = self.get_checkpoint_path(u'checkpoint', new_name, new_path)
+        if os.path.isfile(old_cp_path):
+            self.log.debug("Renaming checkpoint %s -> %s", old_cp_path, new_cp_path)
+            shutil.move(old_cp_path, new_cp_path)
+        self.checkpoint_store.move(
+            self._api_path(old_name, old_path),
+            self._api_path(new_name, new_path),
+        )
 
     # Checkpoint-related utilities
+    #
+    # Checkpoints are kept in the checkpoint store.
+    # The single `checkpoint` file per file kept in the checkpoint directory
+    # by earlier versions is still listed, restored and deleted,
+    # with the id 'checkpoint'.
+
+    def _api_path(self, name, path=''):
+        return url_path_join(path, name).strip('/')
 
     def get_checkpoint_path(self, checkpoint_id, name, path=''):
-        """find the path to a checkpoint"""
+        """find the path to a checkpoint in the checkpoint directory"""
         path = path.strip('/')
         basename, ext = os.path.splitext(name)
         filename = u"{name}-{checkpoint_id}{ext}".format(
@@ -467,75 +682,155 @@ def get_checkpoint_path(self, checkpoint_id, name, path=''):
         cp_path = os.path.join(cp_dir, filename)
         return cp_path
 
+    def _legacy_checkpoint_path(self, checkpoint_id, name, path=''):
+        """The path of a checkpoint file in the checkpoint directory, if it exists"""
+        if checkpoint_id != u'checkpoint':
+            return None
+        cp_path = self.get_checkpoint_path(checkpoint_id, name, path)
+        if os.path.isfile(cp_path):
+            return cp_path
+
     def get_checkpoint_model(self, checkpoint_id, name, path=''):
         """construct the info dict for a given checkpoint"""
         path = path.strip('/')
-        cp_path = self.get_checkpoint_path(checkpoint_id, name, path)
-        stats = os.stat(cp_path)
-        last_modified = tz.utcfromtimestamp(stats.st_mtime)
-        info = dict(
+        cp_path = self._legacy_checkpoint_path(checkpoint_id, name, path)
+        if cp_path is not None:
+            created = os.stat(cp_path).st_mtime
+        else:
+            manifest = self.checkpoint_store.get(self._api_path(name, path), checkpoint_id)
+            if manifest is None:
+                raise web.HTTPError(404,
+                    u'Checkpoint does not exist: %s%s-%s' % (path, name, checkpoint_id)
+                )
+            created = manifest['created']
+        return self._checkpoint_model(checkpoint_id, created)
+
+    def _checkpoint_model(self, checkpoint_id, created):
+        return dict(
             id = checkpoint_id,
-            last_modified = last_modified,
+            last_modified = tz.utcfromtimestamp(created),
         )
-        return info
 
     # public checkpoint API
 
     def create_checkpoint(self, name, path=''):
-        """Create a checkpoint from the current state of a file"""
+        """Create a checkpoint from the current state of a file
+
+        The oldest checkpoints beyond `max_checkpoints` are deleted.
+        """
         path = path.strip('/')
         src_path = self._get_os_path(name, path)
-        # only the one checkpoint ID:
-        checkpoint_id = u"checkpoint"
-        cp_path = self.get_checkpoint_path(checkpoint_id, name, path)
-        self.log.debug("creating checkpoint for %s", name)
-        self._copy(src_path, cp_path)
+        checkpoint_id = unicode_type(uuid.uuid4())
+        self.log.debug("creating checkpoint %s for %s", checkpoint_id, name)
+        manifest = self.checkpoint_store.create(self._api_path(name, path), src_path, checkpoint_id)
+
+        checkpoints = self.list_checkpoints(name, path)
+        if len(checkpoints) > self.max_checkpoints > 0:
+            for cp in checkpoints[:-self.max_checkpoints]:
+                self._delete_checkpoint(cp['id'], name, path)
+            self.checkpoint_store.collect()
 
         # return the checkpoint info
-        return self.get_checkpoint_model(checkpoint_id, name, path)
+        return self._checkpoint_model(checkpoint_id, manifest['created'])
 
     def list_checkpoints(self, name, path=''):
-        """list the checkpoints for a given file
-
-        This contents manager currently only supports one checkpoint per file.
-        """
+        """list the checkpoints for a given file, oldest first"""
         path = path.strip('/')
-        checkpoint_id = "checkpoint"
-        os_path = self.get_checkpoint_path(checkpoint_id, name, path)
-        if not os.path.exists(os_path):
-            return []
-        else:
-            return [self.get_checkpoint_model(checkpoint_id, name, path)]
-
+        checkpoints = [ self._checkpoint_model(m['id'], m['created'])
+            for m in self.checkpoint_store.list(self._api_path(name, path)) ]
+        cp_path = self._legacy_checkpoint_path(u'checkpoint', name, path)
+        if cp_path is not None:
+            checkpoints.insert(0, self.get_checkpoint_model(u'checkpoint', name, path))
+            checkpoints.sort(key=lambda cp: cp['last_modified'])
+        return checkpoints
 
     def restore_checkpoint(self, checkpoint_id, name, path=''):
         """restore a file to a checkpointed state"""
         path = path.strip('/')
         self.log.info("restoring %s from checkpoint %s", name, checkpoint_id)
         nb_path = self._get_os_path(name, path)
-        cp_path = self.get_checkpoint_path(checkpoint_id, name, path)
-        if not os.path.isfile(cp_path):
-            self.log.debug("checkpoint file does not exist: %s", cp_path)
+        cp_path = self._legacy_checkpoint_path(checkpoint_id, name, path)
+        if cp_path is not None:
+            # ensure notebook is readable (never restore from an unreadable notebook)
+            if cp_path.endswith('.ipynb'):
+                with io.open(cp_path, 'r', encoding='utf-8') as f:
+                    current.read(f, u'json')
+            self._copy(cp_path, nb_path)
+            self.log.debug("copying %s -> %s", cp_path, nb_path)
+            self._invalidate_listing(nb_path)
+            return
+
+        manifest = self.checkpoint_store.get(self._api_path(name, path), checkpoint_id)
+        if manifest is None:
+            self.log.debug("checkpoint does not exist: %s-%s", name, checkpoint_id)
             raise web.HTTPError(404,
                 u'checkpoint does not exist: %s-%s' % (name, checkpoint_id)
             )
-        # ensure notebook is readable (never restore from an unreadable notebook)
-        if cp_path.endswith('.ipynb'):
-            with io.open(cp_path, 'r', encoding='utf-8') as f:
-                current.read(f, u'json')
-        self._copy(cp_path, nb_path)
-        self.log.debug("copying %s -> %s", cp_path, nb_path)
+        if manifest['format'] == 'notebook':
+            data = self.checkpoint_store.read(manifest)
+            # ensure notebook is readable (never restore from an unreadable notebook)
+            current.reads(data.decode('utf8'), u'json')
+            with atomic_writing(nb_path, text=False) as f:
+                f.write(data)
+        else:
+            self.checkpoint_store.restore(manifest, nb_path)
+        self._invalidate_listing(nb_path)
 
-    def delete_checkpoint(self, checkpoint_id, name, path=''):
-        """delete a file's checkpoint"""
+    def _delete_checkpoint(self, checkpoint_id, name, path=''):
+        """delete a checkpoint, without removing its unreferenced blobs"""
         path = path.strip('/')
-        cp_path = self.get_checkpoint_path(checkpoint_id, name, path)
-        if not os.path.isfile(cp_path):
+        cp_path = self._legacy_checkpoint_path(checkpoint_id, name, path)
+        if cp_path is not None:
+            self.log.debug("unlinking %s", cp_path)
+            os.unlink(cp_path)
+            return
+        api_path = self._api_path(name, path)
+        if self.checkpoint_store.get(api_path, checkpoint_id) is None:
             raise web.HTTPError(404,
                 u'Checkpoint does not exist: %s%s-%s' % (path, name, checkpoint_id)
             )
-        self.log.debug("unlinking %s", cp_path)
-        os.unlink(cp_path)
+        self.log.debug("deleting checkpoint %s of %s", checkpoint_id, api_path)
+        self.checkpoint_store.delete(api_path, checkpoint_id)
+
+    def delete_checkpoint(self, checkpoint_id, name, path=''):
+        """delete a file's checkpoint"""
+        self._delete_checkpoint(checkpoint_id, name, path)
+        self.checkpoint_store.collect()
+
+    def start_checkpoint_gc(self):
+        """Collect the checkpoint store now, and every checkpoint_gc_interval seconds
+
+        Collecting runs on a background thread, as it reads every checkpoint.
+        """
+        if not self.checkpoint_gc_interval or self._checkpoint_gc is not None:
+            return
+        self._checkpoint_gc = ioloop.PeriodicCallback(self._start_checkpoint_gc_thread,
+            1000 * self.checkpoint_gc_interval, ioloop.IOLoop.instance())
+        self._checkpoint_gc.start()
+        self._start_checkpoint_gc_thread()
+
+    def stop_checkpoint_gc(self):
+        if self._checkpoint_gc is not None:
+            self._checkpoint_gc.stop()
+            self._checkpoint_gc = None
+
+    def _start_checkpoint_gc_thread(self):
+        if self._checkpoint_gc_running:
+            return
+        self._checkpoint_gc_running = True
+        thread = threading.Thread(target=self._checkpoint_gc_thread,
+            name="CheckpointStoreGC")
+        thread.daemon = True
+        thread.start()
+
+    def _checkpoint_gc_thread(self):
+        try:
+            removed = self.checkpoint_store.gc()
+            self.log.debug("Removed %i unreferenced checkpoint blobs", removed)
+        except Exception:
+            self.log.error("Failed to collect the checkpoint store", exc_info=True)
+        finally:
+            self._checkpoint_gc_running = False
 
     def info_string(self):
         return "Serving notebooks from local directory: %s" % self.root_dir
@@ -5,7 +5,7 @@
 
 import json
 
-from tornado import web
+from tornado import gen, web
 
 from IPython.html.utils import url_path_join, url_escape
 from IPython.utils.jsonutil import date_default
@@ -58,6 +58,10 @@ def get(self, path='', name=None):
 
         A directory model contains a list of models (without content)
         of the files and directories it contains.
+
+        Directory listings can be paginated with the `offset` and `limit`
+        query arguments, in which case the model's `total` is the length
+        of the whole listing.
         """
         path = path or ''
         model = self.contents_manager.get_model(name=name, path=path)
@@ -65,8 +69,29 @@ def get(self, path='', name=None):
             # group listing by type, then by name (case-insensitive)
             # FIXME: sorting should be done in the frontends
             model['content'].sort(key=sort_key)
+            offset = self._int_argument('offset')
+            limit = self._int_argument('limit')
+            if offset is not None or limit is not None:
+                content = model['content']
+                offset = offset or 0
+                end = None if limit is None else offset + limit
+                model['total'] = len(content)
+                model['content'] = content[offset:end]
         self._finish_model(model, location=False)
 
+    def _int_argument(self, name):
+        """Get a non-negative integer query argument, or None if unspecified"""
+        value = self.get_argument(name, None)
+        if value is None:
+            return None
+        try:
+            value = int(value)
+        except ValueError:
+            value = -1
+        if value < 0:
+            raise web.HTTPError(400, u'Invalid %s: %r' % (name, self.get_argument(name)))
+        return value
+
     @web.authenticated
     @json_errors
     def patch(self, path='', name=None):
@@ -119,10 +144,11 @@ def _create_empty_file(self, path, name=None, ext='.ipynb'):
         self.set_status(201)
         self._finish_model(model)
 
+    @gen.coroutine
     def _save(self, model, path, name):
         """Save an existing file."""
         self.log.info(u"Saving file at %s/%s", path, name)
-        model = self.contents_manager.save(model, name, path)
+        model = yield self.contents_manager.save_async(model, name, path)
         if model['path'] != path.strip('/') or model['name'] != name:
             # a rename happened, set Location header
             location = True
@@ -173,7 +199,9 @@ def post(self, path='', name=None):
             self._create_empty_file(path)
 
     @web.authenticated
+    @web.asynchronous
     @json_errors
+    @gen.coroutine
     def put(self, path='', name=None):
         """Saves the file in the location specified by name and path.
 
@@ -204,7 +232,7 @@ def put(self, path='', name=None):
                     raise web.HTTPError(400, "Can't upload and copy at the same time.")
                 self._copy(copy_from, path, name)
             elif self.contents_manager.file_exists(name, path):
-                self._save(model, path, name)
+                yield self._save(model, path, name)
             else:
                 self._upload(model, path, name)
         else:
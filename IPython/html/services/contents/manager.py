@@ -3,16 +3,21 @@
 # Copyright (c) IPython Development Team.
 # Distributed under the terms of the Modified BSD License.
 
+import base64
 from fnmatch import fnmatch
+import io
 import itertools
 import json
 import os
 
+from tornado.concurrent import Future
 from tornado.web import HTTPError
 
 from IPython.config.configurable import LoggingConfigurable
 from IPython.nbformat import current, sign
-from IPython.utils.traitlets import Instance, Unicode, List
+from IPython.utils.traitlets import Instance, Integer, Unicode, List
+
+from .digests import DigestCache, cell_digest, cells_of, notebook_digest
 
 
 class ContentsManager(LoggingConfigurable):
@@ -65,6 +70,21 @@ def _notary_default(self):
         help="The base name used when creating untitled directories."
     )
 
+    digest_cache_size = Integer(10000, config=True,
+        help="""The number of cell and notebook digests to remember.
+
+        Cells already known to be valid are not validated again,
+        and notebooks already signed are not signed again.
+        """
+    )
+    valid_cells_cache = Instance(DigestCache)
+    def _valid_cells_cache_default(self):
+        return DigestCache(self.digest_cache_size)
+
+    signature_cache = Instance(DigestCache)
+    def _signature_cache_default(self):
+        return DigestCache(self.digest_cache_size)
+
     # ContentsManager API part 1: methods that must be
     # implemented in subclasses.
 
@@ -152,6 +172,38 @@ def save(self, model, name, path=''):
         """Save the file or directory and return the model with no content."""
         raise NotImplementedError('must be implemented in a subclass')
 
+    def open_file(self, name, path=''):
+        """Open a file for reading, as a binary file object.
+
+        Used to serve files without building their models.
+        Subclasses should override this to read from storage incrementally.
+        By default, it reads the file's model.
+        """
+        model = self.get_model(name, path)
+        if model['type'] == 'directory':
+            raise HTTPError(400, u'%s/%s is a directory' % (path, name))
+        content = model['content']
+        if model['format'] == 'base64':
+            data = base64.decodestring(content.encode('ascii'))
+        elif model['format'] == 'json':
+            data = json.dumps(content).encode('utf8')
+        else:
+            data = content.encode('utf8')
+        return io.BytesIO(data)
+
+    def save_async(self, model, name, path=''):
+        """Save the file or directory, and return a Future for its model.
+
+        Subclasses can override this to save without blocking the server.
+        By default, it calls :meth:`save`.
+        """
+        future = Future()
+        try:
+            future.set_result(self.save(model, name, path))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
     def update(self, model, name, path=''):
         """Update the file or directory and return the model with no content.
 
@@ -218,13 +270,33 @@ def increment_filename(self, filename, path=''):
         return name
 
     def validate_notebook_model(self, model):
-        """Add failed-validation message to model"""
+        """Add failed-validation message to model
+
+        Cells that have been validated before are not validated again.
+        """
+        nb = model['content']
+        digests = []
+        if 'worksheets' in nb:
+            # validate a copy of the notebook without the known-valid cells
+            worksheets = []
+            for ws, cells in zip(nb['worksheets'], cells_of(nb)):
+                new_cells = []
+                for cell in cells:
+                    digest = cell_digest(cell)
+                    if digest not in self.valid_cells_cache:
+                        digests.append(digest)
+                        new_cells.append(cell)
+                worksheets.append(dict(ws, cells=new_cells))
+            nb = dict(nb, worksheets=worksheets)
         try:
-            current.validate(model['content'])
+            current.validate(nb)
         except current.ValidationError as e:
             model['message'] = 'Notebook Validation failed: {}:\n{}'.format(
                 e.message, json.dumps(e.instance, indent=1, default=lambda obj: '<UNKNOWN>'),
             )
+        else:
+            for digest in digests:
+                self.valid_cells_cache.set(digest)
         return model
 
     def create_file(self, model=None, path='', ext='.ipynb'):
@@ -318,7 +390,14 @@ def check_and_sign(self, nb, name='', path=''):
         if nb['nbformat'] != current.nbformat:
             return
         if self.notary.check_cells(nb):
-            self.notary.sign(nb)
+            # notebooks saved again without changes are not signed again
+            key = u'%s:%s' % (self.notary.algorithm, notebook_digest(nb))
+            signature = self.signature_cache.get(key)
+            if signature is None:
+                self.notary.sign(nb)
+                self.signature_cache.set(key, nb['metadata']['signature'])
+            else:
+                nb['metadata']['signature'] = signature
         else:
             self.log.warn("Saving untrusted notebook %s/%s", path, name)
 
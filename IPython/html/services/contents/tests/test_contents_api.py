@@ -34,16 +34,16 @@ class API(object):
     def __init__(self, base_url):
         self.base_url = base_url
 
-    def _req(self, verb, path, body=None):
+    def _req(self, verb, path, body=None, params=None):
         response = requests.request(verb,
                 url_path_join(self.base_url, 'api/contents', path),
-                data=body,
+                data=body, params=params,
         )
         response.raise_for_status()
         return response
 
-    def list(self, path='/'):
-        return self._req('GET', path)
+    def list(self, path='/', **params):
+        return self._req('GET', path, params=params)
 
     def read(self, name, path='/'):
         return self._req('GET', url_path_join(path, name))
@@ -201,6 +201,16 @@ def test_list_dirs(self):
         dir_names = {normalize('NFC', d['name']) for d in dirs}
         self.assertEqual(dir_names, self.top_level_dirs)  # Excluding hidden dirs
 
+    def test_list_paginated(self):
+        names = [ m['name'] for m in self.api.list('foo').json()['content'] ]
+        model = self.api.list('foo', offset=1, limit=2).json()
+        self.assertEqual(model['total'], len(names))
+        self.assertEqual([ m['name'] for m in model['content'] ], names[1:3])
+        model = self.api.list('foo', offset=2).json()
+        self.assertEqual([ m['name'] for m in model['content'] ], names[2:])
+        with assert_http_error(400):
+            self.api.list('foo', limit=-1)
+
     def test_list_nonexistant_dir(self):
         with assert_http_error(404):
             self.api.list('nonexistant')
@@ -2,6 +2,7 @@
 """Tests for the notebook manager."""
 from __future__ import print_function
 
+import base64
 import logging
 import os
 
@@ -10,12 +11,15 @@
 from tempfile import NamedTemporaryFile
 
 from IPython.nbformat import current
+from IPython.nbformat.sign import NotebookNotary
 
 from IPython.utils.tempdir import TemporaryDirectory
 from IPython.utils.traitlets import TraitError
 from IPython.html.utils import url_path_join
 from IPython.testing import decorators as dec
 
+from ..checkpointstore import _hash
+from ..dircache import ListingCache
 from ..filemanager import FileContentsManager
 from ..manager import ContentsManager
 
@@ -70,6 +74,180 @@ def test_checkpoint_subdir(self):
         self.assertEqual(cp_dir, os.path.join(root, fm.checkpoint_dir, cp_name))
         self.assertEqual(cp_subdir, os.path.join(root, subd, fm.checkpoint_dir, cp_name))
 
+    def test_listing(self):
+        with TemporaryDirectory() as td:
+            fm = FileContentsManager(root_dir=td)
+            for name in ('a.txt', 'b.ipynb', '.hidden', 'c.pyc'):
+                open(os.path.join(td, name), 'w').close()
+            os.mkdir(os.path.join(td, 'sub'))
+            os.mkdir(os.path.join(td, '.hiddendir'))
+            model = fm.get_model(None, '')
+            types = dict((m['name'], m['type']) for m in model['content'])
+            self.assertEqual(types, {
+                'a.txt': 'file',
+                'b.ipynb': 'notebook',
+                'sub': 'directory',
+            })
+            for m in model['content']:
+                self.assertEqual(m, fm.get_model(m['name'], '', content=False))
+
+    def test_save_chunks(self):
+        with TemporaryDirectory() as td:
+            fm = FileContentsManager(root_dir=td)
+            chunks = [b'a' * 10, b'b' * 10, b'c' * 5]
+            for i, data in enumerate(chunks):
+                model = {
+                    'type': 'file',
+                    'format': 'base64',
+                    'content': base64.b64encode(data).decode('ascii'),
+                    'chunk': -1 if i == len(chunks) - 1 else i + 1,
+                }
+                fm.save(model, 'data.bin')
+            with fm.open_file('data.bin') as f:
+                self.assertEqual(f.read(), b''.join(chunks))
+            # the first chunk replaces the file
+            model['chunk'] = 1
+            fm.save(model, 'data.bin')
+            with fm.open_file('data.bin') as f:
+                self.assertEqual(f.read(), b'c' * 5)
+            model['chunk'] = 0
+            self.assertRaises(HTTPError, fm.save, model, 'data.bin')
+            model['chunk'] = 2
+            self.assertRaises(HTTPError, fm.save, model, 'missing.bin')
+
+    def test_checkpoints(self):
+        with TemporaryDirectory() as td:
+            fm = FileContentsManager(root_dir=td, max_checkpoints=3)
+            store = fm.checkpoint_store
+            store.gc_min_age = 0
+            def count_blobs():
+                blobs = os.path.join(store.root, 'blobs')
+                return sum(len(files) for _, _, files in os.walk(blobs))
+
+            nb = current.new_notebook(worksheets=[current.new_worksheet()])
+            cells = nb.worksheets[0].cells
+            for i in range(5):
+                output = current.new_output('stream', output_text=u'output %i' % i)
+                cells.append(current.new_code_cell(u'cell %i' % i, outputs=[output]))
+            model = {'type': 'notebook', 'content': nb}
+            fm.save(model, 'a.ipynb')
+            fm.create_checkpoint('a.ipynb')
+            self.assertEqual(count_blobs(), 10)
+
+            # unchanged cells and outputs are only stored once
+            cells[0].input = u'changed'
+            fm.save(model, 'a.ipynb')
+            cp = fm.create_checkpoint('a.ipynb')
+            self.assertEqual(count_blobs(), 11)
+            self.assertEqual(fm.list_checkpoints('a.ipynb')[-1], cp)
+
+            # restore
+            cells[0].input = u'lost'
+            fm.save(model, 'a.ipynb')
+            fm.restore_checkpoint(cp['id'], 'a.ipynb')
+            restored = fm.get_model('a.ipynb')['content']
+            self.assertEqual(restored.worksheets[0].cells[0].input, u'changed')
+            self.assertEqual(len(restored.worksheets[0].cells), 5)
+
+            # the oldest checkpoints are deleted, and their blobs collected
+            for i in range(3):
+                fm.create_checkpoint('a.ipynb')
+            checkpoints = fm.list_checkpoints('a.ipynb')
+            self.assertEqual(len(checkpoints), 3)
+            self.assertNotIn(cp, checkpoints)
+            self.assertEqual(count_blobs(), 10)
+
+            # checkpoints follow renames, and are deleted with their file
+            fm.rename('a.ipynb', '', 'b.ipynb', '')
+            self.assertEqual(fm.list_checkpoints('a.ipynb'), [])
+            self.assertEqual(fm.list_checkpoints('b.ipynb'), checkpoints)
+            fm.delete('b.ipynb')
+            self.assertEqual(fm.list_checkpoints('b.ipynb'), [])
+            self.assertEqual(count_blobs(), 0)
+
+    def test_file_checkpoints(self):
+        with TemporaryDirectory() as td:
+            fm = FileContentsManager(root_dir=td)
+            fm.checkpoint_store.chunk_size = 4
+            def count_blobs():
+                blobs = os.path.join(fm.checkpoint_store.root, 'blobs')
+                return sum(len(files) for _, _, files in os.walk(blobs))
+            model = {'type': 'file', 'format': 'text', 'content': u'aaaabbbbcc'}
+            fm.save(model, 'a.txt')
+            cp = fm.create_checkpoint('a.txt')
+            self.assertEqual(count_blobs(), 3)
+            model['content'] = u'aaaa'
+            fm.save(model, 'a.txt')
+            fm.restore_checkpoint(cp['id'], 'a.txt')
+            self.assertEqual(fm.get_model('a.txt')['content'], u'aaaabbbbcc')
+            fm.delete_checkpoint(cp['id'], 'a.txt')
+            self.assertEqual(fm.list_checkpoints('a.txt'), [])
+            self.assertRaises(HTTPError, fm.restore_checkpoint, cp['id'], 'a.txt')
+
+    def test_checkpoint_blob_refs(self):
+        with TemporaryDirectory() as td:
+            fm = FileContentsManager(root_dir=td)
+            store = fm.checkpoint_store
+            store.gc_min_age = 0
+            store.chunk_size = 4
+            def blob_exists(data):
+                return os.path.exists(store._blob_path(_hash(data)))
+            for name in ('a.txt', 'b.txt'):
+                fm.save({'type': 'file', 'format': 'text', 'content': u'sharedmine'},
+                        name)
+            cp = fm.create_checkpoint('a.txt')
+            fm.create_checkpoint('b.txt')
+            # left by another process
+            store.put_blob(b'orphan')
+            # the blobs shared with b.txt are kept
+            fm.delete_checkpoint(cp['id'], 'a.txt')
+            self.assertEqual(fm.list_checkpoints('a.txt'), [])
+            self.assertTrue(blob_exists(b'shar'))
+            # only the blobs of deleted checkpoints are looked at
+            self.assertTrue(blob_exists(b'orphan'))
+            self.assertEqual(store.gc(), 1)
+            self.assertFalse(blob_exists(b'orphan'))
+            fm.delete('b.txt')
+            self.assertEqual(sum(len(files) for _, _, files in
+                os.walk(os.path.join(store.root, 'blobs'))), 0)
+
+    def test_legacy_checkpoint(self):
+        with TemporaryDirectory() as td:
+            fm = FileContentsManager(root_dir=td)
+            with open(os.path.join(td, 'a.txt'), 'w') as f:
+                f.write('old')
+            with open(fm.get_checkpoint_path('checkpoint', 'a.txt'), 'w') as f:
+                f.write('checkpoint')
+            self.assertEqual([cp['id'] for cp in fm.list_checkpoints('a.txt')], ['checkpoint'])
+            fm.create_checkpoint('a.txt')
+            self.assertEqual(len(fm.list_checkpoints('a.txt')), 2)
+            fm.restore_checkpoint('checkpoint', 'a.txt')
+            self.assertEqual(fm.get_model('a.txt')['content'], u'checkpoint')
+            fm.delete_checkpoint('checkpoint', 'a.txt')
+            self.assertEqual(len(fm.list_checkpoints('a.txt')), 1)
+
+    def test_listing_cache(self):
+        with TemporaryDirectory() as td:
+            fm = FileContentsManager(root_dir=td)
+            fm.listing_cache = ListingCache(use_inotify=False)
+            open(os.path.join(td, 'a.txt'), 'w').close()
+            def list_names():
+                # an old directory mtime, which the cache trusts
+                os.utime(td, (1e9, 1e9))
+                return sorted(m['name'] for m in fm.get_model(None, '')['content'])
+            self.assertEqual(list_names(), ['a.txt'])
+            # changes not made through the manager are only seen on expiry
+            open(os.path.join(td, 'b.txt'), 'w').close()
+            self.assertEqual(list_names(), ['a.txt'])
+            # changes made through the manager invalidate the listing
+            fm.save({'type': 'file', 'format': 'text', 'content': u'c'}, 'c.txt')
+            self.assertEqual(list_names(), ['a.txt', 'b.txt', 'c.txt'])
+            fm.delete('a.txt')
+            self.assertEqual(list_names(), ['b.txt', 'c.txt'])
+            fm.cache_listings = False
+            open(os.path.join(td, 'd.txt'), 'w').close()
+            self.assertEqual(list_names(), ['b.txt', 'c.txt', 'd.txt'])
+
 
 class TestContentsManager(TestCase):
 
@@ -80,6 +258,9 @@ def setUp(self):
             root_dir=self.td,
             log=logging.getLogger()
         )
+        # don't trust notebooks signed by other tests
+        self.contents_manager.notary = NotebookNotary(db_file=':memory:',
+            parent=self.contents_manager)
 
     def tearDown(self):
         self._temp_dir.cleanup()
@@ -332,3 +513,53 @@ def test_check_and_sign(self):
         cm.mark_trusted_cells(nb, name, path)
         cm.check_and_sign(nb, name, path)
         assert cm.notary.check_signature(nb)
+
+    def test_sign_cached(self):
+        cm = self.contents_manager
+        nb, name, path = self.new_notebook()
+        cm.trust_notebook(name, path)
+        nb = cm.get_model(name, path)['content']
+        cm.mark_trusted_cells(nb, name, path)
+        cm.check_and_sign(nb, name, path)
+        signature = nb['metadata']['signature']
+
+        # unchanged notebooks are signed from the cache
+        cm.notary.sign = None
+        cm.mark_trusted_cells(nb, name, path)
+        cm.check_and_sign(nb, name, path)
+        self.assertEqual(nb['metadata']['signature'], signature)
+        del cm.notary.sign
+
+        # changed notebooks are signed again
+        self.add_code_cell(nb)
+        cm.notary.mark_cells(nb, True)
+        cm.check_and_sign(nb, name, path)
+        self.assertNotEqual(nb['metadata']['signature'], signature)
+        assert cm.notary.check_signature(nb)
+
+    def test_validate_cached(self):
+        cm = self.contents_manager
+        nb, name, path = self.new_notebook()
+        model = cm.get_model(name, path)
+        self.assertIsNone(model['message'])
+        n = len(cm.valid_cells_cache)
+        self.assertGreater(n, 0)
+        cm.validate_notebook_model(model)
+        self.assertEqual(len(cm.valid_cells_cache), n)
+
+        # invalid cells are never cached
+        nb = model['content']
+        self.add_code_cell(nb)
+        nb.worksheets[0].cells[-1]['input'] = 5
+        cm.validate_notebook_model(model)
+        self.assertIn('Notebook Validation failed', model['message'])
+        self.assertEqual(len(cm.valid_cells_cache), n)
+
+    def test_save_metrics(self):
+        cm = self.contents_manager
+        nb, name, path = self.new_notebook()
+        for stage in ('save', 'convert', 'sign', 'write', 'validate'):
+            self.assertIn(stage, cm.save_metrics)
+        m = cm.save_metrics['save']
+        self.assertEqual(m['count'], 2)
+        self.assertGreaterEqual(m['total'], m['max'])
@@ -4,17 +4,18 @@
 # Distributed under the terms of the Modified BSD License.
 
 import json
-import logging
 from tornado import gen, web
 from tornado.concurrent import Future
 from tornado.ioloop import IOLoop
 
+from IPython.kernel.zmq.session import Session
 from IPython.utils.jsonutil import date_default
 from IPython.utils.py3compat import cast_unicode
 from IPython.html.utils import url_path_join, url_escape
 
 from ...base.handlers import IPythonHandler, json_errors
 from ...base.zmqhandlers import AuthenticatedZMQStreamHandler, deserialize_binary_message
+from .multiplexer import IOPubMultiplexer
 
 from IPython.core.release import kernel_protocol_version
 
@@ -24,10 +25,12 @@ class MainKernelHandler(IPythonHandler):
     @json_errors
     def get(self):
         km = self.kernel_manager
-        self.finish(json.dumps(km.list_kernels()))
+        self.finish(json.dumps(km.list_kernels(), default=date_default))
 
     @web.authenticated
+    @web.asynchronous
     @json_errors
+    @gen.coroutine
     def post(self):
         km = self.kernel_manager
         model = self.get_json_body()
@@ -38,12 +41,12 @@ def post(self):
         else:
             model.setdefault('name', km.default_kernel_name)
 
-        kernel_id = km.start_kernel(kernel_name=model['name'])
+        kernel_id = yield km.start_kernel_async(kernel_name=model['name'])
         model = km.kernel_model(kernel_id)
         location = url_path_join(self.base_url, 'api', 'kernels', kernel_id)
         self.set_header('Location', url_escape(location))
         self.set_status(201)
-        self.finish(json.dumps(model))
+        self.finish(json.dumps(model, default=date_default))
 
 
 class KernelHandler(IPythonHandler):
@@ -56,13 +59,15 @@ def get(self, kernel_id):
         km = self.kernel_manager
         km._check_kernel_id(kernel_id)
         model = km.kernel_model(kernel_id)
-        self.finish(json.dumps(model))
+        self.finish(json.dumps(model, default=date_default))
 
     @web.authenticated
+    @web.asynchronous
     @json_errors
+    @gen.coroutine
     def delete(self, kernel_id):
         km = self.kernel_manager
-        km.shutdown_kernel(kernel_id)
+        yield km.shutdown_kernel_async(kernel_id)
         self.set_status(204)
         self.finish()
 
@@ -70,17 +75,19 @@ def delete(self, kernel_id):
 class KernelActionHandler(IPythonHandler):
 
     @web.authenticated
+    @web.asynchronous
     @json_errors
+    @gen.coroutine
     def post(self, kernel_id, action):
         km = self.kernel_manager
         if action == 'interrupt':
-            km.interrupt_kernel(kernel_id)
+            yield km.interrupt_kernel_async(kernel_id)
             self.set_status(204)
         if action == 'restart':
-            km.restart_kernel(kernel_id)
+            yield km.restart_kernel_async(kernel_id)
             model = km.kernel_model(kernel_id)
             self.set_header('Location', '{0}api/kernels/{1}'.format(self.base_url, kernel_id))
-            self.write(json.dumps(model))
+            self.write(json.dumps(model, default=date_default))
         self.finish()
 
 
@@ -99,51 +106,20 @@ def create_stream(self):
         self.zmq_stream = meth(self.kernel_id, identity=self.session.bsession)
     
     def request_kernel_info(self):
-        """send a request for kernel_info"""
-        km = self.kernel_manager
-        kernel = km.get_kernel(self.kernel_id)
-        try:
-            # check for cached value
-            kernel_info = kernel._kernel_info
-        except AttributeError:
-            self.log.debug("Requesting kernel info from %s", self.kernel_id)
-            # Create a kernel_info channel to query the kernel protocol version.
-            # This channel will be closed after the kernel_info reply is received.
-            if self.kernel_info_channel is None:
-                self.kernel_info_channel = km.connect_shell(self.kernel_id)
-            self.kernel_info_channel.on_recv(self._handle_kernel_info_reply)
-            self.session.send(self.kernel_info_channel, "kernel_info_request")
-        else:
-            # use cached value, don't resend request
-            self._finish_kernel_info(kernel_info)
-        return self._kernel_info_future
-    
-    def _handle_kernel_info_reply(self, msg):
-        """process the kernel_info_reply
-        
-        enabling msg spec adaptation, if necessary
+        """request the kernel_info of the kernel
+
+        The reply is cached by the kernel manager, and shared by all handlers.
         """
-        idents,msg = self.session.feed_identities(msg)
-        try:
-            msg = self.session.deserialize(msg)
-        except:
-            self.log.error("Bad kernel_info reply", exc_info=True)
-            self._kernel_info_future.set_result(None)
-            return
-        else:
-            info = msg['content']
-            self.log.debug("Received kernel info: %s", info)
-            if msg['msg_type'] != 'kernel_info_reply' or 'protocol_version' not in info:
-                self.log.error("Kernel info request failed, assuming current %s", info)
+        future = self.kernel_manager.kernel_info(self.kernel_id)
+        def finish(f):
+            info = f.result()
+            if info is None:
+                if not self._kernel_info_future.done():
+                    self._kernel_info_future.set_result(None)
             else:
-                kernel = self.kernel_manager.get_kernel(self.kernel_id)
-                kernel._kernel_info = info
-            self._finish_kernel_info(info)
-        
-        # close the kernel_info channel, we don't need it anymore
-        if self.kernel_info_channel:
-            self.kernel_info_channel.close()
-        self.kernel_info_channel = None
+                self._finish_kernel_info(info)
+        future.add_done_callback(finish)
+        return self._kernel_info_future
     
     def _finish_kernel_info(self, info):
         """Finish handling kernel_info reply
@@ -162,7 +138,6 @@ def initialize(self):
         super(ZMQChannelHandler, self).initialize()
         self.zmq_stream = None
         self.kernel_id = None
-        self.kernel_info_channel = None
         self._kernel_info_future = Future()
     
     @gen.coroutine
@@ -202,7 +177,8 @@ def open(self, kernel_id):
                 self.stream.close()
             self.close()
         else:
-            self.zmq_stream.on_recv(self._on_zmq_reply)
+            if self.zmq_stream is not None:
+                self.zmq_stream.on_recv(self._on_zmq_reply)
 
     def on_message(self, msg):
         if self.zmq_stream is None:
@@ -216,6 +192,11 @@ def on_message(self, msg):
         else:
             msg = json.loads(msg)
         self.session.send(self.zmq_stream, msg)
+        self.kernel_manager.record_activity(self.kernel_id)
+
+    def _on_zmq_reply(self, msg_list):
+        self.kernel_manager.record_activity(self.kernel_id)
+        super(ZMQChannelHandler, self)._on_zmq_reply(msg_list)
 
     def on_close(self):
         # This method can be called twice, once by self.kernel_died and once
@@ -230,39 +211,38 @@ def on_close(self):
 
 
 class IOPubHandler(ZMQChannelHandler):
+    """IOPub websocket, sharing the IOPub connection to the kernel with the other ones"""
     channel = 'iopub'
-    
+    multiplexer = None
+
+    @property
+    def iopub_queue_size(self):
+        """The number of IOPub messages queued for a websocket before it is closed"""
+        return self.settings.get('iopub_queue_size', 1000)
+
+    @property
+    def iopub_buffer_size(self):
+        """The number of bytes written to a websocket, not yet sent, before writes wait"""
+        return self.settings.get('iopub_buffer_size', 1024 * 1024)
+
     def create_stream(self):
-        super(IOPubHandler, self).create_stream()
         km = self.kernel_manager
-        km.add_restart_callback(self.kernel_id, self.on_kernel_restarted)
-        km.add_restart_callback(self.kernel_id, self.on_restart_failed, 'dead')
+        self.multiplexer = IOPubMultiplexer.for_kernel(km, self.kernel_id,
+            session=Session(config=self.config), log=self.log,
+            max_queue=self.iopub_queue_size, relay=self.relay_messages,
+            max_buffer=self.iopub_buffer_size,
+        )
+        self.multiplexer.attach(self, last_msg_id=self.get_argument('last_msg_id', None))
+        km.connection_opened(self.kernel_id)
     
     def on_close(self):
         km = self.kernel_manager
-        if self.kernel_id in km:
-            km.remove_restart_callback(
-                self.kernel_id, self.on_kernel_restarted,
-            )
-            km.remove_restart_callback(
-                self.kernel_id, self.on_restart_failed, 'dead',
-            )
+        if self.multiplexer is not None:
+            self.multiplexer.detach(self)
+            self.multiplexer = None
+            km.connection_closed(self.kernel_id)
         super(IOPubHandler, self).on_close()
-    
-    def _send_status_message(self, status):
-        msg = self.session.msg("status",
-            {'execution_state': status}
-        )
-        self.write_message(json.dumps(msg, default=date_default))
-
-    def on_kernel_restarted(self):
-        logging.warn("kernel %s restarted", self.kernel_id)
-        self._send_status_message('restarting')
 
-    def on_restart_failed(self):
-        logging.error("kernel %s restarted failed!", self.kernel_id)
-        self._send_status_message('dead')
-    
     def on_message(self, msg):
         """IOPub messages make no sense"""
         pass
@@ -17,19 +17,122 @@
 #-----------------------------------------------------------------------------
 
 import os
+import time
+import uuid
 
-from tornado import web
+from tornado import gen, web
+from tornado.concurrent import Future
+from zmq.eventloop import ioloop
 
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from IPython.kernel.kernelspec import NATIVE_KERNEL_NAME
 from IPython.kernel.multikernelmanager import MultiKernelManager
-from IPython.utils.traitlets import List, Unicode, TraitError
+from IPython.utils.traitlets import (
+    Any, Bool, Dict, Float, Integer, List, Unicode, TraitError,
+)
+from IPython.utils.tz import utcnow
 
 from IPython.html.utils import to_os_path
-from IPython.utils.py3compat import getcwd
+from IPython.utils.py3compat import getcwd, unicode_type
 
 #-----------------------------------------------------------------------------
 # Classes
 #-----------------------------------------------------------------------------
 
+def _normalize_kernel_name(kernel_name):
+    if kernel_name == 'python':
+        return NATIVE_KERNEL_NAME
+    return kernel_name
+
+
+class PooledKernel(object):
+    """A kernel started ahead of time, waiting in the pool to be handed out"""
+
+    def __init__(self, kernel_id, km):
+        self.kernel_id = kernel_id
+        self.km = km
+        # whether the kernel has replied to its warm-up request
+        self.ready = False
+        # callback removing the kernel from the pool if it dies
+        self.on_dead = None
+        self.shell = None
+        self._request_id = None
+        # (msg_id, Future) of the request changing the working directory
+        self._cwd_request = None
+
+    def warm_up(self, code):
+        """Send the warm-up request, which marks the kernel ready when it is answered
+
+        Sends a kernel_info_request if there is no warm-up code.
+        """
+        self.shell = self.km.connect_shell()
+        self.shell.on_recv(self._on_reply)
+        session = self.km.session
+        if code:
+            content = dict(code=code, silent=True, store_history=False,
+                user_expressions={}, allow_stdin=False)
+            msg = session.msg('execute_request', content)
+        else:
+            msg = session.msg('kernel_info_request')
+        self._request_id = msg['header']['msg_id']
+        session.send(self.shell, msg)
+
+    def _on_reply(self, msg_list):
+        session = self.km.session
+        idents, msg_list = session.feed_identities(msg_list)
+        msg = session.unserialize(msg_list)
+        msg_id = msg['parent_header'].get('msg_id')
+        if self._cwd_request is not None and msg_id == self._cwd_request[0]:
+            future = self._cwd_request[1]
+            self._cwd_request = None
+            ok = msg['content'].get('status') == 'ok'
+            if not ok:
+                self.km.log.warn("Changing the working directory of pooled kernel %s failed: %s",
+                    self.kernel_id, msg['content'].get('evalue', ''))
+            future.set_result(ok)
+            return
+        if msg_id != self._request_id:
+            return
+        self.ready = True
+        if msg['content'].get('status', 'ok') != 'ok':
+            self.km.log.warn("Warm-up of pooled kernel %s failed: %s",
+                self.kernel_id, msg['content'].get('evalue', ''))
+
+    def bind_cwd(self, cwd):
+        """Change the working directory of the kernel, when it is handed out
+
+        Returns a Future for whether the kernel changed directory, which is
+        False if it failed to, or if the kernel is closed before it replies.
+        The request is sent after the warm-up request, on the same connection,
+        so the kernel handles it once it is warmed up. Clients connect on
+        other connections, whose requests the kernel can handle in any order,
+        so the kernel must not be handed out before the Future is resolved.
+        """
+        # kernels restart in the same directory
+        self.km._launch_args['cwd'] = cwd
+        code = u"__import__('os').chdir(%r)" % cwd
+        content = dict(code=code, silent=True, store_history=False,
+            user_expressions={}, allow_stdin=False)
+        msg = self.km.session.msg('execute_request', content)
+        future = Future()
+        self._cwd_request = (msg['header']['msg_id'], future)
+        self.km.session.send(self.shell, msg)
+        return future
+
+    def close(self):
+        if self._cwd_request is not None:
+            future = self._cwd_request[1]
+            self._cwd_request = None
+            future.set_result(False)
+        if self.shell is not None:
+            self.shell.on_recv(None)
+            self.shell.close()
+            self.shell = None
+
 
 class MappingKernelManager(MultiKernelManager):
     """A KernelManager that handles notebook mapping and HTTP error handling"""
@@ -41,6 +144,131 @@ def _kernel_manager_class_default(self):
 
     root_dir = Unicode(getcwd(), config=True)
 
+    kernel_pool = Dict(config=True,
+        help="""The number of idle kernels to keep started, by kernel name.
+
+        Starting a kernel for a session takes a kernel from the pool,
+        instead of waiting for a new kernel to import its libraries,
+        and the pool is refilled in the background.
+        Kernels are started in root_dir, and their working directory is changed
+        when they are handed out, so only kernels running Python can be pooled.
+        Only kernels started asynchronously, as by the REST API, are taken
+        from the pool, because handing out a kernel waits for it to
+        change directory.
+
+        For example, to keep 10 Python 3 kernels ready::
+
+            c.MappingKernelManager.kernel_pool = {'python3': 10}
+        """
+    )
+
+    kernel_pool_warmup = Dict(config=True,
+        help="""Code to run in pooled kernels when they start, by kernel name.
+
+        For example, to import large libraries before the kernels are used::
+
+            c.MappingKernelManager.kernel_pool_warmup = {
+                'python3': 'import numpy, pandas',
+            }
+        """
+    )
+
+    kernel_pool_timeout = Float(60, config=True,
+        help="""How long to wait, in seconds, for a pooled kernel to change directory
+        when it is handed out, before starting a new kernel instead.
+
+        A kernel still running its warm-up code changes directory once it is done.
+        """
+    )
+
+    # The idle kernels of the pool, by kernel name, oldest first
+    _pool = Dict()
+
+    iopub_replay_messages = Integer(1000, config=True,
+        help="""The number of recent IOPub messages kept for each kernel.
+
+        When a browser's websocket reconnects after its connection dropped,
+        it is sent the messages published since the last one it received,
+        if they are still kept. Set to 0 to keep no messages.
+        """
+    )
+
+    iopub_replay_bytes = Integer(10 * 1024 * 1024, config=True,
+        help="""The maximum total size of the recent IOPub messages kept for each kernel.
+
+        The oldest messages are evicted first.
+        """
+    )
+
+    iopub_msg_rate_limit = Float(1000, config=True,
+        help="""The maximum rate of IOPub messages from each kernel, in messages per second.
+
+        Once a kernel exceeds it, its stream messages are dropped until the end of
+        the rate window, and the browser is sent a notice with the number of
+        messages dropped. 0 disables the limit.
+        """
+    )
+
+    iopub_data_rate_limit = Float(10 * 1024 * 1024, config=True,
+        help="""The maximum rate of IOPub data from each kernel, in bytes per second.
+
+        Once a kernel exceeds it, its stream messages are dropped like when it
+        exceeds `iopub_msg_rate_limit`. 0 disables the limit.
+        """
+    )
+
+    iopub_rate_limit_window = Float(3, config=True,
+        help="""The window, in seconds, over which IOPub rates are measured."""
+    )
+
+    model_activity_interval = Float(60, config=True,
+        help="""How often, in seconds, the last_activity in kernel models is updated.
+
+        Kernel models are cached, e.g. in the list of sessions polled by every
+        open notebook, so the activity of busy kernels is reported only this
+        often, instead of invalidating the cache on every message.
+        """
+    )
+
+    cull_idle_timeout = Integer(0, config=True,
+        help="""Shut down kernels idle for longer than this, in seconds.
+
+        A kernel is idle when no messages have been sent to it or received from it
+        through the notebook server. 0 disables culling idle kernels.
+        """
+    )
+
+    cull_interval = Integer(300, config=True,
+        help="""The interval, in seconds, at which to check for idle kernels to cull."""
+    )
+
+    cull_connected = Bool(False, config=True,
+        help="""Whether to cull idle kernels that still have a browser connected."""
+    )
+
+    cull_busy = Bool(False, config=True,
+        help="""Whether to cull kernels that are busy, but have been silent for too long."""
+    )
+
+    cull_memory_percent = Float(0, config=True,
+        help="""Cull kernels sooner when the host's memory use exceeds this percentage.
+
+        When memory use is above this, kernels idle for longer than
+        cull_memory_idle_timeout are shut down, using the most memory first,
+        until memory use is back below it. Requires psutil. 0 disables it.
+        """
+    )
+
+    cull_memory_idle_timeout = Integer(600, config=True,
+        help="""Under memory pressure, shut down kernels idle for longer than this, in seconds."""
+    )
+
+    _culler = Any()
+
+    # Incremented whenever the model of a kernel may have changed,
+    # so that models built from them can be cached.
+    model_version = 0
+
     def _root_dir_changed(self, name, old, new):
         """Do a bit of validation of the root dir."""
         if not os.path.isabs(new):
@@ -54,6 +282,15 @@ def _root_dir_changed(self, name, old, new):
     # Methods for managing kernels and sessions
     #-------------------------------------------------------------------------
 
+    def remove_kernel(self, kernel_id):
+        """Remove a kernel, closing its shared IOPub connection"""
+        kernel = super(MappingKernelManager, self).remove_kernel(kernel_id)
+        self.model_version += 1
+        mux = getattr(kernel, '_iopub_multiplexer', None)
+        if mux is not None:
+            mux.close()
+        return kernel
+
     def _handle_kernel_died(self, kernel_id):
         """notice that a kernel died"""
         self.log.warn("Kernel %s died, removing from map.", kernel_id)
@@ -96,27 +333,464 @@ def start_kernel(self, kernel_id=None, path=None, kernel_name='python', **kwargs
                                             kernel_name=kernel_name, **kwargs)
             self.log.info("Kernel started: %s" % kernel_id)
             self.log.debug("Kernel args: %r" % kwargs)
-            # register callback for failed auto-restart
-            self.add_restart_callback(kernel_id,
-                lambda : self._handle_kernel_died(kernel_id),
-                'dead',
-            )
+            self._watch_kernel(kernel_id)
         else:
             self._check_kernel_id(kernel_id)
             self.log.info("Using existing kernel: %s" % kernel_id)
         return kernel_id
 
+    def _watch_kernel(self, kernel_id):
+        """register callback for failed auto-restart, and start tracking activity"""
+        self.add_restart_callback(kernel_id,
+            lambda : self._handle_kernel_died(kernel_id),
+            'dead',
+        )
+        self.add_restart_callback(kernel_id,
+            lambda : self._forget_kernel_info(kernel_id),
+        )
+        kernel = self.get_kernel(kernel_id)
+        kernel.last_activity = kernel.model_activity = utcnow()
+        kernel.execution_state = 'starting'
+        kernel.connections = 0
+        self.model_version += 1
+
+    #-------------------------------------------------------------------------
+    # kernel_info of kernels
+    #-------------------------------------------------------------------------
+
+    def kernel_info(self, kernel_id):
+        """Get the content of the kernel_info reply of a kernel
+
+        Returns a Future for the content, or for None if the kernel
+        sent an invalid reply. Valid replies are cached until the kernel
+        restarts, and concurrent calls share one request.
+        """
+        kernel = self.get_kernel(kernel_id)
+        info = getattr(kernel, '_kernel_info', None)
+        if info is not None:
+            future = Future()
+            future.set_result(info)
+            return future
+        request = getattr(kernel, '_kernel_info_request', None)
+        if request is not None:
+            return request[1]
+
+        self.log.debug("Requesting kernel info from %s", kernel_id)
+        # This channel will be closed after the kernel_info reply is received.
+        channel = self.connect_shell(kernel_id)
+        future = Future()
+        kernel._kernel_info_request = (channel, future)
+        channel.on_recv(lambda msg: self._handle_kernel_info_reply(kernel, msg))
+        kernel.session.send(channel, "kernel_info_request")
+        return future
+
+    def _close_kernel_info_request(self, kernel):
+        """Close the channel of the pending kernel_info request of a kernel
+
+        Returns the Future of the request, or None if there is no request.
+        """
+        request = getattr(kernel, '_kernel_info_request', None)
+        if request is None:
+            return None
+        kernel._kernel_info_request = None
+        channel, future = request
+        channel.on_recv(None)
+        channel.close()
+        return future
+
+    def _handle_kernel_info_reply(self, kernel, msg):
+        future = self._close_kernel_info_request(kernel)
+        if future is None:
+            return
+        session = kernel.session
+        idents, msg = session.feed_identities(msg)
+        try:
+            msg = session.deserialize(msg)
+        except:
+            self.log.error("Bad kernel_info reply", exc_info=True)
+            future.set_result(None)
+            return
+        info = msg['content']
+        self.log.debug("Received kernel info: %s", info)
+        if msg['msg_type'] != 'kernel_info_reply' or 'protocol_version' not in info:
+            self.log.error("Kernel info request failed, assuming current %s", info)
+        else:
+            kernel._kernel_info = info
+        future.set_result(info)
+
+    def _forget_kernel_info(self, kernel_id):
+        """Forget the kernel_info of a kernel that restarted"""
+        if kernel_id not in self:
+            return
+        kernel = self.get_kernel(kernel_id)
+        kernel._kernel_info = None
+        # the kernel won't reply to a request sent before it restarted
+        future = self._close_kernel_info_request(kernel)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    #-------------------------------------------------------------------------
+    # Activity, and culling idle kernels
+    #-------------------------------------------------------------------------
+
+    def record_activity(self, kernel_id, execution_state=None):
+        """Record that a message was sent to or received from a kernel
+
+        Called by the websocket handlers, with the execution_state of status messages.
+        """
+        if kernel_id not in self:
+            return
+        kernel = self.get_kernel(kernel_id)
+        kernel.last_activity = now = utcnow()
+        changed = False
+        if execution_state is not None and execution_state != kernel.execution_state:
+            kernel.execution_state = execution_state
+            changed = True
+        if (now - kernel.model_activity).total_seconds() >= self.model_activity_interval:
+            kernel.model_activity = now
+            changed = True
+        if changed:
+            self.model_version += 1
+
+    def connection_opened(self, kernel_id):
+        """Count a browser connected to a kernel"""
+        if kernel_id in self:
+            self.get_kernel(kernel_id).connections += 1
+            self.model_version += 1
+
+    def connection_closed(self, kernel_id):
+        """Count a browser disconnected from a kernel"""
+        if kernel_id in self:
+            kernel = self.get_kernel(kernel_id)
+            kernel.connections = max(kernel.connections - 1, 0)
+            self.model_version += 1
+
+    def start_culler(self):
+        """Start checking periodically for idle kernels to cull, if enabled"""
+        if not (self.cull_idle_timeout or self.cull_memory_percent):
+            return
+        if self.cull_memory_percent and psutil is None:
+            self.log.warn("Culling kernels under memory pressure requires psutil")
+        if self._culler is None:
+            self._culler = ioloop.PeriodicCallback(self.cull_kernels,
+                1000 * self.cull_interval, ioloop.IOLoop.instance())
+            self._culler.start()
+            self.log.info("Culling kernels idle for %is, checking every %is",
+                self.cull_idle_timeout, self.cull_interval)
+
+    def stop_culler(self):
+        if self._culler is not None:
+            self._culler.stop()
+            self._culler = None
+
+    def _idle_seconds(self, kernel_id):
+        """How long a kernel has been idle, or None if it can't be culled"""
+        kernel = self.get_kernel(kernel_id)
+        if not hasattr(kernel, 'last_activity'):
+            return None
+        if kernel.connections and not self.cull_connected:
+            return None
+        if kernel.execution_state == 'busy' and not self.cull_busy:
+            return None
+        return (utcnow() - kernel.last_activity).total_seconds()
+
+    def _memory_percent(self):
+        """The percentage of the host's memory in use, or None without psutil"""
+        if psutil is None:
+            return None
+        return psutil.virtual_memory().percent
+
+    def _kernel_rss(self, kernel_id):
+        """The resident memory of a kernel process, in bytes"""
+        km = self.get_kernel(kernel_id)
+        if psutil is None or not km.has_kernel:
+            return 0
+        try:
+            return psutil.Process(km.kernel.pid).memory_info().rss
+        except psutil.Error:
+            return 0
+
+    @gen.coroutine
+    def cull_kernels(self):
+        """Shut down the kernels idle for too long
+
+        Returns a Future for the list of the ids of the kernels shut down.
+        """
+        idle = {}
+        for kernel_id in self.list_kernel_ids():
+            seconds = self._idle_seconds(kernel_id)
+            if seconds is not None:
+                idle[kernel_id] = seconds
+
+        culled = []
+        if self.cull_idle_timeout:
+            for kernel_id, seconds in idle.items():
+                if seconds > self.cull_idle_timeout:
+                    self.log.warn("Culling kernel %s, idle for %is", kernel_id, seconds)
+                    yield self._cull_kernel(kernel_id)
+                    culled.append(kernel_id)
+
+        # under memory pressure, cull more kernels, using the most memory first
+        memory = self._memory_percent() if self.cull_memory_percent else None
+        if memory is not None and memory > self.cull_memory_percent:
+            candidates = [ kid for kid, seconds in idle.items()
+                if seconds > self.cull_memory_idle_timeout and kid not in culled ]
+            candidates.sort(key=self._kernel_rss, reverse=True)
+            for kernel_id in candidates:
+                if memory <= self.cull_memory_percent:
+                    break
+                self.log.warn("Memory use is %.0f%%, culling kernel %s, idle for %is",
+                    memory, kernel_id, idle[kernel_id])
+                yield self._cull_kernel(kernel_id)
+                culled.append(kernel_id)
+                memory = self._memory_percent()
+        raise gen.Return(culled)
+
+    @gen.coroutine
+    def _cull_kernel(self, kernel_id):
+        if kernel_id not in self:
+            return
+        try:
+            yield self.shutdown_kernel_async(kernel_id)
+        except Exception:
+            self.log.error("Failed to cull kernel %s", kernel_id, exc_info=True)
+
+    #-------------------------------------------------------------------------
+    # The pool of idle kernels
+    #-------------------------------------------------------------------------
+
+    def _pool_sizes(self):
+        return dict((_normalize_kernel_name(name), n) for name, n in self.kernel_pool.items())
+
+    def _pool_warmup(self, kernel_name):
+        for name, code in self.kernel_pool_warmup.items():
+            if _normalize_kernel_name(name) == kernel_name:
+                return code
+        return u''
+
+    def fill_pool(self):
+        """Start kernels until the pool has kernel_pool idle kernels of each kernel name"""
+        for kernel_name, size in self._pool_sizes().items():
+            pool = self._pool.setdefault(kernel_name, [])
+            while len(pool) < size:
+                pooled = self._start_pooled_kernel(kernel_name)
+                if pooled is None:
+                    break
+                pool.append(pooled)
+
+    def _start_pooled_kernel(self, kernel_name):
+        """Start a kernel for the pool, and send its warm-up request
+
+        The kernel is not in the mapping of kernels until it is handed out.
+        """
+        kernel_id = unicode_type(uuid.uuid4())
+        km = self.kernel_manager_factory(connection_file=os.path.join(
+                    self.connection_dir, "kernel-%s.json" % kernel_id),
+                    parent=self, autorestart=True, log=self.log, kernel_name=kernel_name,
+        )
+        if not (km.ipython_kernel or 'IPython.kernel' in km.kernel_spec.argv):
+            self.log.warn("Not pooling %s kernels, which don't run IPython", kernel_name)
+            self.kernel_pool.pop(kernel_name, None)
+            return None
+        km.start_kernel(extra_arguments=self.kernel_argv, cwd=self.root_dir)
+        pooled = PooledKernel(kernel_id, km)
+        pooled.on_dead = lambda : self._handle_pooled_kernel_died(kernel_name, pooled)
+        km.add_restart_callback(pooled.on_dead, 'dead')
+        pooled.warm_up(self._pool_warmup(kernel_name))
+        self.log.debug("Pooled kernel started: %s", kernel_id)
+        return pooled
+
+    def _handle_pooled_kernel_died(self, kernel_name, pooled):
+        self.log.warn("Pooled kernel %s died, removing from pool.", pooled.kernel_id)
+        pooled.close()
+        pool = self._pool.get(kernel_name, [])
+        if pooled in pool:
+            pool.remove(pooled)
+
+    @gen.coroutine
+    def _take_pooled_kernel(self, kernel_name, path):
+        """Hand out a kernel from the pool, preferring ready ones.
+
+        Returns a Future for its kernel_id, resolved once the kernel has changed
+        to the working directory of path, or for None if the pool is empty,
+        or if the kernel didn't change directory within kernel_pool_timeout.
+        """
+        kernel_name = _normalize_kernel_name(kernel_name or self.default_kernel_name)
+        pool = self._pool.get(kernel_name)
+        if not pool:
+            raise gen.Return(None)
+        ready = [ p for p in pool if p.ready ]
+        pooled = ready[0] if ready else pool[0]
+        pool.remove(pooled)
+        # refill the pool in the background
+        ioloop.IOLoop.instance().add_callback(self.fill_pool)
+        cwd = self.cwd_for_path(path) if path is not None else self.root_dir
+        try:
+            # if the kernel dies meanwhile, on_dead closes it, resolving this
+            ok = yield gen.with_timeout(time.time() + self.kernel_pool_timeout,
+                pooled.bind_cwd(cwd))
+        except gen.TimeoutError:
+            self.log.warn("Pooled kernel %s didn't change directory within %gs",
+                pooled.kernel_id, self.kernel_pool_timeout)
+            ok = False
+        if not ok:
+            self._discard_pooled_kernel(pooled)
+            raise gen.Return(None)
+        pooled.km.remove_restart_callback(pooled.on_dead, 'dead')
+        pooled.close()
+        kernel_id = pooled.kernel_id
+        self._kernels[kernel_id] = pooled.km
+        self._watch_kernel(kernel_id)
+        self.log.info("Kernel started from pool: %s", kernel_id)
+        raise gen.Return(kernel_id)
+
+    def _discard_pooled_kernel(self, pooled):
+        """Shut down a kernel taken from the pool, which can't be handed out"""
+        pooled.close()
+        pooled.km.remove_restart_callback(pooled.on_dead, 'dead')
+        if pooled.km.has_kernel:
+            self._shutdown_km_async(pooled.km, now=True)
+
+    def shutdown_pool(self):
+        """Shutdown the idle kernels of the pool"""
+        pooled = [ p for pool in self._pool.values() for p in pool ]
+        self._pool = {}
+        for p in pooled:
+            p.close()
+            p.km.stop_restarter()
+            p.km.request_shutdown()
+        for p in pooled:
+            p.km.finish_shutdown()
+            p.km.cleanup()
+
+    def shutdown_all(self, now=False):
+        """Shutdown all kernels, including the idle kernels of the pool."""
+        self.stop_culler()
+        self.shutdown_pool()
+        super(MappingKernelManager, self).shutdown_all(now=now)
+
     def shutdown_kernel(self, kernel_id, now=False):
         """Shutdown a kernel by kernel_id"""
         self._check_kernel_id(kernel_id)
         super(MappingKernelManager, self).shutdown_kernel(kernel_id, now=now)
 
+    def restart_kernel(self, kernel_id, now=False):
+        """Restart a kernel by kernel_id, keeping the same ports"""
+        self._check_kernel_id(kernel_id)
+        super(MappingKernelManager, self).restart_kernel(kernel_id, now=now)
+        self._forget_kernel_info(kernel_id)
+
+    #-------------------------------------------------------------------------
+    # Asynchronous kernel lifecycle
+    #
+    # These return Futures, and wait for kernel processes with IOLoop timeouts
+    # instead of sleeping, so they don't block the server.
+    #-------------------------------------------------------------------------
+
+    def _sleep(self, seconds):
+        """Future that resolves after `seconds`"""
+        loop = ioloop.IOLoop.instance()
+        return gen.Task(loop.add_timeout, time.time() + seconds)
+
+    @gen.coroutine
+    def _wait_for_exit(self, km, waittime, pollinterval=0.1):
+        """Wait up to `waittime` seconds for the kernel process to exit.
+
+        Returns whether it exited.
+        """
+        deadline = time.time() + waittime
+        while km.is_alive():
+            if time.time() > deadline:
+                raise gen.Return(False)
+            yield self._sleep(pollinterval)
+        raise gen.Return(True)
+
+    @gen.coroutine
+    def _kill_kernel_async(self, km):
+        """Kill a kernel process, and wait for it to exit"""
+        if not km.has_kernel:
+            return
+        try:
+            km.kernel.kill()
+        except OSError:
+            # the process has already exited
+            pass
+        yield self._wait_for_exit(km, waittime=float('inf'))
+        km.kernel = None
+
+    @gen.coroutine
+    def _shutdown_km_async(self, km, now=False, restart=False):
+        """The asynchronous equivalent of KernelManager.shutdown_kernel"""
+        km.stop_restarter()
+        if now:
+            yield self._kill_kernel_async(km)
+        else:
+            km.request_shutdown(restart=restart)
+            # give the kernel 1s to shut down cleanly, then kill it
+            exited = yield self._wait_for_exit(km, waittime=1)
+            if not exited:
+                yield self._kill_kernel_async(km)
+        km.cleanup(connection_file=not restart)
+
+    @gen.coroutine
+    def start_kernel_async(self, kernel_id=None, path=None, kernel_name='python', **kwargs):
+        """Start a kernel for a session, returning a Future for its kernel_id.
+
+        Takes a kernel from the pool if there is one, once it has changed
+        to the working directory of path. Otherwise, this is start_kernel
+        as a Future, because launching a kernel process doesn't block.
+        """
+        if kernel_id is None and not kwargs:
+            kernel_id = yield self._take_pooled_kernel(kernel_name, path)
+            if kernel_id is not None:
+                raise gen.Return(kernel_id)
+        raise gen.Return(self.start_kernel(kernel_id=kernel_id, path=path,
+            kernel_name=kernel_name, **kwargs))
+
+    @gen.coroutine
+    def shutdown_kernel_async(self, kernel_id, now=False):
+        """Shutdown a kernel by kernel_id, returning a Future"""
+        self._check_kernel_id(kernel_id)
+        km = self.get_kernel(kernel_id)
+        yield self._shutdown_km_async(km, now=now)
+        self.log.info("Kernel shutdown: %s" % kernel_id)
+        if kernel_id in self:
+            self.remove_kernel(kernel_id)
+
+    @gen.coroutine
+    def restart_kernel_async(self, kernel_id, now=False):
+        """Restart a kernel by kernel_id, keeping the same ports, returning a Future"""
+        self._check_kernel_id(kernel_id)
+        km = self.get_kernel(kernel_id)
+        if km._launch_args is None:
+            raise RuntimeError("Cannot restart the kernel. "
+                               "No previous call to 'start_kernel'.")
+        yield self._shutdown_km_async(km, now=now, restart=True)
+        km.start_kernel(**km._launch_args)
+        self._forget_kernel_info(kernel_id)
+        self.log.info("Kernel restarted: %s" % kernel_id)
+
+    @gen.coroutine
+    def interrupt_kernel_async(self, kernel_id):
+        """Interrupt a kernel by kernel_id, returning a Future
+
+        Interrupting only sends a signal, so this doesn't wait for anything.
+        """
+        self._check_kernel_id(kernel_id)
+        self.interrupt_kernel(kernel_id)
+
     def kernel_model(self, kernel_id):
         """Return a dictionary of kernel information described in the
         JSON standard model."""
         self._check_kernel_id(kernel_id)
+        kernel = self._kernels[kernel_id]
         model = {"id":kernel_id,
-                 "name": self._kernels[kernel_id].kernel_name}
+                 "name": kernel.kernel_name}
+        # kernels not started by start_kernel don't track activity
+        if hasattr(kernel, 'last_activity'):
+            model['last_activity'] = kernel.model_activity
+            model['execution_state'] = kernel.execution_state
+            model['connections'] = kernel.connections
         return model
 
     def list_kernels(self):
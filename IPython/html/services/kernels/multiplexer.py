@@ -0,0 +1,400 @@
+"""Sharing one IOPub connection to a kernel between websockets.
+
+Without sharing, each IOPub websocket has its own ZMQ socket to the kernel,
+and every message is verified, deserialized and serialized to JSON again for
+each websocket. An :class:`IOPubMultiplexer` subscribes to a kernel's IOPub
+channel once, serializes each message once, and writes the result to every
+attached websocket.
+
+It also keeps the most recent messages, so that a websocket reconnecting
+after its connection dropped can be sent the messages it missed,
+and throttles the stream output of kernels printing faster than
+a browser can render it.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import json
+import time
+from collections import OrderedDict, deque
+
+from tornado import ioloop
+from tornado.concurrent import Future
+
+from IPython.html.base.zmqhandlers import reserialize_reply
+from IPython.utils.jsonutil import date_default
+from IPython.utils.py3compat import cast_unicode
+
+
+def _buffered_bytes(handler):
+    """The number of bytes written to a websocket, but not sent yet
+
+    0 if the websocket's IOStream doesn't tell.
+    """
+    stream = getattr(handler, 'stream', None)
+    return getattr(stream, '_write_buffer_size', 0) or 0
+
+
+class _Client(object):
+    """A websocket attached to a multiplexer, and its queue of messages to send"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.queue = deque()
+        # whether we are waiting for earlier messages to be written to the websocket
+        self.writing = False
+
+
+class IOPubMultiplexer(object):
+    """Fan out the IOPub messages of one kernel to any number of websockets
+
+    Get the multiplexer for a kernel with :meth:`for_kernel`,
+    and :meth:`attach` and :meth:`detach` websocket handlers.
+    The IOPub socket is closed when the last handler is detached.
+
+    Messages are written to each websocket as soon as it has sent the previous ones.
+    Messages for a websocket that isn't keeping up are queued, and a websocket
+    with more than `max_queue` queued messages is closed as a slow consumer.
+    Clients reconnect, so it is better than buffering without limit.
+    Writes to a websocket also wait while more than `max_buffer` bytes
+    written to it haven't been sent yet.
+
+    The last `replay_messages` messages, up to `replay_bytes` bytes, are kept
+    and the IOPub socket stays open when no handler is attached, so that
+    handlers attaching with the id of the last message they received
+    are sent the messages published since. The ids of the last
+    `10 * replay_messages` evicted messages are kept too, so that handlers
+    whose last message was evicted are sent all the recent messages,
+    and handlers whose last message is unknown are sent none.
+
+    The status messages of kernel restarts, which the server sends,
+    are published like the kernel's messages.
+
+    A kernel publishing more than `msg_rate_limit` messages or `data_rate_limit`
+    bytes per second, measured over `rate_limit_window` seconds, has its stream
+    messages dropped until the end of the window. Other messages are never
+    dropped, because they carry state. The websockets are sent a notice on stderr
+    when output starts being dropped, and the number of messages dropped
+    at the end of the window.
+
+    Parameters
+    ----------
+    stream : ZMQStream
+        The stream of the kernel's IOPub channel.
+    session : Session
+        The session for deserializing messages.
+    max_queue : int
+        The maximum number of messages to queue per websocket.
+    relay : bool
+        Whether to relay messages without decoding their content.
+    replay_messages : int
+        The number of recent messages kept for reconnecting websockets.
+        0 disables replaying.
+    replay_bytes : int
+        The maximum total size of the recent messages kept.
+    max_buffer : int
+        The number of unsent bytes in a websocket above which writes wait.
+        0 disables waiting.
+    msg_rate_limit : float
+        The maximum number of messages per second. 0 disables the limit.
+    data_rate_limit : float
+        The maximum number of bytes per second. 0 disables the limit.
+    rate_limit_window : float
+        The window, in seconds, over which rates are measured.
+    """
+
+    def __init__(self, stream, session, log, max_queue=1000, relay=True,
+            replay_messages=0, replay_bytes=0, max_buffer=0,
+            msg_rate_limit=0, data_rate_limit=0, rate_limit_window=3):
+        self.stream = stream
+        self.session = session
+        self.log = log
+        self.max_queue = max_queue
+        self.relay = relay
+        self.replay_messages = replay_messages
+        self.replay_bytes = replay_bytes
+        self.max_buffer = max_buffer
+        self.msg_rate_limit = msg_rate_limit
+        self.data_rate_limit = data_rate_limit
+        self.rate_limit_window = rate_limit_window
+        # messages and bytes received in the current rate window
+        self._window_start = 0
+        self._window_msgs = 0
+        self._window_bytes = 0
+        # stream messages and bytes dropped in the current rate window,
+        # and the parent header of the last one dropped
+        self.dropped = 0
+        self.dropped_bytes = 0
+        self._dropped_parent = None
+        # timeout sending the number of messages dropped, at the end of the window
+        self._summary_timeout = None
+        # (msg_id, message, size) of recent messages, oldest first
+        self.recent = deque()
+        self.recent_bytes = 0
+        # ids of evicted messages, oldest first
+        self._evicted = OrderedDict()
+        self.clients = {}
+        self.on_empty = None
+        # called with the execution_state of status messages, or None for other messages
+        self.on_activity = None
+        stream.on_recv(self._on_zmq_reply)
+
+    @classmethod
+    def for_kernel(cls, kernel_manager, kernel_id, session, log, max_queue=1000, relay=True,
+            max_buffer=0):
+        """Get the multiplexer of a kernel, creating it if there is none
+
+        The replay buffer is sized by the kernel manager's
+        `iopub_replay_messages` and `iopub_replay_bytes`,
+        and the rate limits are its `iopub_msg_rate_limit`,
+        `iopub_data_rate_limit` and `iopub_rate_limit_window`.
+        """
+        kernel = kernel_manager.get_kernel(kernel_id)
+        mux = getattr(kernel, '_iopub_multiplexer', None)
+        if mux is None or mux.stream.closed():
+            mux = cls(kernel_manager.connect_iopub(kernel_id), session, log, max_queue, relay,
+                replay_messages=kernel_manager.iopub_replay_messages,
+                replay_bytes=kernel_manager.iopub_replay_bytes,
+                max_buffer=max_buffer,
+                msg_rate_limit=kernel_manager.iopub_msg_rate_limit,
+                data_rate_limit=kernel_manager.iopub_data_rate_limit,
+                rate_limit_window=kernel_manager.iopub_rate_limit_window,
+            )
+            kernel._iopub_multiplexer = mux
+            def restarting():
+                log.warn("kernel %s restarted", kernel_id)
+                mux.publish_status('restarting')
+            def dead():
+                log.error("kernel %s restarted failed!", kernel_id)
+                mux.publish_status('dead')
+            kernel_manager.add_restart_callback(kernel_id, restarting)
+            kernel_manager.add_restart_callback(kernel_id, dead, 'dead')
+            def clear():
+                if getattr(kernel, '_iopub_multiplexer', None) is mux:
+                    del kernel._iopub_multiplexer
+                if kernel_id in kernel_manager:
+                    kernel_manager.remove_restart_callback(kernel_id, restarting)
+                    kernel_manager.remove_restart_callback(kernel_id, dead, 'dead')
+            mux.on_empty = clear
+            mux.on_activity = lambda state: kernel_manager.record_activity(kernel_id, state)
+        return mux
+
+    def attach(self, handler, last_msg_id=None):
+        """Start sending messages to a websocket handler
+
+        If `last_msg_id` is given, the handler is first sent the recent messages
+        published after that one, all the recent messages if it was evicted,
+        or none if it is unknown.
+        """
+        client = self.clients[handler] = _Client(handler)
+        # messages are adapted to the protocol version of the kernel,
+        # which is the same for all handlers of the kernel
+        self.session.adapt_version = handler.session.adapt_version
+        if last_msg_id:
+            missed = self.missed_since(last_msg_id)
+            self.log.info("Replaying %i IOPub messages to %s", len(missed), handler)
+            client.queue.extend(missed)
+            self._flush(client)
+
+    def missed_since(self, last_msg_id):
+        """The recent messages published after the message last_msg_id
+
+        All the recent messages if last_msg_id has been evicted,
+        and none if it was never published here, e.g. before a server restart,
+        or evicted too long ago.
+        """
+        missed = []
+        for msg_id, msg, size in reversed(self.recent):
+            if msg_id == last_msg_id:
+                break
+            missed.append(msg)
+        else:
+            if last_msg_id not in self._evicted:
+                return []
+        missed.reverse()
+        return missed
+
+    def detach(self, handler):
+        """Stop sending messages to a websocket handler
+
+        Closes the IOPub stream when no handler is left,
+        unless recent messages are kept for reconnecting handlers.
+        """
+        self.clients.pop(handler, None)
+        if not self.clients and not self.replay_messages:
+            self.close()
+
+    def close(self):
+        if self._summary_timeout is not None:
+            ioloop.IOLoop.current().remove_timeout(self._summary_timeout)
+            self._summary_timeout = None
+        self.recent.clear()
+        self.recent_bytes = 0
+        self._evicted.clear()
+        if not self.stream.closed():
+            self.stream.on_recv(None)
+            socket = self.stream.socket
+            self.stream.close()
+            socket.close()
+        if self.on_empty is not None:
+            self.on_empty()
+            self.on_empty = None
+
+    def _on_zmq_reply(self, msg_list):
+        if not self.clients and not self.replay_messages:
+            return
+        try:
+            idents, parts = self.session.feed_identities(msg_list)
+            parts = [ getattr(p, 'bytes', p) for p in parts ]
+            header = self.session.unpack(parts[1])
+        except Exception:
+            self.log.critical("Malformed message: %r" % msg_list, exc_info=True)
+            return
+        if self.on_activity is not None:
+            state = None
+            if header['msg_type'] == 'status':
+                # status messages are small
+                state = self.session.unpack(parts[4]).get('execution_state')
+            self.on_activity(state)
+        # decide before serializing, so dropped messages cost little
+        if self._throttle(header, parts):
+            return
+        try:
+            msg = reserialize_reply(self.session, msg_list, relay=self.relay)
+        except Exception:
+            self.log.critical("Malformed message: %r" % msg_list, exc_info=True)
+            return
+        self._publish(header['msg_id'], msg)
+
+    def _publish(self, msg_id, msg):
+        """Keep a serialized message for replaying, and send it to every websocket"""
+        if self.replay_messages:
+            self._keep(msg_id, msg)
+        for client in list(self.clients.values()):
+            self._send(client, msg)
+
+    def _throttle(self, header, parts):
+        """Whether to drop a message, because the kernel exceeds the rate limits"""
+        if not (self.msg_rate_limit or self.data_rate_limit):
+            return False
+        now = time.time()
+        if now - self._window_start >= self.rate_limit_window:
+            # before the timeout sending it, if the IOLoop was busy
+            self._summarize_dropped()
+            self._window_start = now
+            self._window_msgs = self._window_bytes = 0
+        size = sum(len(p) for p in parts)
+        self._window_msgs += 1
+        self._window_bytes += size
+        window = self.rate_limit_window
+        if self.msg_rate_limit and self._window_msgs > self.msg_rate_limit * window:
+            limit = 'msg'
+        elif self.data_rate_limit and self._window_bytes > self.data_rate_limit * window:
+            limit = 'data'
+        else:
+            return False
+        if header['msg_type'] != 'stream':
+            return False
+        parent = self.session.unpack(parts[2])
+        if not self.dropped:
+            self.log.warn("IOPub %s rate exceeded, dropping stream output", limit)
+            # sent even if the kernel publishes nothing more
+            self._summary_timeout = ioloop.IOLoop.current().add_timeout(
+                self._window_start + window, self._summarize_dropped)
+            self._notify(parent,
+                u"IOPub %s rate exceeded.\n"
+                u"The notebook server will temporarily stop sending output\n"
+                u"to the client in order to avoid crashing it.\n"
+                u"To change this limit, set the config variable\n"
+                u"`--MappingKernelManager.iopub_%s_rate_limit`.\n" % (
+                    'message' if limit == 'msg' else 'data', limit))
+        self.dropped += 1
+        self.dropped_bytes += size
+        self._dropped_parent = parent
+        return True
+
+    def _summarize_dropped(self):
+        """Publish the number of messages dropped in the rate window, if any"""
+        if self._summary_timeout is not None:
+            ioloop.IOLoop.current().remove_timeout(self._summary_timeout)
+            self._summary_timeout = None
+        if self.dropped:
+            self._notify(self._dropped_parent,
+                u"%i output messages (%i bytes) were dropped.\n"
+                % (self.dropped, self.dropped_bytes))
+            self.dropped = self.dropped_bytes = 0
+
+    def _notify(self, parent, text):
+        """Publish a notice on stderr, as output of the request `parent`"""
+        msg = self.session.msg('stream', {'name': 'stderr', 'text': text}, parent=parent)
+        self._publish_msg(msg)
+
+    def publish_status(self, execution_state):
+        """Publish a status message on behalf of the kernel, e.g. when it restarts"""
+        self._publish_msg(self.session.msg('status', {'execution_state': execution_state}))
+
+    def _publish_msg(self, msg):
+        """Serialize and publish a message made by the server"""
+        msg['buffers'] = []
+        smsg = cast_unicode(json.dumps(msg, default=date_default))
+        self._publish(msg['header']['msg_id'], smsg)
+
+    def _keep(self, msg_id, msg):
+        """Keep a message for replaying, evicting the oldest ones beyond the limits"""
+        size = len(msg)
+        self.recent.append((msg_id, msg, size))
+        self.recent_bytes += size
+        while self.recent and (len(self.recent) > self.replay_messages
+                or self.recent_bytes > self.replay_bytes):
+            evicted_id, _, evicted = self.recent.popleft()
+            self.recent_bytes -= evicted
+            self._evicted[evicted_id] = None
+        while len(self._evicted) > 10 * self.replay_messages:
+            self._evicted.popitem(last=False)
+
+    def _send(self, client, msg):
+        if len(client.queue) >= self.max_queue:
+            self.log.warn("Closing websocket %s, which is %i IOPub messages behind",
+                client.handler, len(client.queue))
+            self.detach(client.handler)
+            client.handler.close()
+            return
+        client.queue.append(msg)
+        if not client.writing:
+            self._flush(client)
+
+    def _flush(self, client):
+        """Write the queued messages of a client
+
+        If the websocket can tell when they have been written (tornado >= 4.3),
+        later messages are queued until then.
+        """
+        handler = client.handler
+        future = None
+        while client.queue:
+            if (self.max_buffer and isinstance(future, Future)
+                    and _buffered_bytes(handler) > self.max_buffer):
+                # backpressure: the rest waits until what was written is sent
+                break
+            msg = client.queue.popleft()
+            if handler.stream.closed():
+                self.detach(handler)
+                return
+            future = handler.write_message(msg, binary=isinstance(msg, bytes))
+        if isinstance(future, Future) and not future.done():
+            client.writing = True
+            loop = ioloop.IOLoop.current()
+            future.add_done_callback(lambda f: loop.add_callback(self._on_written, client, f))
+        else:
+            client.writing = False
+
+    def _on_written(self, client, future):
+        client.writing = False
+        if client.handler not in self.clients:
+            return
+        if future.exception() is not None:
+            # the websocket was closed
+            self.detach(client.handler)
+            return
+        self._flush(client)
@@ -0,0 +1,252 @@
+"""Tests for the pool of kernels in the MappingKernelManager"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import os
+import time
+from datetime import timedelta
+from unittest import TestCase
+
+from zmq.eventloop import ioloop
+
+from IPython.kernel import BlockingKernelClient
+from IPython.kernel.kernelspec import NATIVE_KERNEL_NAME
+from IPython.utils.tempdir import TemporaryDirectory
+from IPython.utils.tz import utcnow
+
+from ..kernelmanager import MappingKernelManager
+
+
+class TestKernelPool(TestCase):
+
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        self.td = self._temp_dir.name
+        os.mkdir(os.path.join(self.td, 'sub'))
+        self.km = MappingKernelManager(root_dir=self.td, connection_dir=self.td,
+            kernel_pool={'python': 1},
+            kernel_pool_warmup={'python': 'warm = True'},
+        )
+        self.run_sync = ioloop.IOLoop.instance().run_sync
+
+    def tearDown(self):
+        self.km.shutdown_all()
+        self._temp_dir.cleanup()
+
+    def wait_for(self, condition, timeout=30):
+        loop = ioloop.IOLoop.instance()
+        deadline = time.time() + timeout
+        def check():
+            if condition() or time.time() > deadline:
+                loop.stop()
+        pc = ioloop.PeriodicCallback(check, 50, loop)
+        pc.start()
+        loop.start()
+        pc.stop()
+        self.assertTrue(condition())
+
+    def user_expression(self, kernel_id, expr):
+        kc = BlockingKernelClient(connection_file=self.km.get_kernel(kernel_id).connection_file)
+        kc.load_connection_file()
+        kc.start_channels()
+        try:
+            msg_id = kc.execute('', user_expressions={'x': expr})
+            reply = kc.get_shell_msg(timeout=30)
+            self.assertEqual(reply['parent_header']['msg_id'], msg_id)
+            return reply['content']['user_expressions']['x']['data']['text/plain']
+        finally:
+            kc.stop_channels()
+
+    def test_pool(self):
+        km = self.km
+        km.fill_pool()
+        pool = km._pool[NATIVE_KERNEL_NAME]
+        self.assertEqual(len(pool), 1)
+        pooled = pool[0]
+        # pooled kernels are not listed until they are handed out
+        self.assertEqual(km.list_kernels(), [])
+        self.wait_for(lambda : pooled.ready)
+
+        # start_kernel can't wait for the kernel to change directory
+        kernel_id = km.start_kernel(path='sub')
+        self.assertNotEqual(kernel_id, pooled.kernel_id)
+        self.assertIn(pooled, pool)
+
+        kernel_id = self.run_sync(lambda : km.start_kernel_async(path='sub'))
+        self.assertEqual(kernel_id, pooled.kernel_id)
+        self.assertIn(kernel_id, [k['id'] for k in km.list_kernels()])
+        self.assertNotIn(pooled, pool)
+        # the working directory is bound when the kernel is handed out
+        cwd = eval(self.user_expression(kernel_id, "__import__('os').getcwd()"))
+        self.assertEqual(os.path.realpath(cwd), os.path.realpath(os.path.join(self.td, 'sub')))
+        self.assertEqual(self.user_expression(kernel_id, 'warm'), 'True')
+        # without binding names in the user namespace
+        self.assertEqual(self.user_expression(kernel_id, "'os' in globals()"), 'False')
+
+        # the pool is refilled in the background
+        self.wait_for(lambda : len(pool) == 1)
+        self.assertNotEqual(pool[0].kernel_id, kernel_id)
+
+    def test_warming_up(self):
+        km = self.km
+        km.kernel_pool_warmup = {'python': 'import time; time.sleep(1); warm = True'}
+        km.fill_pool()
+        pooled = km._pool[NATIVE_KERNEL_NAME][0]
+        self.assertFalse(pooled.ready)
+        # handed out once it has warmed up and changed directory
+        kernel_id = self.run_sync(lambda : km.start_kernel_async(path='sub'), timeout=30)
+        self.assertEqual(kernel_id, pooled.kernel_id)
+        cwd = eval(self.user_expression(kernel_id, "__import__('os').getcwd()"))
+        self.assertEqual(os.path.realpath(cwd), os.path.realpath(os.path.join(self.td, 'sub')))
+        self.assertEqual(self.user_expression(kernel_id, 'warm'), 'True')
+
+    def test_timeout(self):
+        km = self.km
+        km.kernel_pool_warmup = {'python': 'import time; time.sleep(30)'}
+        km.kernel_pool_timeout = 0.5
+        km.fill_pool()
+        pooled = km._pool[NATIVE_KERNEL_NAME][0]
+        # a new kernel is started instead
+        kernel_id = self.run_sync(lambda : km.start_kernel_async(path='sub'), timeout=30)
+        self.assertNotEqual(kernel_id, pooled.kernel_id)
+        self.assertIn(kernel_id, km)
+
+
+class TestAsyncLifecycle(TestCase):
+
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        self.td = self._temp_dir.name
+        self.km = MappingKernelManager(root_dir=self.td, connection_dir=self.td)
+        self.run_sync = ioloop.IOLoop.instance().run_sync
+
+    def tearDown(self):
+        self.km.shutdown_all()
+        self._temp_dir.cleanup()
+
+    def test_lifecycle(self):
+        km = self.km
+        kernel_id = self.run_sync(lambda : km.start_kernel_async())
+        self.assertIn(kernel_id, km)
+        kernel = km.get_kernel(kernel_id).kernel
+
+        self.run_sync(lambda : km.interrupt_kernel_async(kernel_id))
+        self.run_sync(lambda : km.restart_kernel_async(kernel_id))
+        self.assertIsNotNone(kernel.poll())
+        self.assertTrue(km.is_alive(kernel_id))
+        kernel = km.get_kernel(kernel_id).kernel
+
+        self.run_sync(lambda : km.shutdown_kernel_async(kernel_id))
+        self.assertNotIn(kernel_id, km)
+        self.assertIsNotNone(kernel.poll())
+
+    def test_shutdown_now(self):
+        km = self.km
+        kernel_id = km.start_kernel()
+        kernel = km.get_kernel(kernel_id).kernel
+        self.run_sync(lambda : km.shutdown_kernel_async(kernel_id, now=True))
+        self.assertNotIn(kernel_id, km)
+        self.assertIsNotNone(kernel.poll())
+
+
+class PressuredKernelManager(MappingKernelManager):
+    """Pretends the host is out of memory until a kernel is shut down"""
+    rss = {}
+
+    def _memory_percent(self):
+        return 95 if len(self) == len(self.rss) else 50
+
+    def _kernel_rss(self, kernel_id):
+        return self.rss[kernel_id]
+
+
+class TestCulling(TestCase):
+
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        self.td = self._temp_dir.name
+        self.run_sync = ioloop.IOLoop.instance().run_sync
+
+    def tearDown(self):
+        self.km.shutdown_all()
+        self._temp_dir.cleanup()
+
+    def idle_for(self, kernel_id, seconds):
+        kernel = self.km.get_kernel(kernel_id)
+        kernel.last_activity = utcnow() - timedelta(seconds=seconds)
+
+    def test_cull_idle(self):
+        km = self.km = MappingKernelManager(root_dir=self.td, connection_dir=self.td,
+            cull_idle_timeout=60,
+        )
+        idle, active, connected, busy = [ km.start_kernel() for i in range(4) ]
+        for kid in (idle, connected, busy):
+            self.idle_for(kid, 120)
+        km.record_activity(active)
+        km.connection_opened(connected)
+        km.record_activity(busy, 'busy')
+        self.idle_for(busy, 120)
+
+        model = km.kernel_model(connected)
+        self.assertEqual(model['connections'], 1)
+        self.assertEqual(km.kernel_model(busy)['execution_state'], 'busy')
+
+        culled = self.run_sync(km.cull_kernels)
+        self.assertEqual(culled, [idle])
+        self.assertEqual(sorted(km.list_kernel_ids()), sorted([active, connected, busy]))
+
+        km.connection_closed(connected)
+        culled = self.run_sync(km.cull_kernels)
+        self.assertEqual(culled, [connected])
+
+    def test_cull_memory_pressure(self):
+        km = self.km = PressuredKernelManager(root_dir=self.td, connection_dir=self.td,
+            cull_memory_percent=90, cull_memory_idle_timeout=60,
+        )
+        small, large, recent = [ km.start_kernel() for i in range(3) ]
+        km.rss = {small: 1, large: 100, recent: 1000}
+        for kid in (small, large):
+            self.idle_for(kid, 120)
+        # the largest of the kernels idle for long enough is shut down,
+        # and only until memory use is below the threshold
+        culled = self.run_sync(km.cull_kernels)
+        self.assertEqual(culled, [large])
+        self.assertEqual(sorted(km.list_kernel_ids()), sorted([small, recent]))
+
+
+class TestKernelInfo(TestCase):
+
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        self.td = self._temp_dir.name
+        self.km = MappingKernelManager(root_dir=self.td, connection_dir=self.td)
+        self.run_sync = ioloop.IOLoop.instance().run_sync
+
+    def tearDown(self):
+        self.km.shutdown_all()
+        self._temp_dir.cleanup()
+
+    def test_kernel_info(self):
+        km = self.km
+        kernel_id = km.start_kernel()
+        kernel = km.get_kernel(kernel_id)
+        # concurrent requests share one request
+        f1 = km.kernel_info(kernel_id)
+        f2 = km.kernel_info(kernel_id)
+        self.assertIs(f1, f2)
+        info = self.run_sync(lambda : f1, timeout=30)
+        self.assertIn('protocol_version', info)
+        self.assertIsNone(kernel._kernel_info_request)
+
+        # cached
+        f3 = km.kernel_info(kernel_id)
+        self.assertTrue(f3.done())
+        self.assertIs(f3.result(), info)
+
+        # forgotten when the kernel restarts
+        self.run_sync(lambda : km.restart_kernel_async(kernel_id))
+        f4 = km.kernel_info(kernel_id)
+        self.assertFalse(f4.done())
+        self.assertEqual(self.run_sync(lambda : f4, timeout=30)['protocol_version'],
+            info['protocol_version'])
@@ -114,6 +114,8 @@ def test_kernel_handler(self):
         assert isinstance(kern1, dict)
         self.assertIn('id', kern1)
         self.assertEqual(kern1['id'], kid)
+        self.assertIn('last_activity', kern1)
+        self.assertEqual(kern1['connections'], 0)
 
         # Request a bad kernel id and check that a JSON
         # message is returned!
@@ -0,0 +1,312 @@
+"""Tests for sharing a kernel's IOPub connection between websockets"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import json
+import logging
+from unittest import TestCase
+
+from tornado import gen, ioloop
+from tornado.concurrent import Future
+
+from IPython.kernel.zmq.session import Session
+
+from ..multiplexer import IOPubMultiplexer
+
+
+class FakeStream(object):
+    """Stand-in for a ZMQStream or websocket IOStream"""
+    def __init__(self):
+        self.callback = None
+        self.socket = self
+        self._closed = False
+
+    def on_recv(self, callback):
+        self.callback = callback
+
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+
+class FakeHandler(object):
+    """Stand-in for an IOPub websocket handler
+
+    If futures is True, write_message returns a Future,
+    which isn't resolved until the test resolves it.
+    """
+    def __init__(self, futures=False):
+        self.session = Session()
+        self.stream = FakeStream()
+        self.futures = futures
+        self.pending = []
+        self.sent = []
+
+    def write_message(self, msg, binary=False):
+        self.sent.append(msg)
+        if self.futures:
+            f = Future()
+            self.pending.append(f)
+            return f
+
+    def close(self):
+        self.stream.close()
+
+
+class TestIOPubMultiplexer(TestCase):
+
+    def setUp(self):
+        self.session = Session()
+        self.stream = FakeStream()
+        self.mux = IOPubMultiplexer(self.stream, Session(key=self.session.key),
+            logging.getLogger(__name__), max_queue=2,
+        )
+
+    def publish(self, text):
+        msg = self.session.msg('stream', {'name': 'stdout', 'text': text})
+        self.stream.callback(self.session.serialize(msg))
+
+    def test_fan_out(self):
+        a = FakeHandler()
+        b = FakeHandler()
+        self.mux.attach(a)
+        self.mux.attach(b)
+        self.publish('hi')
+        self.assertEqual(len(a.sent), 1)
+        # serialized once, and the same message sent to both
+        self.assertIs(a.sent[0], b.sent[0])
+        self.assertEqual(json.loads(a.sent[0])['content']['text'], 'hi')
+
+    def test_detach_closes_stream(self):
+        a = FakeHandler()
+        b = FakeHandler()
+        self.mux.attach(a)
+        self.mux.attach(b)
+        self.mux.detach(a)
+        self.publish('hi')
+        self.assertEqual(a.sent, [])
+        self.assertEqual(len(b.sent), 1)
+        self.assertFalse(self.stream.closed())
+        self.mux.detach(b)
+        self.assertTrue(self.stream.closed())
+
+    def test_slow_consumer(self):
+        slow = FakeHandler(futures=True)
+        fast = FakeHandler()
+        self.mux.attach(slow)
+        self.mux.attach(fast)
+        # the first message is written, the next ones are queued
+        for i in range(3):
+            self.publish(str(i))
+        self.assertEqual(len(slow.sent), 1)
+        self.assertFalse(slow.stream.closed())
+        # one too many
+        self.publish('3')
+        self.assertTrue(slow.stream.closed())
+        self.assertNotIn(slow, self.mux.clients)
+        self.assertEqual(len(fast.sent), 4)
+        self.assertFalse(self.stream.closed())
+
+    def test_queue_flushed_when_written(self):
+        h = FakeHandler(futures=True)
+        self.mux.attach(h)
+        self.publish('0')
+        self.publish('1')
+        self.assertEqual(len(h.sent), 1)
+        # what the IOLoop calls once the first message has been written
+        f = h.pending.pop(0)
+        f.set_result(None)
+        self.mux._on_written(self.mux.clients[h], f)
+        self.assertEqual(len(h.sent), 2)
+        self.assertEqual(json.loads(h.sent[1])['content']['text'], '1')
+
+
+class TestReplay(TestCase):
+
+    def setUp(self):
+        self.session = Session()
+        self.stream = FakeStream()
+        self.mux = IOPubMultiplexer(self.stream, Session(key=self.session.key),
+            logging.getLogger(__name__), replay_messages=3, replay_bytes=10000,
+        )
+        self.msg_ids = []
+
+    def publish(self, text):
+        msg = self.session.msg('stream', {'name': 'stdout', 'text': text})
+        self.msg_ids.append(msg['header']['msg_id'])
+        self.stream.callback(self.session.serialize(msg))
+
+    def texts(self, handler):
+        return [ json.loads(msg)['content']['text'] for msg in handler.sent ]
+
+    def test_replay(self):
+        a = FakeHandler()
+        self.mux.attach(a)
+        self.publish('0')
+        self.mux.detach(a)
+        # messages are kept while no websocket is attached
+        self.assertFalse(self.stream.closed())
+        self.publish('1')
+        self.publish('2')
+        b = FakeHandler()
+        self.mux.attach(b, last_msg_id=self.msg_ids[0])
+        self.assertEqual(self.texts(b), ['1', '2'])
+
+    def test_no_replay_for_new_websockets(self):
+        self.publish('0')
+        a = FakeHandler()
+        self.mux.attach(a)
+        self.assertEqual(a.sent, [])
+
+    def test_evict_by_count(self):
+        for i in range(5):
+            self.publish(str(i))
+        self.assertEqual(len(self.mux.recent), 3)
+        a = FakeHandler()
+        # the last message seen was evicted: replay all the recent ones
+        self.mux.attach(a, last_msg_id=self.msg_ids[0])
+        self.assertEqual(self.texts(a), ['2', '3', '4'])
+
+    def test_unknown_id(self):
+        self.publish('0')
+        a = FakeHandler()
+        # e.g. a message published before the server restarted
+        self.mux.attach(a, last_msg_id='unknown')
+        self.assertEqual(a.sent, [])
+
+    def test_status_replayed(self):
+        self.publish('0')
+        self.mux.publish_status('restarting')
+        status_id = self.mux.recent[-1][0]
+        self.publish('1')
+        a = FakeHandler()
+        self.mux.attach(a, last_msg_id=self.msg_ids[0])
+        msgs = [ json.loads(msg) for msg in a.sent ]
+        self.assertEqual(msgs[0]['content'], {'execution_state': 'restarting'})
+        self.assertEqual(msgs[1]['content']['text'], '1')
+        # the status can be the last message seen
+        b = FakeHandler()
+        self.mux.attach(b, last_msg_id=status_id)
+        self.assertEqual(self.texts(b), ['1'])
+
+    def test_evict_by_size(self):
+        self.mux.replay_bytes = 1000
+        self.publish('x' * 400)
+        self.publish('y' * 400)
+        self.assertEqual(len(self.mux.recent), 1)
+        self.assertLessEqual(self.mux.recent_bytes, 1000)
+        self.publish('z' * 2000)
+        self.assertEqual(len(self.mux.recent), 0)
+        self.assertEqual(self.mux.recent_bytes, 0)
+
+    def test_close_clears(self):
+        self.publish('0')
+        self.mux.close()
+        self.assertEqual(len(self.mux.recent), 0)
+        self.assertTrue(self.stream.closed())
+
+
+class TestThrottle(TestCase):
+
+    def setUp(self):
+        self.session = Session()
+        self.stream = FakeStream()
+        self.mux = IOPubMultiplexer(self.stream, Session(key=self.session.key),
+            logging.getLogger(__name__), msg_rate_limit=1, rate_limit_window=3,
+        )
+        self.handler = FakeHandler()
+        self.mux.attach(self.handler)
+        self.parent = self.session.msg('execute_request', {})
+
+    def publish(self, msg_type='stream', content=None):
+        if content is None:
+            content = {'name': 'stdout', 'text': 'x'}
+        msg = self.session.msg(msg_type, content, parent=self.parent)
+        self.stream.callback(self.session.serialize(msg))
+
+    def received(self):
+        return [ json.loads(msg) for msg in self.handler.sent ]
+
+    def test_drop_stream_messages(self):
+        for i in range(5):
+            self.publish()
+        msgs = self.received()
+        # 3 messages in the window, a notice, and the rest dropped
+        self.assertEqual(len(msgs), 4)
+        notice = msgs[-1]
+        self.assertEqual(notice['content']['name'], 'stderr')
+        self.assertIn('rate exceeded', notice['content']['text'])
+        self.assertEqual(notice['parent_header']['msg_id'],
+                         self.parent['header']['msg_id'])
+        self.assertEqual(self.mux.dropped, 2)
+
+    def test_other_messages_not_dropped(self):
+        for i in range(4):
+            self.publish()
+        self.publish('status', {'execution_state': 'idle'})
+        self.assertEqual(self.received()[-1]['msg_type'], 'status')
+
+    def test_summary_after_window(self):
+        for i in range(5):
+            self.publish()
+        # the next window
+        self.mux._window_start -= 3
+        self.publish()
+        msgs = self.received()
+        self.assertIn('2 output messages', msgs[-2]['content']['text'])
+        self.assertEqual(msgs[-1]['content']['text'], 'x')
+        self.assertEqual(self.mux.dropped, 0)
+
+    def test_summary_at_end_of_window(self):
+        self.mux.rate_limit_window = 0.1
+        self.mux.msg_rate_limit = 10
+        for i in range(5):
+            self.publish()
+        self.assertEqual(self.mux.dropped, 4)
+        # the kernel publishes nothing more
+        ioloop.IOLoop.current().run_sync(lambda : gen.sleep(0.2))
+        summary = self.received()[-1]
+        self.assertIn('4 output messages', summary['content']['text'])
+        self.assertEqual(summary['parent_header']['msg_id'],
+                         self.parent['header']['msg_id'])
+        self.assertEqual(self.mux.dropped, 0)
+
+    def test_data_rate(self):
+        self.mux.msg_rate_limit = 0
+        self.mux.data_rate_limit = 1000
+        self.publish(content={'name': 'stdout', 'text': 'x' * 2000})
+        self.publish(content={'name': 'stdout', 'text': 'x' * 2000})
+        msgs = self.received()
+        self.assertEqual(len(msgs), 2)
+        self.assertIn('data rate exceeded', msgs[-1]['content']['text'])
+
+    def test_no_limits(self):
+        self.mux.msg_rate_limit = 0
+        for i in range(10):
+            self.publish()
+        self.assertEqual(len(self.handler.sent), 10)
+
+
+class TestBackpressure(TestCase):
+
+    def test_writes_wait_for_buffer(self):
+        session = Session()
+        stream = FakeStream()
+        mux = IOPubMultiplexer(stream, Session(key=session.key),
+            logging.getLogger(__name__), max_buffer=100,
+        )
+        h = FakeHandler(futures=True)
+        h.stream._write_buffer_size = 1000
+        mux.attach(h, last_msg_id=None)
+        mux.clients[h].queue.extend([u'0', u'1', u'2'])
+        mux._flush(mux.clients[h])
+        # the first message is written, the others wait
+        self.assertEqual(h.sent, [u'0'])
+        h.stream._write_buffer_size = 0
+        f = h.pending.pop(0)
+        f.set_result(None)
+        mux._on_written(mux.clients[h], f)
+        self.assertEqual(h.sent, [u'0', u'1', u'2'])
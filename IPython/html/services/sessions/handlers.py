@@ -5,7 +5,7 @@
 
 import json
 
-from tornado import web
+from tornado import gen, web
 
 from ...base.handlers import IPythonHandler, json_errors
 from IPython.utils.jsonutil import date_default
@@ -20,11 +20,12 @@ class SessionRootHandler(IPythonHandler):
     def get(self):
         # Return a list of running sessions
         sm = self.session_manager
-        sessions = sm.list_sessions()
-        self.finish(json.dumps(sessions, default=date_default))
+        self.finish(sm.list_sessions_json())
 
     @web.authenticated
+    @web.asynchronous
     @json_errors
+    @gen.coroutine
     def post(self):
         # Creates a new session
         #(unless a session already exists for the named nb)
@@ -54,7 +55,8 @@ def post(self):
             model = sm.get_session(name=name, path=path)
         else:
             try:
-                model = sm.create_session(name=name, path=path, kernel_name=kernel_name)
+                model = yield sm.create_session_async(name=name, path=path,
+                                                      kernel_name=kernel_name)
             except NoSuchKernel:
                 msg = ("The '%s' kernel is not available. Please pick another "
                        "suitable kernel instead, or install that kernel." % kernel_name)
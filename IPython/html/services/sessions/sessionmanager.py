@@ -3,55 +3,78 @@
 # Copyright (c) IPython Development Team.
 # Distributed under the terms of the Modified BSD License.
 
+import io
+import json
+import os
 import uuid
-import sqlite3
+from collections import OrderedDict
 
-from tornado import web
+from tornado import gen, web
 
 from IPython.config.configurable import LoggingConfigurable
+from IPython.utils.io import atomic_writing
+from IPython.utils.jsonutil import date_default
 from IPython.utils.py3compat import unicode_type
-from IPython.utils.traitlets import Instance
+from IPython.utils.traitlets import Any, Dict, Instance, Integer, Unicode
 
 
 class SessionManager(LoggingConfigurable):
 
     kernel_manager = Instance('IPython.html.services.kernels.kernelmanager.MappingKernelManager')
     contents_manager = Instance('IPython.html.services.contents.manager.ContentsManager', args=())
-    
-    # Session database initialized below
-    _cursor = None
-    _connection = None
+
+    sessions_file = Unicode('', config=True,
+        help="""A JSON file in which to save the sessions, so that they survive
+        restarting the notebook server.
+
+        Sessions are restored with new kernels. By default, sessions are not saved.
+        """
+    )
+
+    # The sessions, by session_id, in the order they were created.
+    # Each one is a dict of the columns.
+    _sessions = Instance(OrderedDict, args=())
+    # Indexes of the session_ids, by (name, path) and by kernel_id
+    _by_notebook = Dict()
+    _by_kernel = Dict()
     _columns = {'session_id', 'name', 'path', 'kernel_id'}
-    
-    @property
-    def cursor(self):
-        """Start a cursor and create a database called 'session'"""
-        if self._cursor is None:
-            self._cursor = self.connection.cursor()
-            self._cursor.execute("""CREATE TABLE session 
-                (session_id, name, path, kernel_id)""")
-        return self._cursor
-
-    @property
-    def connection(self):
-        """Start a database connection"""
-        if self._connection is None:
-            self._connection = sqlite3.connect(':memory:')
-            self._connection.row_factory = sqlite3.Row
-        return self._connection
-        
-    def __del__(self):
-        """Close connection once SessionManager closes"""
-        self.cursor.close()
+    # Futures of the sessions being created, by (name, path)
+    _creating = Dict()
+
+    # The JSON list of session models, and what it was built from
+    _list_json = Any()
+    _list_version = Any()
+    _version = Integer(0)
+
+    def _changed(self):
+        """Call after changing sessions, to invalidate the cached list and save them"""
+        self._version += 1
+        if self.sessions_file:
+            self._save()
+
+    def _index(self, row):
+        self._by_notebook[(row['name'], row['path'])] = row['session_id']
+        self._by_kernel[row['kernel_id']] = row['session_id']
+
+    def _unindex(self, row):
+        session_id = row['session_id']
+        if self._by_notebook.get((row['name'], row['path'])) == session_id:
+            del self._by_notebook[(row['name'], row['path'])]
+        if self._by_kernel.get(row['kernel_id']) == session_id:
+            del self._by_kernel[row['kernel_id']]
+
+    def _add(self, row):
+        self._sessions[row['session_id']] = row
+        self._index(row)
+
+    def _remove(self, session_id):
+        row = self._sessions.pop(session_id, None)
+        if row is not None:
+            self._unindex(row)
 
     def session_exists(self, name, path):
         """Check to see if the session for a given notebook exists"""
-        self.cursor.execute("SELECT * FROM session WHERE name=? AND path=?", (name, path))
-        reply = self.cursor.fetchone()
-        if reply is None:
-            return False
-        else:
-            return True
+        return (name, path) in self._by_notebook
 
     def new_session_id(self):
         "Create a uuid for a new session"
@@ -67,11 +90,38 @@ def create_session(self, name=None, path=None, kernel_name=None):
         return self.save_session(session_id, name=name, path=path,
                                  kernel_id=kernel_id)
 
+    def create_session_async(self, name=None, path=None, kernel_name=None):
+        """Creates a session, returning a Future for its model
+
+        Unlike create_session, the kernel can be taken from the kernel manager's pool.
+        Concurrent calls for the same notebook share the Future of the first one,
+        so that only one session and kernel are created.
+        """
+        key = (name, path)
+        future = self._creating.get(key)
+        if future is None:
+            future = self._creating[key] = self._create_session_async(
+                name=name, path=path, kernel_name=kernel_name)
+            def created(f):
+                if self._creating.get(key) is f:
+                    del self._creating[key]
+            future.add_done_callback(created)
+        return future
+
+    @gen.coroutine
+    def _create_session_async(self, name=None, path=None, kernel_name=None):
+        session_id = self.new_session_id()
+        kernel_path = self.contents_manager.get_kernel_path(name=name, path=path)
+        kernel_id = yield self.kernel_manager.start_kernel_async(path=kernel_path,
+                                                                 kernel_name=kernel_name)
+        raise gen.Return(self.save_session(session_id, name=name, path=path,
+                                           kernel_id=kernel_id))
+
     def save_session(self, session_id, name=None, path=None, kernel_id=None):
         """Saves the items for the session with the given session_id
         
         Given a session_id (and any other of the arguments), this method
-        creates a row in the sqlite session database that holds the information
+        creates a row in the session database that holds the information
         for a session.
         
         Parameters
@@ -90,9 +140,13 @@ def save_session(self, session_id, name=None, path=None, kernel_id=None):
         model : dict
             a dictionary of the session model
         """
-        self.cursor.execute("INSERT INTO session VALUES (?,?,?,?)",
-            (session_id, name, path, kernel_id)
-        )
+        self._add({
+            'session_id': session_id,
+            'name': name,
+            'path': path,
+            'kernel_id': kernel_id,
+        })
+        self._changed()
         return self.get_session(session_id=session_id)
 
     def get_session(self, **kwargs):
@@ -116,21 +170,11 @@ def get_session(self, **kwargs):
         if not kwargs:
             raise TypeError("must specify a column to query")
 
-        conditions = []
         for column in kwargs.keys():
             if column not in self._columns:
                 raise TypeError("No such column: %r", column)
-            conditions.append("%s=?" % column)
-
-        query = "SELECT * FROM session WHERE %s" % (' AND '.join(conditions))
-
-        self.cursor.execute(query, list(kwargs.values()))
-        try:
-            row = self.cursor.fetchone()
-        except KeyError:
-            # The kernel is missing, so the session just got deleted.
-            row = None
 
+        row = self._find(**kwargs)
         if row is None:
             q = []
             for key, value in kwargs.items():
@@ -140,6 +184,25 @@ def get_session(self, **kwargs):
 
         return self.row_to_model(row)
 
+    def _find(self, **kwargs):
+        """Find the session matching the values of all the columns in kwargs
+
+        Uses the indexes when kwargs has session_id, name and path, or kernel_id.
+        """
+        if 'session_id' in kwargs:
+            candidates = [kwargs['session_id']]
+        elif 'name' in kwargs and 'path' in kwargs:
+            candidates = [self._by_notebook.get((kwargs['name'], kwargs['path']))]
+        elif 'kernel_id' in kwargs:
+            candidates = [self._by_kernel.get(kwargs['kernel_id'])]
+        else:
+            candidates = list(self._sessions)
+        for session_id in candidates:
+            row = self._sessions.get(session_id)
+            if row is not None and all(row[k] == v for k, v in kwargs.items()):
+                return row
+        return None
+
     def update_session(self, session_id, **kwargs):
         """Updates the values in the session database.
         
@@ -149,7 +212,7 @@ def update_session(self, session_id, **kwargs):
         Parameters
         ----------
         session_id : str
-            a uuid that identifies a session in the sqlite3 database
+            a uuid that identifies a session in the session database
         **kwargs : str
             the key must correspond to a column title in session database,
             and the value replaces the current value in the session 
@@ -161,22 +224,23 @@ def update_session(self, session_id, **kwargs):
             # no changes
             return
 
-        sets = []
         for column in kwargs.keys():
             if column not in self._columns:
                 raise TypeError("No such column: %r" % column)
-            sets.append("%s=?" % column)
-        query = "UPDATE session SET %s WHERE session_id=?" % (', '.join(sets))
-        self.cursor.execute(query, list(kwargs.values()) + [session_id])
+        row = self._sessions[session_id]
+        self._unindex(row)
+        row.update(kwargs)
+        self._index(row)
+        self._changed()
 
     def row_to_model(self, row):
-        """Takes sqlite database session row and turns it into a dictionary"""
+        """Takes a session row and turns it into a dictionary"""
         if row['kernel_id'] not in self.kernel_manager:
             # The kernel was killed or died without deleting the session.
             # We can't use delete_session here because that tries to find
             # and shut down the kernel.
-            self.cursor.execute("DELETE FROM session WHERE session_id=?", 
-                                (row['session_id'],))
+            self._remove(row['session_id'])
+            self._changed()
             raise KeyError
 
         model = {
@@ -192,20 +256,79 @@ def row_to_model(self, row):
     def list_sessions(self):
         """Returns a list of dictionaries containing all the information from
         the session database"""
-        c = self.cursor.execute("SELECT * FROM session")
         result = []
-        # We need to use fetchall() here, because row_to_model can delete rows,
-        # which messes up the cursor if we're iterating over rows.
-        for row in c.fetchall():
+        # row_to_model can delete sessions, so iterate over a copy
+        for row in list(self._sessions.values()):
             try:
                 result.append(self.row_to_model(row))
             except KeyError:
                 pass
         return result
 
+    def list_sessions_json(self):
+        """The list of session models as JSON
+
+        The JSON is cached until sessions or kernels change,
+        because every open notebook polls the list of sessions.
+        """
+        version = (self._version, self.kernel_manager.model_version)
+        if self._list_json is not None and self._list_version == version and all(
+                row['kernel_id'] in self.kernel_manager for row in self._sessions.values()):
+            return self._list_json
+        sessions = self.list_sessions()
+        # list_sessions can delete sessions with dead kernels
+        self._list_version = (self._version, self.kernel_manager.model_version)
+        self._list_json = json.dumps(sessions, default=date_default)
+        return self._list_json
+
     def delete_session(self, session_id):
         """Deletes the row in the session database with given session_id"""
         # Check that session exists before deleting
         session = self.get_session(session_id=session_id)
         self.kernel_manager.shutdown_kernel(session['kernel']['id'])
-        self.cursor.execute("DELETE FROM session WHERE session_id=?", (session_id,))
+        self._remove(session_id)
+        self._changed()
+
+    #-------------------------------------------------------------------------
+    # Saving sessions across restarts
+    #-------------------------------------------------------------------------
+
+    def _save(self):
+        rows = []
+        for row in self._sessions.values():
+            row = dict(row)
+            if row['kernel_id'] in self.kernel_manager:
+                row['kernel_name'] = self.kernel_manager.kernel_model(row['kernel_id'])['name']
+            rows.append(row)
+        with atomic_writing(self.sessions_file, encoding='utf-8') as f:
+            f.write(unicode_type(json.dumps(rows)))
+
+    def restore_sessions(self):
+        """Restore the sessions saved in sessions_file, starting new kernels for them"""
+        if not self.sessions_file or not os.path.exists(self.sessions_file):
+            return
+        try:
+            with io.open(self.sessions_file, encoding='utf-8') as f:
+                rows = json.load(f)
+        except (IOError, ValueError) as e:
+            self.log.error("Could not read sessions from %s: %s", self.sessions_file, e)
+            return
+        for row in rows:
+            if self.session_exists(row['name'], row['path']):
+                continue
+            kernel_path = self.contents_manager.get_kernel_path(name=row['name'], path=row['path'])
+            try:
+                kernel_id = self.kernel_manager.start_kernel(path=kernel_path,
+                    kernel_name=row.get('kernel_name') or 'python')
+            except Exception:
+                self.log.error("Could not restore session for %s/%s", row['path'], row['name'],
+                    exc_info=True)
+                continue
+            self._add({
+                'session_id': row['session_id'],
+                'name': row['name'],
+                'path': row['path'],
+                'kernel_id': kernel_id,
+            })
+        self.log.info("Restored %i sessions from %s", len(self._sessions), self.sessions_file)
+        self._changed()
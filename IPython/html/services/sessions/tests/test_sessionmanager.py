@@ -1,8 +1,15 @@
 """Tests for the session manager."""
 
+import json
+import os
+from datetime import timedelta
 from unittest import TestCase
 
-from tornado import web
+from tornado import ioloop, web
+from tornado.concurrent import Future
+
+from IPython.utils.tempdir import TemporaryDirectory
+from IPython.utils.tz import utcnow
 
 from ..sessionmanager import SessionManager
 from IPython.html.services.kernels.kernelmanager import MappingKernelManager
@@ -40,6 +47,38 @@ def test_get_session(self):
                     'kernel': {'id':u'A', 'name': 'bar'}}
         self.assertEqual(model, expected)
 
+    def test_create_session_async(self):
+        sm = SessionManager(kernel_manager=DummyMKM())
+        future = sm.create_session_async(name='test.ipynb', path='/path/to/',
+                                         kernel_name='bar')
+        model = future.result()
+        self.assertEqual(model['kernel'], {'id': u'A', 'name': 'bar'})
+        self.assertEqual(sm.get_session(session_id=model['id']), model)
+
+    def test_create_session_async_concurrent(self):
+        km = DummyMKM()
+        starting = []
+        def start_kernel_async(**kwargs):
+            starting.append(Future())
+            return starting[-1]
+        km.start_kernel_async = start_kernel_async
+        sm = SessionManager(kernel_manager=km)
+        first = sm.create_session_async(name='test.ipynb', path='/path/to/')
+        second = sm.create_session_async(name='test.ipynb', path='/path/to/')
+        other = sm.create_session_async(name='other.ipynb', path='/path/to/')
+        self.assertIs(second, first)
+        self.assertIsNot(other, first)
+        self.assertEqual(len(starting), 2)
+        for future in starting:
+            future.set_result(km.start_kernel())
+        run_sync = ioloop.IOLoop.instance().run_sync
+        run_sync(lambda : first)
+        run_sync(lambda : other)
+        self.assertEqual(len(sm.list_sessions()), 2)
+        self.assertEqual(sm.get_session(name='test.ipynb', path='/path/to/'), first.result())
+        # once created, a new call creates another session
+        self.assertIsNot(sm.create_session_async(name='test.ipynb', path='/path/to/'), first)
+
     def test_bad_get_session(self):
         # Should raise error if a bad key is passed to the database.
         sm = SessionManager(kernel_manager=DummyMKM())
@@ -138,3 +177,65 @@ def test_bad_delete_session(self):
         self.assertRaises(TypeError, sm.delete_session, bad_kwarg='23424') # Bad keyword
         self.assertRaises(web.HTTPError, sm.delete_session, session_id='23424') # nonexistant
 
+
+    def test_get_session_by_kernel(self):
+        sm = SessionManager(kernel_manager=DummyMKM())
+        session = sm.create_session(name='test1.ipynb', path='/path/to/1/', kernel_name='python')
+        sm.create_session(name='test2.ipynb', path='/path/to/2/', kernel_name='python')
+        model = sm.get_session(kernel_id=session['kernel']['id'])
+        self.assertEqual(model, session)
+        sm.update_session(session['id'], path='/path/to/3/')
+        self.assertTrue(sm.session_exists(name='test1.ipynb', path='/path/to/3/'))
+        self.assertFalse(sm.session_exists(name='test1.ipynb', path='/path/to/1/'))
+        self.assertEqual(sm.get_session(name='test1.ipynb', path='/path/to/3/')['id'], session['id'])
+
+    def test_list_sessions_json(self):
+        sm = SessionManager(kernel_manager=DummyMKM())
+        sm.create_session(name='test1.ipynb', path='/path/to/1/', kernel_name='python')
+        listed = sm.list_sessions_json()
+        self.assertEqual(json.loads(listed), sm.list_sessions())
+        # cached until something changes
+        self.assertIs(sm.list_sessions_json(), listed)
+        session = sm.create_session(name='test2.ipynb', path='/path/to/2/', kernel_name='python')
+        self.assertEqual(len(json.loads(sm.list_sessions_json())), 2)
+        # kernels dying are noticed
+        sm.kernel_manager.shutdown_kernel(session['kernel']['id'])
+        self.assertEqual(len(json.loads(sm.list_sessions_json())), 1)
+
+    def test_list_sessions_json_activity(self):
+        sm = SessionManager(kernel_manager=DummyMKM())
+        session = sm.create_session(name='test1.ipynb', path='/path/to/1/', kernel_name='python')
+        kernel_id = session['kernel']['id']
+        kernel = sm.kernel_manager.get_kernel(kernel_id)
+        kernel.last_activity = kernel.model_activity = utcnow()
+        kernel.execution_state = 'idle'
+        kernel.connections = 0
+        listed = sm.list_sessions_json()
+        # messages that don't change the state don't rebuild the JSON
+        sm.kernel_manager.record_activity(kernel_id)
+        sm.kernel_manager.record_activity(kernel_id, 'idle')
+        self.assertIs(sm.list_sessions_json(), listed)
+        sm.kernel_manager.record_activity(kernel_id, 'busy')
+        listed = sm.list_sessions_json()
+        self.assertEqual(json.loads(listed)[0]['kernel']['execution_state'], 'busy')
+        # activity is reported once it is older than model_activity_interval
+        kernel.model_activity -= timedelta(seconds=120)
+        sm.kernel_manager.record_activity(kernel_id)
+        self.assertIsNot(sm.list_sessions_json(), listed)
+
+    def test_restore_sessions(self):
+        with TemporaryDirectory() as td:
+            sessions_file = os.path.join(td, 'sessions.json')
+            sm = SessionManager(kernel_manager=DummyMKM(), sessions_file=sessions_file)
+            session = sm.create_session(name='test.ipynb', path='/path/to/', kernel_name='julia')
+            sm.create_session(name='deleted.ipynb', path='/path/to/', kernel_name='python')
+            sm.delete_session(sm.get_session(name='deleted.ipynb', path='/path/to/')['id'])
+
+            # a new server, with new kernels
+            sm = SessionManager(kernel_manager=DummyMKM(), sessions_file=sessions_file)
+            sm.restore_sessions()
+            restored = sm.list_sessions()
+            self.assertEqual(len(restored), 1)
+            self.assertEqual(restored[0]['id'], session['id'])
+            self.assertEqual(restored[0]['notebook'], session['notebook'])
+            self.assertEqual(restored[0]['kernel']['name'], 'julia')
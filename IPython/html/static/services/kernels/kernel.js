@@ -63,6 +63,8 @@ define([
         
         this.last_msg_id = null;
         this.last_msg_callbacks = {};
+        // the last IOPub message received, to replay the ones after it on reconnect
+        this.last_iopub_msg_id = null;
 
         this._autorestart_attempt = 0;
         this._reconnect_attempt = 0;
@@ -382,6 +384,9 @@ define([
      * @param {Object} data - information about the kernel including id
      */
     Kernel.prototype._kernel_created = function (data) {
+        if (data.id !== this.id) {
+            this.last_iopub_msg_id = null;
+        }
         this.id = data.id;
         this.kernel_url = utils.url_join_encode(this.kernel_service_url, this.id);
         this.start_channels();
@@ -438,7 +443,11 @@ define([
         };
         this.channels.shell = new this.WebSocket(channel_url("shell"));
         this.channels.stdin = new this.WebSocket(channel_url("stdin"));
-        this.channels.iopub = new this.WebSocket(channel_url("iopub"));
+        var iopub_url = channel_url("iopub");
+        if (this.last_iopub_msg_id) {
+            iopub_url += "&last_msg_id=" + encodeURIComponent(this.last_iopub_msg_id);
+        }
+        this.channels.iopub = new this.WebSocket(iopub_url);
         
         var already_called_onclose = false; // only alert once
         var ws_closed_early = function(evt){
@@ -991,6 +1000,7 @@ define([
 
 
     Kernel.prototype._finish_iopub_message = function (msg) {
+        this.last_iopub_msg_id = msg.header.msg_id;
         var handler = this.get_iopub_handler(msg.header.msg_type);
         if (handler !== undefined) {
             handler(msg);
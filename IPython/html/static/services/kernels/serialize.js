@@ -90,8 +90,14 @@ define([
             view.setUint32(4 * (i+1), offsets[i]);
         }
         // write all the buffers at their respective offsets
+        // respecting the offset and length of views into larger buffers
         for (i = 0; i < buffers.length; i++) {
-            msg_buf.set(new Uint8Array(buffers[i].buffer), offsets[i]);
+            var buf = buffers[i];
+            if (buf instanceof ArrayBuffer) {
+                msg_buf.set(new Uint8Array(buf), offsets[i]);
+            } else {
+                msg_buf.set(new Uint8Array(buf.buffer, buf.byteOffset, buf.byteLength), offsets[i]);
+            }
         }
         
         // return raw ArrayBuffer
@@ -9,6 +9,16 @@ define([
 ], function(IPython, $, utils, dialog) {
     "use strict";
     
+    var base64_encode = function (bytes) {
+        // base64-encode a Uint8Array
+        var chars = [];
+        var nbytes = bytes.byteLength;
+        for (var i=0; i<nbytes; i++) {
+            chars.push(String.fromCharCode(bytes[i]));
+        }
+        return btoa(chars.join(''));
+    };
+    
     var NotebookList = function (selector, options) {
         // Constructor
         //
@@ -383,15 +393,10 @@ define([
                     });
                     return false;
                 }
+                var binary_data = null;
                 if (filedata instanceof ArrayBuffer) {
-                    // base64-encode binary file data
-                    var bytes = '';
-                    var buf = new Uint8Array(filedata);
-                    var nbytes = buf.byteLength;
-                    for (var i=0; i<nbytes; i++) {
-                        bytes += String.fromCharCode(buf[i]);
-                    }
-                    filedata = btoa(bytes);
+                    // binary file data is base64-encoded, one chunk at a time
+                    binary_data = filedata;
                     format = 'base64';
                 }
                 var model = {
@@ -427,7 +432,6 @@ define([
                     model.content = filedata;
                     content_type = 'application/octet-stream';
                 }
-                var filedata = item.data('filedata');
 
                 var settings = {
                     processData : false,
@@ -451,6 +455,31 @@ define([
                     filename
                 );
                 
+                var upload_chunk = function (offset, chunk) {
+                    // Upload binary data from offset, in chunks of upload_chunk_size.
+                    // Chunks are numbered from 1, and the last one is -1.
+                    var nbytes = binary_data.byteLength;
+                    var end = Math.min(offset + NotebookList.upload_chunk_size, nbytes);
+                    var last = (end >= nbytes);
+                    model.content = base64_encode(new Uint8Array(binary_data, offset, end - offset));
+                    if (!last || chunk > 1) {
+                        model.chunk = last ? -1 : chunk;
+                    }
+                    $.ajax(url, $.extend({}, settings, {
+                        data : JSON.stringify(model),
+                        success : last ? settings.success : function () {
+                            upload_chunk(end, chunk + 1);
+                        }
+                    }));
+                };
+                var upload = function () {
+                    if (binary_data === null) {
+                        $.ajax(url, settings);
+                    } else {
+                        upload_chunk(0, 1);
+                    }
+                };
+
                 var exists = false;
                 $.each(that.element.find('.list_item:not(.new-file)'), function(k,v){
                     if ($(v).data('name') === filename) { exists = true; return false; }
@@ -462,7 +491,7 @@ define([
                         buttons : {
                             Overwrite : {
                                 class: "btn-danger",
-                                click: function() { $.ajax(url, settings); }
+                                click: upload
                             },
                             Cancel : {
                                 click: function() { item.remove(); }
@@ -470,7 +499,7 @@ define([
                         }
                     });
                 } else {
-                    $.ajax(url, settings);
+                    upload();
                 }
                 
                 return false;
@@ -536,5 +565,8 @@ define([
     // Backwards compatability.
     IPython.NotebookList = NotebookList;
 
+    // binary files larger than this are uploaded in several requests
+    NotebookList.upload_chunk_size = 8 * 1024 * 1024;
+
     return {'NotebookList': NotebookList};
 });
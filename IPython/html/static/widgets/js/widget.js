@@ -73,7 +73,16 @@ define(["widgets/js/manager",
             var method = msg.content.data.method;
             switch (method) {
                 case 'update':
-                    this.set_state(msg.content.data.state);
+                    var state = this._merge_buffers(
+                        msg.content.data.state,
+                        msg.content.data.buffers,
+                        msg.buffers
+                    );
+                    var that = this;
+                    _.each(msg.content.data.deltas || {}, function (delta, key) {
+                        state[key] = that._apply_delta(that._pack_models(that.get(key)), delta);
+                    });
+                    this.set_state(state);
                     if (this.init_state_callback) {
                         this.init_state_callback.apply(this, [this]);
                         delete this.init_state_callback;
@@ -88,6 +97,75 @@ define(["widgets/js/manager",
             }
         },
 
+        _apply_delta: function (value, delta) {
+            // Apply a delta sent by the back-end to a (packed) dict or list.
+            // The packed value is a copy, so it can be modified in place.
+            if ($.isArray(value)) {
+                _.each(delta.set || [], function (item) {
+                    value[item[0]] = item[1];
+                });
+                return value.concat(delta.append || []);
+            }
+            _.each(delta.set || {}, function (item, key) {
+                value[key] = item;
+            });
+            _.each(delta.remove || [], function (key) {
+                delete value[key];
+            });
+            return value;
+        },
+
+        _merge_buffers: function (state, buffer_keys, buffers) {
+            // Put the binary values of a state update, which arrive as
+            // message buffers (DataViews), back into the state.
+            //
+            // numpy arrays keep their dtype and shape in the state,
+            // the DataView is added to them as `buffer`.
+            buffer_keys = buffer_keys || [];
+            for (var i=0; i<buffer_keys.length; i++) {
+                var key = buffer_keys[i];
+                if (state[key] instanceof Object) {
+                    state[key].buffer = buffers[i];
+                } else {
+                    state[key] = buffers[i];
+                }
+            }
+            return state;
+        },
+
+        _split_buffers: function (attrs) {
+            // Split binary values (ArrayBuffers, DataViews and typed arrays)
+            // out of attrs, so they can be sent as message buffers.
+            var buffer_keys = [];
+            var buffers = [];
+            var state = {};
+            _.each(attrs, function (value, key) {
+                if (value instanceof ArrayBuffer) {
+                    buffer_keys.push(key);
+                    buffers.push(new DataView(value));
+                } else if (ArrayBuffer.isView(value)) {
+                    buffer_keys.push(key);
+                    buffers.push(new DataView(value.buffer, value.byteOffset, value.byteLength));
+                } else {
+                    state[key] = value;
+                }
+            });
+            return {state: state, buffer_keys: buffer_keys, buffers: buffers};
+        },
+
+        _send_sync: function (attrs, callbacks, sync_method) {
+            // Send a backbone sync message, with binary values as buffers.
+            var split = this._split_buffers(attrs);
+            var data = {method: 'backbone', sync_data: split.state};
+            if (sync_method !== undefined) {
+                data.sync_method = sync_method;
+            }
+            if (split.buffer_keys.length > 0) {
+                data.buffers = split.buffer_keys;
+            }
+            this.comm.send(data, callbacks, {}, split.buffers);
+        },
+
         set_state: function (state) {
             // Handle when a widget is updated via the python side.
             this.state_lock = state;
@@ -112,8 +190,7 @@ define(["widgets/js/manager",
                     // throttled.
                     if (this.msg_buffer !== null &&
                         (this.get('msg_throttle') || 3) === this.pending_msgs) {
-                        var data = {method: 'backbone', sync_method: 'update', sync_data: this.msg_buffer};
-                        this.comm.send(data, callbacks);
+                        this._send_sync(this.msg_buffer, callbacks, 'update');
                         this.msg_buffer = null;
                     } else {
                         --this.pending_msgs;
@@ -205,8 +282,7 @@ define(["widgets/js/manager",
                 } else {
                     // We haven't exceeded the throttle, send the message like 
                     // normal.
-                    var data = {method: 'backbone', sync_data: attrs};
-                    this.comm.send(data, callbacks);
+                    this._send_sync(attrs, callbacks);
                     this.pending_msgs++;
                 }
             }
@@ -230,6 +306,10 @@ define(["widgets/js/manager",
             if (value instanceof Backbone.Model) {
                 return "IPY_MODEL_" + value.id;
 
+            } else if (value instanceof ArrayBuffer || ArrayBuffer.isView(value)) {
+                // binary values are sent as buffers
+                return value;
+
             } else if ($.isArray(value)) {
                 packed = [];
                 _.each(value, function(sub_value, key) {
@@ -253,7 +333,11 @@ define(["widgets/js/manager",
             // Replace model ids with models recursively.
             var that = this;
             var unpacked;
-            if ($.isArray(value)) {
+            if (value instanceof ArrayBuffer || ArrayBuffer.isView(value)) {
+                // binary values arrive as buffers
+                return value;
+
+            } else if ($.isArray(value)) {
                 unpacked = [];
                 _.each(value, function(sub_value, key) {
                     unpacked.push(that._unpack_models(sub_value));
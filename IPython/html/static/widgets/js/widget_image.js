@@ -18,8 +18,15 @@ define([
             //
             // Called when the model is changed.  The model may have been 
             // changed by another view or by a state update from the back-end.
-            var image_src = 'data:image/' + this.model.get('format') + ';base64,' + this.model.get('_b64value');
-            this.$el.attr('src', image_src);
+            // The image data arrives as a binary buffer (DataView),
+            // displayed via an object URL rather than a base64 data URL.
+            if (this._url) {
+                URL.revokeObjectURL(this._url);
+            }
+            var blob = new Blob([this.model.get('value')],
+                {type: 'image/' + this.model.get('format')});
+            this._url = URL.createObjectURL(blob);
+            this.$el.attr('src', this._url);
             
             var width = this.model.get('width');
             if (width !== undefined && width.length > 0) {
@@ -36,6 +43,14 @@ define([
             }
             return ImageView.__super__.update.apply(this);
         },
+
+        remove: function() {
+            if (this._url) {
+                URL.revokeObjectURL(this._url);
+                delete this._url;
+            }
+            return ImageView.__super__.remove.apply(this, arguments);
+        },
     });
 
     return {
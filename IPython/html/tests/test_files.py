@@ -7,13 +7,17 @@
 
 pjoin = os.path.join
 
+import nose.tools as nt
 import requests
 import json
 
+from tornado.web import HTTPError
+
 from IPython.nbformat.current import (new_notebook, write, new_worksheet,
                               new_heading_cell, new_code_cell,
                               new_output)
 
+from IPython.html.files.handlers import parse_range
 from IPython.html.utils import url_path_join
 from .launchnotebook import NotebookTestBase
 from IPython.utils import py3compat
@@ -116,6 +120,31 @@ def test_download(self):
         self.assertIn('attachment', disposition)
         self.assertIn('filename="test.txt"', disposition)
 
+    def test_range(self):
+        nbdir = self.notebook_dir.name
+        base = self.base_url()
+        data = os.urandom(3000)
+        with io.open(pjoin(nbdir, 'range.bin'), 'wb') as f:
+            f.write(data)
+        url = url_path_join(base, 'files', 'range.bin')
+
+        r = requests.get(url)
+        self.assertEqual(r.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(r.content, data)
+
+        r = requests.get(url, headers={'Range': 'bytes=10-19'})
+        self.assertEqual(r.status_code, 206)
+        self.assertEqual(r.headers['Content-Range'], 'bytes 10-19/3000')
+        self.assertEqual(r.content, data[10:20])
+
+        r = requests.get(url, headers={'Range': 'bytes=-100'})
+        self.assertEqual(r.status_code, 206)
+        self.assertEqual(r.content, data[-100:])
+
+        r = requests.get(url, headers={'Range': 'bytes=5000-'})
+        self.assertEqual(r.status_code, 416)
+        self.assertEqual(r.headers['Content-Range'], 'bytes */3000')
+
     def test_old_files_redirect(self):
         """pre-2.0 'files/' prefixed links are properly redirected"""
         nbdir = self.notebook_dir.name
@@ -149,3 +178,16 @@ def test_old_files_redirect(self):
             self.assertEqual(r.status_code, 200)
             self.assertEqual(r.text, prefix + '/f3')
 
+
+
+def test_parse_range():
+    nt.assert_equal(parse_range(None, 100), None)
+    nt.assert_equal(parse_range('bytes=0-9', 100), (0, 10))
+    nt.assert_equal(parse_range('bytes=90-', 100), (90, 100))
+    nt.assert_equal(parse_range('bytes=90-1000', 100), (90, 100))
+    nt.assert_equal(parse_range('bytes=-10', 100), (90, 100))
+    nt.assert_equal(parse_range('bytes=-1000', 100), (0, 100))
+    # multiple ranges are ignored
+    nt.assert_equal(parse_range('bytes=0-1,5-6', 100), None)
+    with nt.assert_raises(HTTPError):
+        parse_range('bytes=100-', 100)
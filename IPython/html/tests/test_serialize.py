@@ -1,5 +1,6 @@
 """Test serialize/deserialize messages with buffers"""
 
+import json
 import os
 
 import nose.tools as nt
@@ -8,6 +9,8 @@
 from ..base.zmqhandlers import (
     serialize_binary_message,
     deserialize_binary_message,
+    relay_reply,
+    reserialize_reply,
 )
 
 def test_serialize_binary():
@@ -24,3 +27,43 @@ def test_deserialize_binary():
     bmsg = serialize_binary_message(msg)
     msg2 = deserialize_binary_message(bmsg)
     nt.assert_equal(msg2, msg)
+
+def _reserialized(s, msg_list, relay):
+    return reserialize_reply(Session(key=s.key), msg_list, relay=relay)
+
+def test_relay_reply():
+    s = Session(key=b'secret')
+    msg = s.msg('display_data', content={'data': {'text/plain': u'\u2603' * 10}})
+    msg_list = s.serialize(msg)
+    relayed = _reserialized(s, msg_list, relay=True)
+    decoded = _reserialized(s, msg_list, relay=False)
+    nt.assert_is_instance(relayed, type(decoded))
+    nt.assert_equal(json.loads(relayed), json.loads(decoded))
+
+def test_relay_reply_buffers():
+    s = Session(key=b'secret')
+    msg = s.msg('data_pub', content={'a': 'b'})
+    buffers = [ os.urandom(2) for i in range(3) ]
+    msg_list = s.serialize(msg) + buffers
+    relayed = deserialize_binary_message(_reserialized(s, msg_list, relay=True))
+    decoded = deserialize_binary_message(_reserialized(s, msg_list, relay=False))
+    nt.assert_equal(relayed, decoded)
+    nt.assert_equal(relayed['buffers'], buffers)
+
+def test_relay_reply_bad_signature():
+    s = Session(key=b'secret')
+    msg_list = s.serialize(s.msg('stream', content={'text': 'hi'}))
+    msg_list[-1] = msg_list[-1].replace(b'hi', b'ho')
+    with nt.assert_raises(ValueError):
+        relay_reply(Session(key=s.key), msg_list)
+
+def test_relay_reply_old_protocol():
+    s = Session(key=b'secret')
+    msg = s.msg('stream', content={'data': 'hi', 'name': 'stdout'})
+    del msg['header']['version']
+    msg_list = s.serialize(msg)
+    session = Session(key=s.key)
+    # version 4 messages have to be adapted
+    nt.assert_is(relay_reply(session, list(msg_list)), None)
+    adapted = json.loads(reserialize_reply(session, msg_list))
+    nt.assert_equal(adapted['content']['text'], 'hi')
@@ -37,8 +37,9 @@ casper.notebook_test(function () {
         var img_sel = '.widget-area .widget-subarea img';
         this.test.assert(this.cell_element_exists(index, img_sel), 'Image exists.');
 
-        // Verify that the image's base64 data has made it into the DOM.
+        // Verify that the image's binary data has made it into the DOM,
+        // as an object URL.
         var img_src = this.cell_element_function(image_index, img_sel, 'attr', ['src']);
-        this.test.assert(img_src.indexOf(test_jpg) > -1, 'Image src data exists.');
+        this.test.assert(img_src.indexOf('blob:') === 0, 'Image src is an object URL.');
     });    
 });
\ No newline at end of file
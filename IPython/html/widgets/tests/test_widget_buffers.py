@@ -0,0 +1,63 @@
+"""Test sending binary widget state as message buffers."""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import nose.tools as nt
+
+from IPython.kernel.comm import Comm
+from IPython.html import widgets
+
+#-----------------------------------------------------------------------------
+# Utility stuff
+#-----------------------------------------------------------------------------
+
+class RecordingComm(Comm):
+    comm_id = 'a-b-c-d'
+    
+    def open(self, *args, **kwargs):
+        self.sent = []
+    
+    def send(self, data=None, metadata=None, buffers=None):
+        self.sent.append((data, buffers))
+    
+    def close(self, *args, **kwargs):
+        pass
+
+#-----------------------------------------------------------------------------
+# Actual tests
+#-----------------------------------------------------------------------------
+
+def test_image_value_as_buffer():
+    image = widgets.Image(comm=RecordingComm())
+    image.value = b'\x89PNG\x00\xff'
+    data, buffers = image.comm.sent[-1]
+    nt.assert_equal(data['method'], 'update')
+    nt.assert_equal(data['buffers'], ['value'])
+    nt.assert_not_in('value', data['state'])
+    nt.assert_equal(buffers, [b'\x89PNG\x00\xff'])
+
+
+def test_json_state_has_no_buffers():
+    image = widgets.Image(comm=RecordingComm())
+    image.width = u'10px'
+    data, buffers = image.comm.sent[-1]
+    nt.assert_equal(data['state'], {'width': u'10px'})
+    nt.assert_not_in('buffers', data)
+    nt.assert_equal(buffers, [])
+
+
+def test_value_from_frontend_buffer():
+    image = widgets.Image(comm=RecordingComm())
+    n = len(image.comm.sent)
+    image._handle_msg({
+        'content': {'data': {
+            'method': 'backbone',
+            'sync_data': {},
+            'buffers': ['value'],
+        }},
+        'buffers': [b'abc'],
+    })
+    nt.assert_equal(image.value, b'abc')
+    # don't echo the value back to the frontend
+    nt.assert_equal(len(image.comm.sent), n)
@@ -0,0 +1,165 @@
+"""Test coalesced and delta state updates of widgets."""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import time
+
+import nose.tools as nt
+
+from IPython.html.widgets import Widget
+from IPython.html.widgets.widget import _container_delta
+from IPython.utils.traitlets import Dict, Int, List, Unicode
+
+from .test_widget_buffers import RecordingComm
+
+#-----------------------------------------------------------------------------
+# Utility stuff
+#-----------------------------------------------------------------------------
+
+class FakeLoop(object):
+    def __init__(self):
+        self.callbacks = []
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def run(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for cb in callbacks:
+            cb()
+
+
+class SyncWidget(Widget):
+    _view_name = Unicode('SyncView', sync=True)
+    count = Int(sync=True)
+    values = List(sync=True)
+    mapping = Dict(sync=True)
+    # sent as is, nested containers included
+    raw = Dict(sync=True, to_json=lambda value: value)
+
+
+class DeferredWidget(SyncWidget):
+    loop = None
+
+    def _sync_loop(self):
+        return self.loop
+
+
+def updates(widget):
+    return [ data for data, buffers in widget.comm.sent if data['method'] == 'update' ]
+
+#-----------------------------------------------------------------------------
+# Actual tests
+#-----------------------------------------------------------------------------
+
+def test_container_delta():
+    old = dict((str(i), i) for i in range(10))
+    new = dict(old, a=1)
+    del new['0']
+    nt.assert_equal(_container_delta(old, new), {'set': {'a': 1}, 'remove': ['0']})
+    nt.assert_is_none(_container_delta(old, {'x': 1}))
+    nt.assert_equal(_container_delta(list(range(10)), list(range(11))),
+        {'set': [], 'append': [10]})
+    nt.assert_is_none(_container_delta(list(range(10)), list(range(5))))
+    nt.assert_is_none(_container_delta(None, list(range(10))))
+
+
+def test_sent_immediately_without_eventloop():
+    w = SyncWidget(comm=RecordingComm())
+    w.count = 1
+    w.count = 2
+    nt.assert_equal([ u['state'] for u in updates(w)[-2:] ], [{'count': 1}, {'count': 2}])
+
+
+def test_coalesced_per_key():
+    w = DeferredWidget(comm=RecordingComm())
+    w.loop = FakeLoop()
+    n = len(updates(w))
+    for i in range(1, 10):
+        w.count = i
+    w.values = [1]
+    # the first update is sent right away, the next ones are coalesced
+    nt.assert_equal(len(updates(w)), n + 1)
+    nt.assert_equal(updates(w)[-1]['state'], {'count': 1})
+    nt.assert_equal(len(w.loop.callbacks), 1)
+    w.loop.run()
+    sent = updates(w)
+    nt.assert_equal(len(sent), n + 2)
+    nt.assert_equal(sent[-1]['state'], {'count': 9, 'values': [1]})
+
+
+def test_slow_updates_sent_right_away():
+    w = DeferredWidget(comm=RecordingComm())
+    # the eventloop never runs, as while a cell runs
+    w.loop = FakeLoop()
+    w._sync_max_delay = 0.01
+    n = len(updates(w))
+    for i in range(1, 5):
+        w.count = i
+        time.sleep(0.02)
+    nt.assert_equal([ u['state'] for u in updates(w)[n:] ],
+        [{'count': i} for i in range(1, 5)])
+
+
+def test_pending_flushed_before_custom_msg():
+    w = DeferredWidget(comm=RecordingComm())
+    w.loop = FakeLoop()
+    w.count = 5
+    w.send({'hi': 1})
+    methods = [ data['method'] for data, buffers in w.comm.sent[-2:] ]
+    nt.assert_equal(methods, ['update', 'custom'])
+    # nothing left for the scheduled flush
+    n = len(w.comm.sent)
+    w.loop.run()
+    nt.assert_equal(len(w.comm.sent), n)
+
+
+def test_list_append_sent_as_delta():
+    w = SyncWidget(comm=RecordingComm())
+    w.values = list(range(100))
+    nt.assert_equal(updates(w)[-1]['state'], {'values': list(range(100))})
+    w.values = w.values + [100]
+    msg = updates(w)[-1]
+    nt.assert_equal(msg['state'], {})
+    nt.assert_equal(msg['deltas'], {'values': {'set': [], 'append': [100]}})
+
+
+def test_dict_change_sent_as_delta():
+    w = SyncWidget(comm=RecordingComm())
+    w.mapping = dict((str(i), i) for i in range(100))
+    w.mapping = dict(w.mapping, a=-1)
+    msg = updates(w)[-1]
+    nt.assert_equal(msg['deltas'], {'mapping': {'set': {'a': -1}, 'remove': []}})
+
+
+def test_nested_change_in_delta():
+    w = SyncWidget(comm=RecordingComm())
+    w.raw = dict((str(i), [i]) for i in range(100))
+    w.raw['0'].append(5)
+    w.raw = dict(w.raw, a=-1)
+    msg = updates(w)[-1]
+    nt.assert_equal(msg['deltas'], {'raw': {'set': {'0': [0, 5], 'a': -1}, 'remove': []}})
+
+
+def test_small_and_full_updates_not_deltas():
+    w = SyncWidget(comm=RecordingComm())
+    w.values = [1, 2]
+    w.values = [1, 2, 3]
+    nt.assert_equal(updates(w)[-1]['state'], {'values': [1, 2, 3]})
+    w.values = list(range(100))
+    w.send_state()
+    msg = updates(w)[-1]
+    nt.assert_not_in('deltas', msg)
+    nt.assert_equal(msg['state']['values'], list(range(100)))
+
+
+def test_frontend_change_resets_delta_base():
+    w = SyncWidget(comm=RecordingComm())
+    w.values = list(range(100))
+    w._handle_msg({'content': {'data': {
+        'method': 'backbone',
+        'sync_data': {'values': list(range(50))},
+    }}})
+    w.values = list(range(51))
+    nt.assert_equal(updates(w)[-1]['state'], {'values': list(range(51))})
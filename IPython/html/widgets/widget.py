@@ -14,13 +14,18 @@
 #-----------------------------------------------------------------------------
 from contextlib import contextmanager
 import collections
+import copy
+import sys
+import time
+
+from zmq.eventloop import ioloop
 
 from IPython.core.getipython import get_ipython
 from IPython.kernel.comm import Comm
 from IPython.config import LoggingConfigurable
 from IPython.utils.importstring import import_item
 from IPython.utils.traitlets import Unicode, Dict, Instance, Bool, List, \
-    CaselessStrEnum, Tuple, CUnicode, Int, Set
+    CaselessStrEnum, Tuple, CUnicode, Int, Set, Bytes
 from IPython.utils.py3compat import string_types
 
 #-----------------------------------------------------------------------------
@@ -76,6 +81,37 @@ def m(self, *args, **kwargs):
     return m
 
 
+def _is_ndarray(value):
+    """Whether value is a numpy array, without importing numpy."""
+    numpy = sys.modules.get('numpy')
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+
+def _container_delta(old, new):
+    """Return a structural delta from old to new, or None.
+    
+    None is returned if old and new aren't both dicts or lists, or if
+    the delta would not be much smaller than new itself.
+    
+    Deltas of dicts have keys 'set' (a dict of new and changed items) and
+    'remove' (a list of removed keys).  Deltas of lists have keys 'set'
+    (a list of [index, item] pairs of changed items) and 'append'
+    (a list of items appended to old).
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = dict((k, v) for k, v in new.items() if k not in old or old[k] != v)
+        removed = [k for k in old if k not in new]
+        if 2 * (len(changed) + len(removed)) < len(new):
+            return {'set': changed, 'remove': removed}
+    elif isinstance(old, list) and isinstance(new, list) and len(new) >= len(old):
+        n = len(old)
+        changed = [[i, new[i]] for i in range(n) if new[i] != old[i]]
+        appended = new[n:]
+        if 2 * (len(changed) + len(appended)) < len(new):
+            return {'set': changed, 'append': appended}
+    return None
+
+
 def register(key=None):
     """Returns a decorator registering a widget class in the widget registry. 
     If no key is provided, the class name is used as a key. A key is
@@ -138,9 +174,21 @@ def handle_comm_opened(comm, msg):
     def _keys_default(self):
         return [name for name in self.traits(sync=True)]
     
+    # synced keys of Bytes traits, computed on first use
+    _binary_keys = None
     _property_lock = Tuple((None, None))
     _send_state_lock = Int(0)
     _states_to_send = Set(allow_none=False)
+    # state updates are sent right away, unless an update was sent less than
+    # this long ago (in seconds): then they are sent on the next tick of the
+    # kernel's eventloop, or as soon as they have been pending for this long
+    _sync_max_delay = 0.05
+    _sync_pending_since = 0
+    _last_sync = 0
+    # the last sent JSON value of container traits, for sending deltas
+    _last_sent = Dict()
+    # containers smaller than this are always sent whole
+    _delta_min_size = 16
     _display_callbacks = Instance(CallbackDispatcher, ())
     _msg_callbacks = Instance(CallbackDispatcher, ())
     
@@ -202,6 +250,7 @@ def close(self):
         When the comm is closed, all of the widget views are automatically
         removed from the front-end."""
         if self.comm is not None:
+            self._flush_sync()
             Widget.widgets.pop(self.model_id, None)
             self.comm.close()
             self.comm = None
@@ -214,10 +263,19 @@ def send_state(self, key=None):
         key : unicode, or iterable (optional)
             A single property's name or iterable of property names to sync with the front-end.
         """
-        self._send({
+        state = self.get_state(key=key)
+        # a full sync (key=None) never sends deltas
+        deltas = self._split_state_deltas(state, full=key is None)
+        state, buffer_keys, buffers = self._split_state_buffers(state)
+        msg = {
             "method" : "update",
-            "state"  : self.get_state(key=key)
-        })
+            "state"  : state,
+        }
+        if deltas:
+            msg["deltas"] = deltas
+        if buffer_keys:
+            msg["buffers"] = buffer_keys
+        self._send(msg, buffers=buffers)
 
     def get_state(self, key=None):
         """Gets the widget state, or a piece of it.
@@ -242,12 +300,63 @@ def get_state(self, key=None):
             state[k] = f(value)
         return state
 
+    def _split_state_deltas(self, state, full=False):
+        """Replace large dicts and lists in a state dict by deltas.
+        
+        Deltas are computed against the last value sent for each key.
+        
+        Returns a dict of deltas by key, which the front-end applies
+        to its current values.
+        """
+        deltas = {}
+        for k in list(state):
+            value = state[k]
+            if not isinstance(value, (dict, list)) or len(value) < self._delta_min_size:
+                self._last_sent.pop(k, None)
+                continue
+            if not full:
+                delta = _container_delta(self._last_sent.get(k), value)
+                if delta is not None:
+                    deltas[k] = delta
+                    state.pop(k)
+            # deep copy: a to_json may return the trait value itself,
+            # whose nested containers can be changed in place
+            self._last_sent[k] = copy.deepcopy(value)
+        return deltas
+    
+    def _split_state_buffers(self, state):
+        """Split binary values out of a state dict, to be sent as buffers.
+        
+        Values of Bytes traits, memoryviews and numpy arrays are sent
+        as message buffers, without base64 or JSON encoding.
+        The state of a numpy array keeps its dtype and shape.
+        
+        Returns (state, buffer_keys, buffers).
+        """
+        if self._binary_keys is None:
+            self._binary_keys = set(name for name, trait in self.traits(sync=True).items()
+                                    if isinstance(trait, Bytes))
+        buffer_keys, buffers = [], []
+        for k in list(state):
+            value = state[k]
+            if k in self._binary_keys or isinstance(value, memoryview):
+                buffers.append(state.pop(k))
+                buffer_keys.append(k)
+            elif _is_ndarray(value):
+                numpy = sys.modules['numpy']
+                buffers.append(numpy.ascontiguousarray(value))
+                buffer_keys.append(k)
+                state[k] = {'dtype': str(value.dtype), 'shape': list(value.shape)}
+        return state, buffer_keys, buffers
+    
     def set_state(self, sync_data):
         """Called when a state is received from the front-end."""
         for name in self.keys:
             if name in sync_data:
                 json_value = sync_data[name]
                 from_json = self.trait_metadata(name, 'from_json', self._trait_from_json)
+                # the next update of this key is sent whole
+                self._last_sent.pop(name, None)
                 with self._lock_property(name, json_value):
                     setattr(self, name, from_json(json_value))
     
@@ -259,6 +368,7 @@ def send(self, content):
         content : dict
             Content of the message to send.
         """
+        self._flush_sync()
         self._send({"method": "custom", "content": content})
 
     def on_msg(self, callback, remove=False):
@@ -322,6 +432,50 @@ def hold_sync(self):
                 self.send_state(self._states_to_send)
                 self._states_to_send.clear()
 
+    def _sync_loop(self):
+        """The eventloop on which pending state updates are flushed.
+        
+        None if updates can't be deferred: outside a kernel,
+        or while the kernel runs a GUI eventloop.
+        """
+        kernel = getattr(self.comm, 'kernel', None)
+        if kernel is None or kernel.eventloop is not None:
+            return None
+        return ioloop.IOLoop.instance()
+    
+    def _queue_sync(self, key):
+        """Queue a state update for key.
+        
+        Updates are coalesced per key, so a key changed several times
+        before the next flush is sent once, with its latest value.
+        """
+        self._states_to_send.add(key)
+        now = time.time()
+        loop = self._sync_loop()
+        if loop is None:
+            self._flush_sync()
+        elif not self._sync_pending_since:
+            if now - self._last_sync > self._sync_max_delay:
+                # nothing sent recently: send now, as the eventloop is blocked
+                # while a cell runs, and it may not flush until the cell ends
+                self._flush_sync()
+            else:
+                self._sync_pending_since = now
+                loop.add_callback(self._flush_sync)
+        elif now - self._sync_pending_since > self._sync_max_delay:
+            # don't hold updates back for the whole of a long-running cell
+            self._flush_sync()
+    
+    def _flush_sync(self):
+        """Send the pending state updates, if any."""
+        self._sync_pending_since = 0
+        if self.comm is None or self._send_state_lock > 0 or not self._states_to_send:
+            return
+        keys = list(self._states_to_send)
+        self._states_to_send.clear()
+        self._last_sync = time.time()
+        self.send_state(keys)
+
     def _should_send_property(self, key, value):
         """Check the property lock (property_lock)"""
         to_json = self.trait_metadata(key, 'to_json', self._trait_to_json)
@@ -346,6 +500,10 @@ def _handle_msg(self, msg):
         # Handle backbone sync methods CREATE, PATCH, and UPDATE all in one.
         if method == 'backbone' and 'sync_data' in data:
             sync_data = data['sync_data']
+            # binary values arrive as message buffers
+            buffers = msg.get('buffers') or []
+            for key, buf in zip(data.get('buffers', []), buffers):
+                sync_data[key] = getattr(buf, 'bytes', buf)
             self.set_state(sync_data) # handles all methods
 
         # Handle a custom msg from the front-end
@@ -369,8 +527,8 @@ def _notify_trait(self, name, old_value, new_value):
         if self.comm is not None and name in self.keys:
         # Make sure this isn't information that the front-end just sent us.
             if self._should_send_property(name, new_value):
-                # Send new state to front-end
-                self.send_state(key=name)
+                # Queue the new state to be sent to the front-end
+                self._queue_sync(name)
 
     def _handle_displayed(self, **kwargs):
         """Called when a view has been displayed for this widget instance"""
@@ -411,12 +569,13 @@ def _ipython_display_(self, **kwargs):
         """Called when `IPython.display.display` is called on the widget."""
         # Show view.
         if self._view_name is not None:
+            self._flush_sync()
             self._send({"method": "display"})
             self._handle_displayed(**kwargs)
 
-    def _send(self, msg):
+    def _send(self, msg, buffers=None):
         """Sends a message to the model in the front-end."""
-        self.comm.send(msg)
+        self.comm.send(msg, buffers=buffers)
 
 
 class DOMWidget(Widget):
@@ -13,8 +13,6 @@
 #-----------------------------------------------------------------------------
 # Imports
 #-----------------------------------------------------------------------------
-import base64
-
 from .widget import DOMWidget, register
 from IPython.utils.traitlets import Unicode, CUnicode, Bytes
 from IPython.utils.warn import DeprecatedClass
@@ -29,18 +27,15 @@ class Image(DOMWidget):
     The `value` of this widget accepts a byte string.  The byte string is the raw
     image data that you want the browser to display.  You can explicitly define
     the format of the byte string using the `format` trait (which defaults to
-    "png")."""
+    "png").  The bytes are sent to the front-end as a binary message buffer."""
     _view_name = Unicode('ImageView', sync=True)
     
     # Define the custom state properties to sync with the front-end
     format = Unicode('png', sync=True)
     width = CUnicode(sync=True)
     height = CUnicode(sync=True)
-    _b64value = Unicode(sync=True)
     
-    value = Bytes()
-    def _value_changed(self, name, old, new):
-        self._b64value = base64.b64encode(new)
+    value = Bytes(sync=True)
 
 
 # Remove in IPython 4.0
@@ -36,6 +36,20 @@ class OutStream(object):
     _subprocess_flush_limit = 256
     flush_interval = 0.05
     topic=None
+    # The maximum number of characters in a single stream message.
+    # The buffer is flushed when it reaches this size,
+    # and larger writes are split into several messages.
+    max_message_size = 65536
+    # The maximum number of characters published per request.
+    # Output beyond this is dropped, and a notice is published instead.
+    # Clients can override it for a request with the `output_limit`
+    # key of the request's metadata.  0 means no limit.
+    output_limit = 0
+    # The maximum rate of output, in characters per second, measured over
+    # `rate_window` seconds.  Output beyond this is dropped, and a notice
+    # is published once output resumes.  0 means no limit.
+    rate_limit = 0
+    rate_window = 1.0
 
     def __init__(self, session, pub_socket, name, pipe=True):
         self.encoding = 'UTF-8'
@@ -44,8 +58,14 @@ def __init__(self, session, pub_socket, name, pipe=True):
         self.name = name
         self.topic = b'stream.' + py3compat.cast_bytes(name)
         self.parent_header = {}
-        self._new_buffer()
         self._buffer_lock = threading.Lock()
+        self._new_buffer()
+        self._flush_pending = False
+        self._request_limit = self.output_limit
+        self._request_count = 0
+        self._rate_start = 0
+        self._rate_count = 0
+        self._elided = 0
         self._master_pid = os.getpid()
         self._master_thread = threading.current_thread().ident
         self._pipe_pid = os.getpid()
@@ -112,6 +132,19 @@ def _check_mp_mode(self):
 
     def set_parent(self, parent):
         self.parent_header = extract_header(parent)
+        metadata = {}
+        if isinstance(parent, dict):
+            metadata = parent.get('metadata') or {}
+        self._request_limit = self.output_limit
+        if 'output_limit' in metadata:
+            # sent by the client: ignore invalid limits
+            try:
+                limit = int(metadata['output_limit'])
+            except (TypeError, ValueError):
+                limit = -1
+            if limit >= 0:
+                self._request_limit = limit
+        self._request_count = 0
 
     def close(self):
         self.pub_socket = None
@@ -126,7 +159,7 @@ def _flush_from_subprocesses(self):
                 if msg[0] != self._pipe_uuid:
                     continue
                 else:
-                    self._buffer.write(msg[1].decode(self.encoding, 'replace'))
+                    self._buffer_write(self._limit(msg[1].decode(self.encoding, 'replace')))
                     # this always means a flush,
                     # so reset our timer
                     self._start = 0
@@ -136,14 +169,56 @@ def _flush_from_subprocesses(self):
     def _schedule_flush(self):
         """schedule a flush in the main thread
         
-        only works with a tornado/pyzmq eventloop running
+        only works with a tornado/pyzmq eventloop running.
+        At most one flush is scheduled at a time,
+        however many times sub-threads ask for one.
         """
+        if self._flush_pending:
+            return
         if IOLoop.initialized():
+            self._flush_pending = True
             IOLoop.instance().add_callback(self.flush)
         else:
             # no async loop, at least force the timer
             self._start = 0
     
+    def _limit(self, string):
+        """Apply the per-request and rate budgets to a chunk of output.
+        
+        Returns the part of `string` that may be published.
+        The length of the rest is added to the count of elided characters.
+        """
+        n = len(string)
+        if self._request_limit:
+            room = self._request_limit - self._request_count
+            if room < n:
+                room = max(room, 0)
+                self._elided += n - room
+                string = string[:room]
+                n = room
+            self._request_count += n
+        if self.rate_limit and n:
+            now = time.time()
+            if now - self._rate_start > self.rate_window:
+                self._rate_start = now
+                self._rate_count = 0
+            room = int(self.rate_limit * self.rate_window) - self._rate_count
+            if room < n:
+                room = max(room, 0)
+                self._elided += n - room
+                string = string[:room]
+                n = room
+            self._rate_count += n
+        return string
+    
+    def _elided_notice(self):
+        """The notice replacing dropped output, if any was dropped."""
+        if not self._elided:
+            return u''
+        notice = u'\n[... %i characters of output elided: output limit exceeded ...]\n' % self._elided
+        self._elided = 0
+        return notice
+    
     def flush(self):
         """trigger actual zmq send"""
         if self.pub_socket is None:
@@ -159,13 +234,16 @@ def flush(self):
                 self._schedule_flush()
                 return
             
+            self._flush_pending = False
             self._flush_from_subprocesses()
-            data = self._flush_buffer()
+            data = self._flush_buffer() + self._elided_notice()
             
             if data:
-                content = {u'name':self.name, u'text':data}
-                msg = self.session.send(self.pub_socket, u'stream', content=content,
-                                       parent=self.parent_header, ident=self.topic)
+                size = self.max_message_size
+                for start in range(0, len(data), size):
+                    content = {u'name':self.name, u'text':data[start:start+size]}
+                    msg = self.session.send(self.pub_socket, u'stream', content=content,
+                                           parent=self.parent_header, ident=self.topic)
             
                 if hasattr(self.pub_socket, 'flush'):
                     # socket itself has flush (presumably ZMQStream)
@@ -209,7 +287,12 @@ def write(self, string):
                 string = string.decode(self.encoding, 'replace')
             
             is_child = (self._check_mp_mode() == CHILD)
-            self._buffer.write(string)
+            if not is_child:
+                # subprocess output is limited when the master receives it
+                string = self._limit(string)
+                if not string:
+                    return
+            size = self._buffer_write(string)
             if is_child:
                 # newlines imply flush in subprocesses
                 # mp.Pool cannot be trusted to flush promptly (or ever),
@@ -219,7 +302,9 @@ def write(self, string):
             # do we want to check subprocess flushes on write?
             # self._flush_from_subprocesses()
             current_time = time.time()
-            if self._start < 0:
+            if size >= self.max_message_size:
+                self.flush()
+            elif self._start < 0:
                 self._start = current_time
             elif current_time - self._start > self.flush_interval:
                 self.flush()
@@ -231,15 +316,24 @@ def writelines(self, sequence):
             for string in sequence:
                 self.write(string)
 
+    def _buffer_write(self, string):
+        """write to the buffer, returning the new size of the buffer"""
+        with self._buffer_lock:
+            self._buffer.write(string)
+            self._buffer_size += len(string)
+            return self._buffer_size
+    
     def _flush_buffer(self):
         """clear the current buffer and return the current buffer data"""
-        data = u''
-        if self._buffer is not None:
-            data = self._buffer.getvalue()
-            self._buffer.close()
-        self._new_buffer()
+        with self._buffer_lock:
+            data = u''
+            if self._buffer is not None:
+                data = self._buffer.getvalue()
+                self._buffer.close()
+            self._new_buffer()
         return data
     
     def _new_buffer(self):
         self._buffer = StringIO()
+        self._buffer_size = 0
         self._start = -1
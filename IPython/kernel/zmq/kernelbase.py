@@ -86,6 +86,32 @@ def _ident_default(self):
     # a little if it's not enough after more interactive testing.
     _execute_sleep = Float(0.0005, config=True)
 
+    status_coalesce_window = Float(0, config=True,
+        help="""Window (in seconds) for coalescing the busy/idle status messages
+        of lightweight requests, listed in `coalesce_status_msg_types`.
+        
+        When nonzero, a burst of such requests publishes a single `busy` when
+        the first request starts, and a single `idle` (with the parent of the last
+        request) once no further request has arrived within this window,
+        rather than a busy/idle pair per request. A request whose handler takes
+        longer than `status_coalesce_max_duration` ends the burst: its idle is
+        published as soon as it is handled.
+        execute_request and apply_request always get their own busy/idle pair,
+        published after the idle of any pending burst.
+        
+        The default (0) disables coalescing.
+        """
+    )
+    coalesce_status_msg_types = List(['complete_request', 'inspect_request',
+        'is_complete_request', 'history_request', 'comm_msg'], config=True,
+        help="""Shell message types whose status messages may be coalesced.
+        Only used if `status_coalesce_window` is nonzero."""
+    )
+    status_coalesce_max_duration = Float(0.001, config=True,
+        help="""The longest (in seconds) a handler can take for its request's idle
+        status to be coalesced. Only used if `status_coalesce_window` is nonzero."""
+    )
+
     # Frequency of the kernel's event loop.
     # Units are in seconds, kernel subclasses for GUI toolkits may need to
     # adapt to milliseconds.
@@ -105,6 +131,12 @@ def _ident_default(self):
     # set of aborted msg_ids
     aborted = Set()
 
+    # parent header of the last request in the current burst of
+    # coalesced requests, if there is one.
+    _status_burst_parent = None
+    _status_idle_deadline = 0
+    _status_timeout = None
+
     # Track execution count here. For IPython, we override this to use the
     # execution count we store in the shell.
     execution_count = 0
@@ -143,6 +175,7 @@ def dispatch_control(self, msg):
         
         # Set the parent message for side effects.
         self.set_parent(idents, msg)
+        self._end_status_burst()
         self._publish_status(u'busy')
         
         header = msg['header']
@@ -174,14 +207,15 @@ def dispatch_shell(self, stream, msg):
             self.log.error("Invalid Message", exc_info=True)
             return
 
-        # Set the parent message for side effects.
-        self.set_parent(idents, msg)
-        self._publish_status(u'busy')
-        
         header = msg['header']
         msg_id = header['msg_id']
         msg_type = msg['header']['msg_type']
         
+        # Set the parent message for side effects.
+        self.set_parent(idents, msg)
+        coalesced = self._begin_status(msg_type)
+        started = time.time()
+        
         # Print some info about this message and leave a '--->' marker, so it's
         # easier to trace visually the message chain when debugging.  Each
         # handler prints its message at the end.
@@ -197,6 +231,8 @@ def dispatch_shell(self, stream, msg):
             md.update(status)
             self.session.send(stream, reply_type, metadata=md,
                         content=status, parent=msg, ident=idents)
+            if coalesced:
+                self._finish_status(coalesced, time.time() - started)
             return
         
         handler = self.shell_handlers.get(msg_type, None)
@@ -215,7 +251,7 @@ def dispatch_shell(self, stream, msg):
         
         sys.stdout.flush()
         sys.stderr.flush()
-        self._publish_status(u'idle')
+        self._finish_status(coalesced, time.time() - started)
     
     def enter_eventloop(self):
         """enter eventloop"""
@@ -263,6 +299,11 @@ def do_one_iteration(self):
             # handle at most one request per iteration
             stream.flush(zmq.POLLIN, 1)
             stream.flush(zmq.POLLOUT)
+        # the IOLoop timeout publishing a coalesced idle doesn't fire
+        # while a GUI eventloop is stepping us
+        if self._status_burst_parent is not None \
+                and time.time() >= self._status_idle_deadline:
+            self._end_status_burst()
 
 
     def record_ports(self, ports):
@@ -305,6 +346,54 @@ def _publish_status(self, status, parent=None):
                           ident=self._topic('status'),
                           )
     
+    def _begin_status(self, msg_type):
+        """Publish busy for a shell request, or add it to the current burst.
+        
+        Returns whether the request's status is coalesced.
+        """
+        if self.status_coalesce_window > 0 \
+                and msg_type in self.coalesce_status_msg_types \
+                and msg_type not in ('execute_request', 'apply_request'):
+            if self._status_burst_parent is None:
+                self._publish_status(u'busy')
+            self._cancel_status_timeout()
+            self._status_burst_parent = self._parent_header
+            return True
+        else:
+            self._end_status_burst()
+            self._publish_status(u'busy')
+            return False
+    
+    def _finish_status(self, coalesced, duration=0):
+        """Publish idle for a shell request, or schedule the burst's idle.
+        
+        The burst ends right away if the request took longer than
+        status_coalesce_max_duration to handle.
+        """
+        if not coalesced:
+            self._publish_status(u'idle')
+            return
+        if duration > self.status_coalesce_max_duration:
+            self._end_status_burst()
+            return
+        self._status_idle_deadline = time.time() + self.status_coalesce_window
+        loop = ioloop.IOLoop.instance()
+        self._status_timeout = loop.add_timeout(self._status_idle_deadline,
+                                                self._end_status_burst)
+    
+    def _cancel_status_timeout(self):
+        if self._status_timeout is not None:
+            ioloop.IOLoop.instance().remove_timeout(self._status_timeout)
+            self._status_timeout = None
+    
+    def _end_status_burst(self):
+        """Publish the deferred idle of a burst of coalesced requests, if any."""
+        self._cancel_status_timeout()
+        if self._status_burst_parent is not None:
+            parent = self._status_burst_parent
+            self._status_burst_parent = None
+            self._publish_status(u'idle', parent)
+    
     def set_parent(self, ident, parent):
         """Set the current parent_header
         
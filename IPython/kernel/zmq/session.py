@@ -790,6 +790,30 @@ def _cull_digest_history(self):
         to_cull = random.sample(self.digest_history, n_to_cull)
         self.digest_history.difference_update(to_cull)
     
+    def check_signature(self, msg_list):
+        """Check the signature of a msg_list of bytes
+
+        Raises ValueError if the message is unsigned, its signature was already
+        seen, or doesn't match its parts. Does nothing without a key.
+
+        Parameters
+        ----------
+        msg_list : list of bytes
+            The list of message parts of the form [HMAC,p_header,p_parent,
+            p_metadata,p_content,buffer1,buffer2,...].
+        """
+        if self.auth is None:
+            return
+        signature = msg_list[0]
+        if not signature:
+            raise ValueError("Unsigned Message")
+        if signature in self.digest_history:
+            raise ValueError("Duplicate Signature: %r" % signature)
+        self._add_digest(signature)
+        check = self.sign(msg_list[1:5])
+        if not compare_digest(signature, check):
+            raise ValueError("Invalid Signature: %r" % signature)
+
     def deserialize(self, msg_list, content=True, copy=True):
         """Unserialize a msg_list to a nested message dict.
 
@@ -820,16 +844,7 @@ def deserialize(self, msg_list, content=True, copy=True):
         if not copy:
             for i in range(minlen):
                 msg_list[i] = msg_list[i].bytes
-        if self.auth is not None:
-            signature = msg_list[0]
-            if not signature:
-                raise ValueError("Unsigned Message")
-            if signature in self.digest_history:
-                raise ValueError("Duplicate Signature: %r" % signature)
-            self._add_digest(signature)
-            check = self.sign(msg_list[1:5])
-            if not compare_digest(signature, check):
-                raise ValueError("Invalid Signature: %r" % signature)
+        self.check_signature(msg_list)
         if not len(msg_list) >= minlen:
             raise TypeError("malformed message, must have at least %i elements"%minlen)
         header = self.unpack(msg_list[1])
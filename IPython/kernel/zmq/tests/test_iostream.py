@@ -0,0 +1,89 @@
+"""Tests for the output budgets of OutStream"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import nose.tools as nt
+
+from IPython.kernel.zmq.iostream import OutStream
+
+
+class RecordingSession(object):
+    """Stand-in for Session that records the stream messages sent"""
+    def __init__(self):
+        self.sent = []
+    
+    def send(self, socket, msg_type, content=None, parent=None, ident=None):
+        self.sent.append(content['text'])
+
+
+def _stream(**kwargs):
+    session = RecordingSession()
+    stream = OutStream(session, object(), u'stdout', pipe=False)
+    for key, value in kwargs.items():
+        setattr(stream, key, value)
+    return stream, session.sent
+
+
+def test_split_large_messages():
+    stream, sent = _stream(max_message_size=10)
+    stream.write(u'x' * 25)
+    stream.flush()
+    nt.assert_equal([len(s) for s in sent], [10, 10, 5])
+
+
+def test_flush_at_max_size():
+    stream, sent = _stream(max_message_size=10, flush_interval=1000)
+    stream.write(u'x' * 6)
+    nt.assert_equal(sent, [])
+    stream.write(u'x' * 6)
+    nt.assert_equal(sent, [u'x' * 10, u'x' * 2])
+
+
+def test_output_limit():
+    stream, sent = _stream(output_limit=5)
+    stream.set_parent({'header' : {'msg_id' : 'a'}, 'metadata' : {}})
+    stream.write(u'abc')
+    stream.write(u'defgh')
+    stream.write(u'ijk')
+    stream.flush()
+    text = u''.join(sent)
+    nt.assert_true(text.startswith(u'abcde'))
+    nt.assert_in(u'6 characters of output elided', text)
+
+
+def test_output_limit_from_metadata():
+    stream, sent = _stream()
+    stream.set_parent({'header' : {'msg_id' : 'a'}, 'metadata' : {'output_limit' : 2}})
+    stream.write(u'abcd')
+    stream.flush()
+    nt.assert_true(sent[0].startswith(u'ab\n'))
+    # the budget is per request
+    stream.set_parent({'header' : {'msg_id' : 'b'}, 'metadata' : {}})
+    stream.write(u'abcd')
+    stream.flush()
+    nt.assert_equal(sent[-1], u'abcd')
+
+
+def test_invalid_output_limit_from_metadata():
+    stream, sent = _stream(output_limit=3)
+    for limit in (u'lots', None, [1], -1):
+        stream.set_parent({'header' : {'msg_id' : 'a'}, 'metadata' : {'output_limit' : limit}})
+        stream.write(u'abcd')
+        stream.flush()
+        # the configured limit
+        nt.assert_true(sent[-1].startswith(u'abc\n'))
+    stream.set_parent({'header' : {'msg_id' : 'b'}, 'metadata' : {'output_limit' : u'2'}})
+    stream.write(u'abcd')
+    stream.flush()
+    nt.assert_true(sent[-1].startswith(u'ab\n'))
+
+
+def test_rate_limit():
+    stream, sent = _stream(rate_limit=4, rate_window=1)
+    stream.write(u'abcdef')
+    stream.write(u'gh')
+    stream.flush()
+    text = u''.join(sent)
+    nt.assert_true(text.startswith(u'abcd'))
+    nt.assert_in(u'4 characters of output elided', text)
@@ -0,0 +1,89 @@
+"""Tests for status publishing in the base Kernel"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import logging
+import time
+
+import nose.tools as nt
+import zmq
+
+from IPython.kernel.zmq.kernelbase import Kernel
+from IPython.kernel.zmq.session import Session
+
+
+class StatusKernel(Kernel):
+    """Kernel that records the status messages it would publish"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('session', Session())
+        kwargs.setdefault('log', logging.getLogger(__name__))
+        super(StatusKernel, self).__init__(**kwargs)
+        self.statuses = []
+        self.shell_handlers['comm_msg'] = self._noop
+        for msg_type in ('complete_request', 'execute_request'):
+            self.shell_handlers[msg_type] = self._noop
+
+    def _noop(self, stream, ident, parent):
+        pass
+
+    def _publish_status(self, status, parent=None):
+        parent = parent or self._parent_header
+        self.statuses.append((status, parent['header']['msg_type']))
+
+
+def _dispatch(kernel, msg_type):
+    session = kernel.session
+    msg = session.msg(msg_type, {})
+    frames = session.serialize(msg, ident=[b'client'])
+    kernel.dispatch_shell(None, [zmq.Message(f) for f in frames])
+
+
+def test_status_pairs_by_default():
+    kernel = StatusKernel()
+    for i in range(3):
+        _dispatch(kernel, 'complete_request')
+    nt.assert_equal([s for s,t in kernel.statuses], ['busy', 'idle'] * 3)
+
+
+def test_status_coalesced():
+    kernel = StatusKernel(status_coalesce_window=10)
+    for i in range(3):
+        _dispatch(kernel, 'complete_request')
+    _dispatch(kernel, 'comm_msg')
+    # one busy for the burst, idle deferred
+    nt.assert_equal(kernel.statuses, [('busy', 'complete_request')])
+    _dispatch(kernel, 'execute_request')
+    nt.assert_equal(kernel.statuses, [
+        ('busy', 'complete_request'),
+        ('idle', 'comm_msg'),
+        ('busy', 'execute_request'),
+        ('idle', 'execute_request'),
+    ])
+
+
+def test_coalesced_idle_after_window():
+    kernel = StatusKernel(status_coalesce_window=0.01)
+    _dispatch(kernel, 'complete_request')
+    nt.assert_equal(kernel.statuses, [('busy', 'complete_request')])
+    time.sleep(0.02)
+    kernel.do_one_iteration()
+    nt.assert_equal(kernel.statuses, [
+        ('busy', 'complete_request'),
+        ('idle', 'complete_request'),
+    ])
+
+
+def test_slow_request_ends_burst():
+    kernel = StatusKernel(status_coalesce_window=10)
+    kernel.shell_handlers['inspect_request'] = lambda *args: time.sleep(0.01)
+    _dispatch(kernel, 'complete_request')
+    _dispatch(kernel, 'inspect_request')
+    # idle right after the slow request
+    nt.assert_equal(kernel.statuses, [
+        ('busy', 'complete_request'),
+        ('idle', 'inspect_request'),
+    ])
+    _dispatch(kernel, 'complete_request')
+    nt.assert_equal(kernel.statuses[-1], ('busy', 'complete_request'))
@@ -0,0 +1,306 @@
+"""Fast validity checks compiled from the notebook JSON schemas.
+
+jsonschema walks the schema generically for every value of the notebook,
+and evaluates every branch of ``oneOf`` for every cell and output.
+:class:`CompiledSchema` compiles a schema into nested Python checks once,
+and dispatches each ``oneOf`` over cell or output types directly to the
+branch for the type of the instance.
+
+The compiled checks only say whether an instance is valid.
+Invalid instances should be validated again with jsonschema,
+which builds a detailed error.
+
+Only the subset of JSON schema (draft 4) used by the notebook schemas is supported.
+Compiling a schema using anything else raises :class:`UnsupportedSchema`.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import numbers
+import re
+
+from IPython.utils.py3compat import string_types, PY3
+
+if PY3:
+    integer_types = (int,)
+else:
+    integer_types = (int, long)
+
+# keywords that don't affect validation
+_ignored = {'$schema', 'description', 'definitions', 'id', 'title', 'default'}
+
+
+class UnsupportedSchema(Exception):
+    """A schema can't be compiled"""
+    pass
+
+
+def _is_integer(x):
+    return isinstance(x, integer_types) and not isinstance(x, bool)
+
+def _is_number(x):
+    return isinstance(x, numbers.Number) and not isinstance(x, bool)
+
+_type_checks = {
+    'object': lambda x: isinstance(x, dict),
+    'array': lambda x: isinstance(x, list),
+    'string': lambda x: isinstance(x, string_types),
+    'integer': _is_integer,
+    'number': _is_number,
+    'boolean': lambda x: isinstance(x, bool),
+    'null': lambda x: x is None,
+}
+
+
+def _all(checks):
+    """Combine checks into one, which passes if they all pass"""
+    if not checks:
+        return lambda x: True
+    if len(checks) == 1:
+        return checks[0]
+    def check(x):
+        for c in checks:
+            if not c(x):
+                return False
+        return True
+    return check
+
+
+def _unique(items):
+    try:
+        return len(set(items)) == len(items)
+    except TypeError:
+        # unhashable items
+        for i, a in enumerate(items):
+            for b in items[i+1:]:
+                if a == b:
+                    return False
+        return True
+
+
+class CompiledSchema(object):
+    """A JSON schema compiled into Python checks
+
+    Parameters
+    ----------
+    schema : dict
+        A JSON schema. Only references to its own definitions are supported.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._refs = {}
+        self._check = self._compile(schema)
+
+    def is_valid(self, instance, ref=None):
+        """Whether the instance is valid
+
+        If `ref` is given, the instance is checked against that definition
+        of the schema instead of the whole schema.
+        """
+        if ref is None:
+            return self._check(instance)
+        return self._compile_ref('#/definitions/%s' % ref)(instance)
+
+    def _resolve(self, ref):
+        if not ref.startswith('#/'):
+            raise UnsupportedSchema("Only local references are supported: %r" % ref)
+        schema = self.schema
+        for part in ref[2:].split('/'):
+            try:
+                schema = schema[part]
+            except (KeyError, TypeError):
+                raise UnsupportedSchema("Unresolvable reference: %r" % ref)
+        return schema
+
+    def _compile_ref(self, ref):
+        if ref not in self._refs:
+            # a placeholder, for references to definitions being compiled
+            cell = []
+            self._refs[ref] = lambda x: cell[0](x)
+            check = self._compile(self._resolve(ref))
+            cell.append(check)
+            self._refs[ref] = check
+        return self._refs[ref]
+
+    def _compile(self, schema):
+        """Compile a schema into a check"""
+        if not isinstance(schema, dict):
+            raise UnsupportedSchema("Not a schema: %r" % schema)
+        if '$ref' in schema:
+            # other keywords next to $ref are ignored in draft 4
+            return self._compile_ref(schema['$ref'])
+
+        keys = set(schema) - _ignored
+        checks = []
+
+        if 'type' in keys:
+            checks.append(self._compile_type(schema['type']))
+        if 'enum' in keys:
+            enum = schema['enum']
+            if all(isinstance(e, string_types) for e in enum):
+                strings = frozenset(enum)
+                checks.append(lambda x: isinstance(x, string_types) and x in strings)
+            else:
+                checks.append(lambda x: x in enum)
+
+        object_keys = {'required', 'properties', 'additionalProperties', 'patternProperties'}
+        if keys & object_keys:
+            checks.append(self._compile_object(schema))
+        array_keys = {'items', 'uniqueItems'}
+        if keys & array_keys:
+            checks.append(self._compile_array(schema))
+        number_keys = {'minimum', 'maximum'}
+        if keys & number_keys:
+            checks.append(self._compile_number(schema))
+        if 'pattern' in keys:
+            search = re.compile(schema['pattern']).search
+            checks.append(lambda x: not isinstance(x, string_types) or search(x) is not None)
+        if 'oneOf' in keys:
+            checks.append(self._compile_one_of(schema['oneOf']))
+
+        unsupported = keys - object_keys - array_keys - number_keys - {'type', 'enum', 'pattern', 'oneOf'}
+        if unsupported:
+            raise UnsupportedSchema("Unsupported keywords: %s" % ', '.join(sorted(unsupported)))
+        return _all(checks)
+
+    def _compile_type(self, types):
+        if isinstance(types, string_types):
+            types = [types]
+        try:
+            type_checks = [ _type_checks[t] for t in types ]
+        except KeyError as e:
+            raise UnsupportedSchema("Unsupported type: %s" % e)
+        if len(type_checks) == 1:
+            return type_checks[0]
+        return lambda x: any(c(x) for c in type_checks)
+
+    def _compile_object(self, schema):
+        required = schema.get('required', [])
+        properties = dict((key, self._compile(sub))
+            for key, sub in schema.get('properties', {}).items())
+        patterns = [ (re.compile(pattern).search, self._compile(sub))
+            for pattern, sub in schema.get('patternProperties', {}).items() ]
+        additional = schema.get('additionalProperties', True)
+        if isinstance(additional, dict):
+            additional = self._compile(additional)
+
+        def check(x):
+            if not isinstance(x, dict):
+                return True
+            for key in required:
+                if key not in x:
+                    return False
+            for key, value in x.items():
+                sub = properties.get(key)
+                if sub is not None:
+                    if not sub(value):
+                        return False
+                    # patternProperties apply to properties too
+                    if not patterns:
+                        continue
+                matched = sub is not None
+                for search, pattern_check in patterns:
+                    if search(key) is not None:
+                        matched = True
+                        if not pattern_check(value):
+                            return False
+                if matched or additional is True:
+                    continue
+                if additional is False or not additional(value):
+                    return False
+            return True
+        return check
+
+    def _compile_array(self, schema):
+        items = schema.get('items')
+        if isinstance(items, list):
+            raise UnsupportedSchema("Tuple items are not supported")
+        item_check = self._compile(items) if items is not None else None
+        unique = schema.get('uniqueItems', False)
+
+        def check(x):
+            if not isinstance(x, list):
+                return True
+            if item_check is not None:
+                for item in x:
+                    if not item_check(item):
+                        return False
+            if unique and not _unique(x):
+                return False
+            return True
+        return check
+
+    def _compile_number(self, schema):
+        minimum = schema.get('minimum')
+        maximum = schema.get('maximum')
+        def check(x):
+            if not _is_number(x):
+                return True
+            if minimum is not None and x < minimum:
+                return False
+            if maximum is not None and x > maximum:
+                return False
+            return True
+        return check
+
+    def _discriminator(self, branches):
+        """Find a property whose value selects the single possible branch of a oneOf
+
+        Each branch must be an object that requires the property
+        and restricts it to an enum of values not allowed by the other branches.
+        Returns (property, {value: branch index}), or None.
+        """
+        resolved = []
+        for branch in branches:
+            while '$ref' in branch:
+                branch = self._resolve(branch['$ref'])
+            if branch.get('type') != 'object':
+                return None
+            resolved.append(branch)
+        for key in resolved[0].get('required', []):
+            by_value = {}
+            for i, branch in enumerate(resolved):
+                prop = branch.get('properties', {}).get(key, {})
+                if key not in branch.get('required', []) or set(prop) - _ignored != {'enum'}:
+                    break
+                values = prop['enum']
+                if not all(isinstance(v, string_types) for v in values):
+                    break
+                if any(v in by_value for v in values):
+                    break
+                for v in values:
+                    by_value[v] = i
+            else:
+                return key, by_value
+        return None
+
+    def _compile_one_of(self, branches):
+        checks = [ self._compile(branch) for branch in branches ]
+        discriminator = self._discriminator(branches)
+        if discriminator is not None:
+            # Only the branch for the value of the discriminating property can match,
+            # because the other branches require other values.
+            key, by_value = discriminator
+            def check(x):
+                if not isinstance(x, dict):
+                    return False
+                value = x.get(key)
+                if not isinstance(value, string_types):
+                    return False
+                i = by_value.get(value)
+                if i is None:
+                    return False
+                return checks[i](x)
+            return check
+
+        def check(x):
+            n = 0
+            for c in checks:
+                if c(x):
+                    n += 1
+                    if n > 1:
+                        return False
+            return n == 1
+        return check
@@ -5,13 +5,24 @@
 
 import base64
 from contextlib import contextmanager
+from datetime import datetime
 import hashlib
 from hmac import HMAC
 import io
+import json
 import os
+import threading
+
+try:
+    import sqlite3
+except ImportError:
+    try:
+        from pysqlite2 import dbapi2 as sqlite3
+    except ImportError:
+        sqlite3 = None
 
 from IPython.utils.py3compat import string_types, unicode_type, cast_bytes
-from IPython.utils.traitlets import Instance, Bytes, Enum, Any, Unicode, Bool
+from IPython.utils.traitlets import Instance, Bytes, Enum, Any, Unicode, Bool, Integer
 from IPython.config import LoggingConfigurable, MultipleInstanceError
 from IPython.core.application import BaseIPythonApplication, base_flags
 
@@ -47,6 +58,27 @@ def yield_everything(obj):
         yield unicode_type(obj).encode('utf8')
 
 
+def _canonical_json(obj):
+    return cast_bytes(json.dumps(obj, sort_keys=True, separators=(',', ':'), default=unicode_type))
+
+
+def yield_canonical(nb):
+    """Yield a canonical byte encoding of a notebook, one cell at a time
+    
+    The first chunk is the sorted, compact JSON of the notebook with each
+    worksheet's cells replaced by their number, and it is followed by the
+    JSON of each cell. JSON is encoded by the C encoder where available,
+    which is much faster than walking the notebook with :func:`yield_everything`.
+    """
+    worksheets = nb.get('worksheets', [])
+    skeleton = dict(nb)
+    skeleton['worksheets'] = [ dict(ws, cells=len(ws.get('cells', []))) for ws in worksheets ]
+    yield _canonical_json(skeleton)
+    for ws in worksheets:
+        for cell in ws.get('cells', []):
+            yield _canonical_json(cell)
+
+
 @contextmanager
 def signature_removed(nb):
     """Context manager for operating on a notebook with its signature removed
@@ -64,6 +96,10 @@ def signature_removed(nb):
 class NotebookNotary(LoggingConfigurable):
     """A class for computing and verifying notebook signatures."""
     
+    def __init__(self, **kwargs):
+        super(NotebookNotary, self).__init__(**kwargs)
+        self._db_lock = threading.Lock()
+    
     profile_dir = Instance("IPython.core.profiledir.ProfileDir")
     def _profile_dir_default(self):
         from IPython.core.application import BaseIPythonApplication
@@ -97,6 +133,59 @@ def _secret_file_default(self):
             return ''
         return os.path.join(self.profile_dir.security_dir, 'notebook_secret')
     
+    db_file = Unicode(config=True,
+        help="""The sqlite file in which to store notebook signatures.
+        By default, this will be in your IPython profile.
+        You can set it to ':memory:' to disable sqlite writing to the filesystem.
+        """
+    )
+    def _db_file_default(self):
+        if self.profile_dir is None:
+            return ':memory:'
+        return os.path.join(self.profile_dir.security_dir, u'nbsignatures.db')
+    
+    cache_size = Integer(65535, config=True,
+        help="""The number of notebook signatures to keep in the database.
+        When this is exceeded, the least recently seen signatures are culled.
+        """
+    )
+    
+    db = Any()
+    def _db_default(self):
+        if sqlite3 is None:
+            self.log.warn("Missing SQLite3, notebook signatures will not be stored")
+            return None
+        kwargs = dict(detect_types=sqlite3.PARSE_DECLTYPES|sqlite3.PARSE_COLNAMES,
+            # files may be signed on a background thread of the notebook server
+            check_same_thread=False,
+        )
+        try:
+            db = sqlite3.connect(self.db_file, **kwargs)
+            self.init_db(db)
+        except (sqlite3.DatabaseError, sqlite3.OperationalError):
+            if self.db_file == ':memory:':
+                raise
+            self.log.warn("Failed to open signatures database %s, using in-memory database",
+                self.db_file, exc_info=True)
+            db = sqlite3.connect(':memory:', **kwargs)
+            self.init_db(db)
+        return db
+    
+    def init_db(self, db):
+        """Create the tables of the signatures database, if necessary"""
+        db.execute("""
+        CREATE TABLE IF NOT EXISTS nbsignatures
+        (
+            id integer PRIMARY KEY AUTOINCREMENT,
+            algorithm text,
+            signature text,
+            last_seen timestamp
+        )""")
+        db.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS algosig ON nbsignatures(algorithm, signature)
+        """)
+        db.commit()
+    
     secret = Bytes(config=True,
         help="""The secret key with which notebooks are signed."""
     )
@@ -138,20 +227,96 @@ def compute_signature(self, nb):
         
         return hmac.hexdigest()
     
+    def compute_db_signature(self, nb):
+        """Compute the signature of a notebook stored in the signatures database
+        
+        This is an HMAC digest of the canonical encoding of the notebook
+        from :func:`yield_canonical`, which is much faster to compute than
+        the signature stored in the notebook.
+        """
+        hmac = HMAC(self.secret, digestmod=self.digestmod)
+        with signature_removed(nb):
+            for b in yield_canonical(nb):
+                hmac.update(b)
+        return hmac.hexdigest()
+    
+    def store_signature(self, signature):
+        """Store a signature computed by compute_db_signature in the database"""
+        if self.db is None:
+            return
+        with self._db_lock:
+            try:
+                self.db.execute("""INSERT OR IGNORE INTO nbsignatures
+                    (algorithm, signature, last_seen) VALUES (?, ?, ?)""",
+                    (self.algorithm, signature, datetime.utcnow())
+                )
+                self.db.execute("""UPDATE nbsignatures SET last_seen = ? WHERE
+                    algorithm = ? AND signature = ?""",
+                    (datetime.utcnow(), self.algorithm, signature)
+                )
+                self.db.commit()
+                if self._db_size() > self.cache_size:
+                    self.cull_db()
+            except sqlite3.Error:
+                self.log.warn("Failed to store notebook signature", exc_info=True)
+    
+    def signature_stored(self, signature):
+        """Is a signature computed by compute_db_signature in the database?
+        
+        If it is, it is marked as seen, so that it is culled last.
+        """
+        if self.db is None:
+            return False
+        with self._db_lock:
+            try:
+                r = self.db.execute("""SELECT id FROM nbsignatures WHERE
+                    algorithm = ? AND signature = ?""",
+                    (self.algorithm, signature)
+                ).fetchone()
+                if r is None:
+                    return False
+                self.db.execute("UPDATE nbsignatures SET last_seen = ? WHERE id = ?",
+                    (datetime.utcnow(), r[0])
+                )
+                self.db.commit()
+            except sqlite3.Error:
+                self.log.warn("Failed to look up notebook signature", exc_info=True)
+                return False
+        return True
+    
+    def _db_size(self):
+        return self.db.execute("SELECT count(*) FROM nbsignatures").fetchone()[0]
+    
+    def cull_db(self):
+        """Cull the least recently seen signatures, leaving 75% of cache_size"""
+        self.db.execute("""DELETE FROM nbsignatures WHERE id IN (
+            SELECT id FROM nbsignatures ORDER BY last_seen DESC, id DESC LIMIT -1 OFFSET ?
+        )""", (max(int(0.75 * self.cache_size), 1),))
+        self.db.commit()
+    
     def check_signature(self, nb):
-        """Check a notebook's stored signature
+        """Check a notebook's signature
+        
+        The notebook is trusted if its signature is in the signatures database.
         
-        If a signature is stored in the notebook's metadata,
-        a new signature is computed and compared with the stored value.
+        Otherwise, if a signature is stored in the notebook's metadata,
+        a new signature is computed and compared with the stored value,
+        and the notebook's signature is added to the database if they match.
         
         Returns True if the signature is found and matches, False otherwise.
         
-        The following conditions must all be met for a notebook to be trusted:
+        The following conditions must all be met for a notebook to be trusted
+        by the signature in its metadata:
         - a signature is stored in the form 'scheme:hexdigest'
         - the stored scheme matches the requested scheme
         - the requested scheme is available from hashlib
         - the computed hash from notebook_signature matches the stored hash
         """
+        db_signature = None
+        if self.db is not None:
+            db_signature = self.compute_db_signature(nb)
+            if self.signature_stored(db_signature):
+                return True
         stored_signature = nb['metadata'].get('signature', None)
         if not stored_signature \
             or not isinstance(stored_signature, string_types) \
@@ -161,7 +326,12 @@ def check_signature(self, nb):
         if self.algorithm != stored_algo:
             return False
         my_signature = self.compute_signature(nb)
-        return my_signature == sig
+        if my_signature != sig:
+            return False
+        if db_signature is not None:
+            # next time, this notebook will be trusted from the database
+            self.store_signature(db_signature)
+        return True
     
     def sign(self, nb):
         """Sign a notebook, indicating that its output is trusted
@@ -169,9 +339,13 @@ def sign(self, nb):
         stores 'algo:hmac-hexdigest' in notebook.metadata.signature
         
         e.g. 'sha256:deadbeef123...'
+        
+        and adds the notebook's signature to the signatures database.
         """
         signature = self.compute_signature(nb)
         nb['metadata']['signature'] = "%s:%s" % (self.algorithm, signature)
+        if self.db is not None:
+            self.store_signature(self.compute_db_signature(nb))
     
     def mark_cells(self, nb, trusted):
         """Mark cells as trusted if the notebook's signature can be verified
@@ -24,6 +24,7 @@ class TestNotary(TestsBase):
     
     def setUp(self):
         self.notary = sign.NotebookNotary(
+            db_file=':memory:',
             secret=b'secret',
             profile_dir=get_ipython().profile_dir
         )
@@ -79,6 +80,51 @@ def test_check_signature(self):
         notary.sign(nb)
         self.assertTrue(check_signature(nb))
     
+    def test_check_signature_db(self):
+        nb = self.nb
+        notary = self.notary
+        notary.sign(nb)
+        # trusted from the database, without the signature in the notebook
+        nb.metadata.pop('signature')
+        notary.compute_signature = None
+        self.assertTrue(notary.check_signature(nb))
+        del notary.compute_signature
+        # but not once changed
+        nb.worksheets[0].cells.pop()
+        self.assertFalse(notary.check_signature(nb))
+    
+    def test_signature_added_to_db(self):
+        nb = self.nb
+        notary = self.notary
+        nb.metadata.signature = u'%s:%s' % (notary.algorithm, notary.compute_signature(nb))
+        db_signature = notary.compute_db_signature(nb)
+        self.assertFalse(notary.signature_stored(db_signature))
+        self.assertTrue(notary.check_signature(nb))
+        self.assertTrue(notary.signature_stored(db_signature))
+    
+    def test_cull_db(self):
+        notary = self.notary
+        notary.cache_size = 4
+        for i in range(6):
+            notary.store_signature(u'sig%i' % i)
+        # culled to 75% of cache_size when exceeded
+        self.assertEqual(notary._db_size(), 4)
+        self.assertFalse(notary.signature_stored(u'sig0'))
+        self.assertTrue(notary.signature_stored(u'sig5'))
+    
+    def test_canonical_encoding(self):
+        nb = self.nb
+        chunks = list(sign.yield_canonical(nb))
+        ncells = len(nb.worksheets[0].cells)
+        self.assertEqual(len(chunks), 1 + ncells)
+        sig1 = self.notary.compute_db_signature(nb)
+        nb.worksheets[0].cells[0].metadata.foo = 1
+        self.assertNotEqual(self.notary.compute_db_signature(nb), sig1)
+        # the notebook signature doesn't count
+        sig2 = self.notary.compute_db_signature(nb)
+        nb.metadata.signature = u'sha256:abc'
+        self.assertEqual(self.notary.compute_db_signature(nb), sig2)
+    
     def test_mark_cells_untrusted(self):
         cells = self.nb.worksheets[0].cells
         self.notary.mark_cells(self.nb, False)
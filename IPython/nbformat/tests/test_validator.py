@@ -3,12 +3,14 @@
 # Copyright (c) IPython Development Team.
 # Distributed under the terms of the Modified BSD License.
 
+import copy
 import os
 
 from .base import TestsBase
 from jsonschema import ValidationError
 from ..current import read
-from ..validator import isvalid, validate
+from ..fastvalidate import CompiledSchema, UnsupportedSchema
+from ..validator import isvalid, validate, get_validator, get_compiled_schema
 
 
 #-----------------------------------------------------------------------------
@@ -52,3 +54,101 @@ def test_future(self):
 
         self.assertEqual(isvalid(nb, version=3), False)
         self.assertEqual(isvalid(nb), True)
+
+
+class TestCompiledSchema(TestsBase):
+
+    def assert_agrees(self, nb, ref=None):
+        """The compiled schema and jsonschema agree on whether nb is valid"""
+        validator = get_validator(3)
+        compiled = get_compiled_schema(3)
+        if ref is None:
+            expected = validator.is_valid(nb)
+        else:
+            expected = validator.is_valid(nb, {'$ref': '#/definitions/%s' % ref})
+        self.assertEqual(compiled.is_valid(nb, ref), expected)
+        return expected
+
+    def test_valid(self):
+        for fname in (u'test2.ipynb', u'test3.ipynb'):
+            with self.fopen(fname, u'r') as f:
+                nb = read(f, u'json')
+            self.assertTrue(self.assert_agrees(nb))
+
+    def test_invalid(self):
+        with self.fopen(u'invalid.ipynb', u'r') as f:
+            nb = read(f, u'json')
+        self.assertFalse(self.assert_agrees(nb))
+
+    def test_mutations(self):
+        with self.fopen(u'test3.ipynb', u'r') as f:
+            nb = read(f, u'json')
+        cells = nb.worksheets[0].cells
+        code = [ c for c in cells if c.cell_type == 'code' and c.outputs ][0]
+        mutations = [
+            lambda nb, cell: cell.__setitem__('cell_type', 'nope'),
+            lambda nb, cell: cell.__setitem__('input', 5),
+            lambda nb, cell: cell.__setitem__('input', ['a', 5]),
+            lambda nb, cell: cell.__setitem__('prompt_number', -1),
+            lambda nb, cell: cell.__setitem__('prompt_number', None),
+            lambda nb, cell: cell.__setitem__('prompt_number', True),
+            lambda nb, cell: cell.__setitem__('collapsed', 0),
+            lambda nb, cell: cell.__setitem__('extra', 0),
+            lambda nb, cell: cell.__delitem__('language'),
+            lambda nb, cell: cell.outputs.append(5),
+            lambda nb, cell: cell.outputs.append({'output_type': 'stream'}),
+            lambda nb, cell: cell.outputs.append({'output_type': 'pyout', 'prompt_number': 1,
+                'text/plain': 'x'}),
+            lambda nb, cell: cell.outputs.append({'output_type': 'pyout', 'prompt_number': 1,
+                'text/plain': 5}),
+            lambda nb, cell: cell.outputs.append({'output_type': 'display_data', 'png': ['x']}),
+            lambda nb, cell: cell.outputs.append({'output_type': 'pyerr', 'ename': 'E',
+                'evalue': 'e', 'traceback': ['a', None]}),
+            lambda nb, cell: cell.metadata.__setitem__('tags', ['a', 'a']),
+            lambda nb, cell: nb.__setitem__('nbformat', 4),
+            lambda nb, cell: nb.metadata.__setitem__('signature', 5),
+            lambda nb, cell: nb.worksheets.append({'cells': [], 'extra': 1}),
+        ]
+        for mutate in mutations:
+            mutated = copy.deepcopy(nb)
+            cell = mutated.worksheets[0].cells[cells.index(code)]
+            mutate(mutated, cell)
+            self.assert_agrees(mutated)
+            self.assert_agrees(cell, 'code_cell')
+
+    def test_validate_errors(self):
+        """Invalid notebooks still get detailed errors from jsonschema"""
+        with self.fopen(u'test3.ipynb', u'r') as f:
+            nb = read(f, u'json')
+        nb.worksheets[0].cells[0]['source'] = 5
+        with self.assertRaises(ValidationError) as r:
+            validate(nb)
+        self.assertEqual(r.exception.instance, 5)
+
+    def test_one_of(self):
+        schema = {
+            'oneOf': [
+                {'type': 'object', 'required': ['kind'],
+                    'properties': {'kind': {'enum': ['a']}, 'x': {'type': 'integer'}}},
+                {'type': 'object', 'required': ['kind'],
+                    'properties': {'kind': {'enum': ['b', 'c']}, 'x': {'type': 'string'}}},
+            ]
+        }
+        compiled = CompiledSchema(schema)
+        self.assertTrue(compiled.is_valid({'kind': 'a', 'x': 1}))
+        self.assertTrue(compiled.is_valid({'kind': 'c', 'x': 'y'}))
+        self.assertFalse(compiled.is_valid({'kind': 'a', 'x': 'y'}))
+        self.assertFalse(compiled.is_valid({'kind': 'd'}))
+        self.assertFalse(compiled.is_valid({}))
+        self.assertFalse(compiled.is_valid(5))
+        # no discriminator: exactly one branch must match
+        compiled = CompiledSchema({'oneOf': [{'type': 'integer'}, {'minimum': 0}]})
+        self.assertTrue(compiled.is_valid(-1))
+        self.assertTrue(compiled.is_valid('x'))
+        self.assertFalse(compiled.is_valid(1))
+
+    def test_unsupported(self):
+        with self.assertRaises(UnsupportedSchema):
+            CompiledSchema({'type': 'array', 'maxItems': 2})
+        with self.assertRaises(UnsupportedSchema):
+            CompiledSchema({'$ref': 'http://example.com/schema'})
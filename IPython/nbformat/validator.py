@@ -21,9 +21,12 @@
     raise ImportError(str(e) + verbose_msg)
 
 from IPython.utils.importstring import import_item
+from .fastvalidate import CompiledSchema, UnsupportedSchema
 
 
 validators = {}
+# schemas compiled into fast checks, by version, or None if they can't be compiled
+compiled_schemas = {}
 
 def _relax_additional_properties(obj):
     """relax any `additionalProperties`"""
@@ -67,8 +70,27 @@ def get_validator(version=None, version_minor=None):
             schema_json = _relax_additional_properties(schema_json)
 
         validators[version_tuple] = Validator(schema_json)
+        try:
+            compiled_schemas[version_tuple] = CompiledSchema(schema_json)
+        except UnsupportedSchema as e:
+            warnings.warn("Can't compile the v%s schema: %s" % (version, e), UserWarning)
+            compiled_schemas[version_tuple] = None
     return validators[version_tuple]
 
+def get_compiled_schema(version=None, version_minor=None):
+    """Get the compiled schema, for quickly checking whether notebooks are valid
+
+    Returns None if there is no schema for this version, or it can't be compiled.
+    """
+    if version is None:
+        from .current import nbformat as version
+    if version_minor is None:
+        v = import_item("IPython.nbformat.v%s" % version)
+        version_minor = v.nbformat_minor
+    if get_validator(version, version_minor) is None:
+        return None
+    return compiled_schemas[(version, version_minor)]
+
 def isvalid(nbjson, ref=None, version=None, version_minor=None):
     """Checks whether the given notebook JSON conforms to the current
     notebook format schema. Returns True if the JSON is valid, and
@@ -124,6 +146,10 @@ def validate(nbjson, ref=None, version=None, version_minor=None):
     notebook format schema.
 
     Raises ValidationError if not valid.
+
+    Notebooks are checked with the compiled schema first,
+    and only validated by jsonschema if they are invalid,
+    to build a detailed error.
     """
     if version is None:
         from .reader import get_version
@@ -136,6 +162,10 @@ def validate(nbjson, ref=None, version=None, version_minor=None):
         warnings.warn("No schema for validating v%s notebooks" % version, UserWarning)
         return
 
+    compiled = get_compiled_schema(version, version_minor)
+    if compiled is not None and compiled.is_valid(nbjson, ref):
+        return
+
     try:
         if ref:
             return validator.validate(nbjson, {'$ref' : '#/definitions/%s' % ref})
@@ -1663,6 +1663,35 @@ def queue_status(self, targets='all', verbose=False):
         else:
             return content
 
+    @spin_first
+    def metrics(self):
+        """Fetch the Hub's instrumentation data.
+
+        Returns a dict with keys:
+
+        latency : dict
+            Rolling latency summaries (count, mean, p50, p90, p99, max), in seconds,
+            for each stage: 'queue_wait' (time in the task scheduler),
+            'dispatch' (submission to start of execution), 'execution' (on the engine),
+            'result_relay' (engine completion to arrival at the Hub),
+            and 'db_write' (time spent writing records to the Hub's DB).
+        rates : dict
+            Message counts and rates per second, keyed by socket and message type.
+        queues : dict
+            Current queue depths on the Hub, overall and per engine.
+        scheduler : dict
+            The latest metrics published by the TaskScheduler, if any.
+        """
+        self.session.send(self._query_socket, "metrics_request", content={})
+        idents, msg = self.session.recv(self._query_socket, 0)
+        if self.debug:
+            pprint(msg)
+        content = msg['content']
+        status = content.pop('status')
+        if status != 'ok':
+            raise self._unwrap_exception(content)
+        return content
+
     def _build_msgids_from_target(self, targets=None):
         """Build a list of msg_ids from the list of engine targets"""
         if not targets: # needed as _build_targets otherwise uses all engines
@@ -24,7 +24,8 @@
 from IPython.utils.localinterfaces import localhost
 from IPython.utils.py3compat import cast_bytes, unicode_type, iteritems
 from IPython.utils.traitlets import (
-        HasTraits, Any, Instance, Integer, Unicode, Dict, Set, Tuple, DottedObjectName
+        HasTraits, Any, Instance, Integer, Unicode, Dict, Set, Tuple, DottedObjectName,
+        Float,
         )
 
 from IPython.parallel import error, util
@@ -33,6 +34,7 @@
 from IPython.kernel.zmq.session import SessionFactory
 
 from .heartmonitor import HeartMonitor
+from .metrics import Metrics, timedelta_seconds
 
 
 def _passer(*args, **kwargs):
@@ -210,6 +212,12 @@ def _registration_timeout_default(self):
             # heartmonitor period is in milliseconds, so 10x in seconds is .01
         return max(30, int(.01 * self.heartmonitor.period))
 
+    metrics_window = Float(60, config=True,
+        help="""The length (in seconds) of the rolling window over which the Hub
+        collects latency histograms and message rates, as returned by
+        `Client.metrics()`."""
+    )
+
     # not configurable
     db = Instance('IPython.parallel.controller.dictdb.BaseDB')
     heartmonitor = Instance('IPython.parallel.controller.heartmonitor.HeartMonitor')
@@ -338,7 +346,8 @@ def init_hub(self):
         self.hub = Hub(loop=loop, session=self.session, monitor=sub, heartmonitor=self.heartmonitor,
                 query=q, notifier=n, resubmit=r, db=self.db,
                 engine_info=self.engine_info, client_info=self.client_info,
-                log=self.log, registration_timeout=self.registration_timeout)
+                log=self.log, registration_timeout=self.registration_timeout,
+                metrics=Metrics(window=self.metrics_window))
 
 
 class Hub(SessionFactory):
@@ -359,6 +368,7 @@ class Hub(SessionFactory):
                 to the queues.
     client_info: dict of zmq connection information for engines to connect
                 to the queues.
+    metrics: Metrics object collecting latencies and message rates
     """
     
     engine_state_file = Unicode()
@@ -380,6 +390,8 @@ class Hub(SessionFactory):
     incoming_registrations=Dict()
     registration_timeout=Integer()
     _idcounter=Integer(0)
+    _submitted=Dict() # submission dates of pending msg_ids, for metrics
+    scheduler_metrics=Dict() # latest metrics snapshot from the TaskScheduler
 
     # objects from constructor:
     query=Instance(ZMQStream)
@@ -390,6 +402,9 @@ class Hub(SessionFactory):
     db=Instance(object)
     client_info=Dict()
     engine_info=Dict()
+    metrics=Instance(Metrics)
+    def _metrics_default(self):
+        return Metrics()
 
 
     def __init__(self, **kwargs):
@@ -424,6 +439,7 @@ def __init__(self, **kwargs):
                                 b'incontrol': _passer,
                                 b'outcontrol': _passer,
                                 b'iopub': self.save_iopub_message,
+                                b'schedmetrics': self.save_scheduler_metrics,
         }
 
         self.query_handlers = {'queue_request': self.queue_status,
@@ -437,6 +453,7 @@ def __init__(self, **kwargs):
                                 'registration_request' : self.register_engine,
                                 'unregistration_request' : self.unregister_engine,
                                 'connection_request': self.connection_request,
+                                'metrics_request': self.metrics_request,
         }
 
         # ignore resubmit replies
@@ -506,6 +523,7 @@ def dispatch_monitor_traffic(self, msg):
             return
         handler = self.monitor_handlers.get(switch, None)
         if handler is not None:
+            self.metrics.incr('monitor.' + switch.decode('ascii'))
             handler(idents, msg)
         else:
             self.log.error("Unrecognized monitor topic: %r", switch)
@@ -545,6 +563,7 @@ def dispatch_query(self, msg):
             return
 
         else:
+            self.metrics.incr('query.' + msg_type)
             handler(idents, msg)
 
     def dispatch_db(self, msg):
@@ -616,17 +635,20 @@ def save_queue_request(self, idents, msg):
                 elif evalue and not rvalue:
                     record[key] = evalue
             try:
-                self.db.update_record(msg_id, record)
+                with self.metrics.timer('db_write'):
+                    self.db.update_record(msg_id, record)
             except Exception:
                 self.log.error("DB Error updating record %r", msg_id, exc_info=True)
         except KeyError:
             try:
-                self.db.add_record(msg_id, record)
+                with self.metrics.timer('db_write'):
+                    self.db.add_record(msg_id, record)
             except Exception:
                 self.log.error("DB Error adding record %r", msg_id, exc_info=True)
 
 
         self.pending.add(msg_id)
+        self._submitted[msg_id] = record['submitted']
         self.queues[eid].append(msg_id)
 
     def save_queue_result(self, idents, msg):
@@ -677,8 +699,10 @@ def save_queue_result(self, idents, msg):
         }
 
         result['result_buffers'] = msg['buffers']
+        self._observe_result(msg_id, result)
         try:
-            self.db.update_record(msg_id, result)
+            with self.metrics.timer('db_write'):
+                self.db.update_record(msg_id, result)
         except Exception:
             self.log.error("DB Error updating record %r", msg_id, exc_info=True)
 
@@ -703,6 +727,7 @@ def save_task_request(self, idents, msg):
         msg_id = header['msg_id']
         self.pending.add(msg_id)
         self.unassigned.add(msg_id)
+        self._submitted[msg_id] = record['submitted']
         try:
             # it's posible iopub arrived first:
             existing = self.db.get_record(msg_id)
@@ -725,12 +750,14 @@ def save_task_request(self, idents, msg):
                 elif evalue and not rvalue:
                     record[key] = evalue
             try:
-                self.db.update_record(msg_id, record)
+                with self.metrics.timer('db_write'):
+                    self.db.update_record(msg_id, record)
             except Exception:
                 self.log.error("DB Error updating record %r", msg_id, exc_info=True)
         except KeyError:
             try:
-                self.db.add_record(msg_id, record)
+                with self.metrics.timer('db_write'):
+                    self.db.add_record(msg_id, record)
             except Exception:
                 self.log.error("DB Error adding record %r", msg_id, exc_info=True)
         except Exception:
@@ -784,8 +811,10 @@ def save_task_result(self, idents, msg):
             }
 
             result['result_buffers'] = msg['buffers']
+            self._observe_result(msg_id, result)
             try:
-                self.db.update_record(msg_id, result)
+                with self.metrics.timer('db_write'):
+                    self.db.update_record(msg_id, result)
             except Exception:
                 self.log.error("DB Error saving task request %r", msg_id, exc_info=True)
 
@@ -811,9 +840,12 @@ def save_task_destination(self, idents, msg):
         #     self.log.debug("task::task %r not listed as MIA?!"%(msg_id))
 
         self.tasks[eid].append(msg_id)
+        # time spent waiting in the scheduler, as measured by the scheduler
+        self.metrics.observe('queue_wait', content.get('queued', None))
         # self.pending[msg_id][1].update(received=datetime.now(),engine=(eid,engine_uuid))
         try:
-            self.db.update_record(msg_id, dict(engine_uuid=engine_uuid))
+            with self.metrics.timer('db_write'):
+                self.db.update_record(msg_id, dict(engine_uuid=engine_uuid))
         except Exception:
             self.log.error("DB Error saving task destination %r", msg_id, exc_info=True)
 
@@ -884,10 +916,31 @@ def save_iopub_message(self, topics, msg):
             update_record = self.db.update_record
         
         try:
-            update_record(msg_id, d)
+            with self.metrics.timer('db_write'):
+                update_record(msg_id, d)
         except Exception:
             self.log.error("DB Error saving iopub message %r", msg_id, exc_info=True)
 
+    #--------------------- Metrics ------------------------------
+
+    def _observe_result(self, msg_id, result):
+        """record the per-stage latencies of a finished request"""
+        submitted = self._submitted.pop(msg_id, None)
+        started = result['started']
+        completed = result['completed']
+        self.metrics.observe('dispatch', timedelta_seconds(submitted, started))
+        self.metrics.observe('execution', timedelta_seconds(started, completed))
+        self.metrics.observe('result_relay', timedelta_seconds(completed, result['received']))
+
+    def save_scheduler_metrics(self, idents, msg):
+        """save the latest metrics snapshot published by the TaskScheduler"""
+        try:
+            msg = self.session.deserialize(msg, content=True)
+        except Exception:
+            self.log.error("task::invalid scheduler metrics message", exc_info=True)
+            return
+        self.scheduler_metrics = msg['content']
+
 
 
     #-------------------------------------------------------------------------
@@ -1003,6 +1056,7 @@ def _handle_stranded_msgs(self, eid, uuid):
         for msg_id in outstanding:
             self.pending.remove(msg_id)
             self.all_completed.add(msg_id)
+            self._submitted.pop(msg_id, None)
             try:
                 raise error.EngineError("Engine %r died while running task %r" % (eid, msg_id))
             except:
@@ -1184,6 +1238,29 @@ def queue_status(self, client_id, msg):
         # print (content)
         self.session.send(self.query, "queue_reply", content=content, ident=client_id)
 
+    def metrics_request(self, client_id, msg):
+        """Return the Hub's latency histograms, message rates and queue depths.
+
+        Keys:
+
+        * latency (per-stage latency summaries, in seconds)
+        * rates (message counts and rates per socket and message type)
+        * queues (current queue depths)
+        * scheduler (the latest snapshot published by the TaskScheduler)
+        """
+        content = self.metrics.snapshot()
+        content['status'] = 'ok'
+        queues = dict(
+            pending=len(self.pending),
+            unassigned=len(self.unassigned),
+        )
+        for eid in self.ids:
+            queues[str(eid)] = dict(queue=len(self.queues[eid]), tasks=len(self.tasks[eid]))
+        content['queues'] = queues
+        content['scheduler'] = self.scheduler_metrics
+        self.session.send(self.query, "metrics_reply", content=content,
+                                            parent=msg, ident=client_id)
+
     def purge_results(self, client_id, msg):
         """Purge results from memory. This method is more valuable before we move
         to a DB based message storage mechanism."""
@@ -0,0 +1,216 @@
+"""Lightweight instrumentation for the Hub and TaskScheduler.
+
+Latencies are collected in rolling, fixed-bucket histograms, so recording a
+sample is a bisect and a couple of integer increments, and memory use does not
+grow with the number of samples.  This keeps the overhead low enough to leave
+the metrics on in production.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+from __future__ import division
+
+import time
+from bisect import bisect_left
+
+
+def _default_bounds():
+    """Bucket upper bounds in seconds, from 10us to ~20 minutes.
+
+    Each bucket is a factor of two wider than the previous one.
+    """
+    bounds = []
+    b = 1e-5
+    while b < 1500:
+        bounds.append(b)
+        b *= 2
+    return bounds
+
+DEFAULT_BOUNDS = _default_bounds()
+
+
+def timedelta_seconds(start, end):
+    """Return the number of seconds between two datetimes, or None.
+
+    None is returned if either is missing, or if `end` precedes `start`,
+    which can happen when the two timestamps come from different clocks.
+    """
+    if start is None or end is None:
+        return None
+    try:
+        dt = (end - start).total_seconds()
+    except TypeError:
+        return None
+    if dt < 0:
+        return None
+    return dt
+
+
+class RollingHistogram(object):
+    """A histogram of the samples recorded in the last `window` seconds.
+
+    The window is split into `slices` sub-histograms, and the oldest one is
+    dropped as time advances, so the reported distribution reflects recent
+    behavior rather than the whole lifetime of the process.
+    """
+
+    def __init__(self, window=60, slices=6, bounds=None, clock=time.time):
+        self.window = window
+        self.slices = slices
+        self.bounds = DEFAULT_BOUNDS if bounds is None else sorted(bounds)
+        self.clock = clock
+        self._width = window / slices
+        nbuckets = len(self.bounds) + 1
+        self._counts = [ [0] * nbuckets for i in range(slices) ]
+        self._sums = [0.] * slices
+        self._epoch = int(clock() // self._width)
+        self.total = 0
+
+    def _advance(self):
+        """Rotate out slices that have fallen out of the window."""
+        epoch = int(self.clock() // self._width)
+        elapsed = epoch - self._epoch
+        if elapsed <= 0:
+            return
+        nbuckets = len(self.bounds) + 1
+        for i in range(min(elapsed, self.slices)):
+            idx = (self._epoch + 1 + i) % self.slices
+            self._counts[idx] = [0] * nbuckets
+            self._sums[idx] = 0.
+        self._epoch = epoch
+
+    def add(self, value):
+        """Record one sample, in seconds."""
+        if value is None:
+            return
+        self._advance()
+        idx = self._epoch % self.slices
+        self._counts[idx][bisect_left(self.bounds, value)] += 1
+        self._sums[idx] += value
+        self.total += 1
+
+    def _merged(self):
+        self._advance()
+        return [ sum(column) for column in zip(*self._counts) ]
+
+    def _quantile(self, counts, n, q):
+        """The upper bound of the bucket holding quantile `q`."""
+        target = q * n
+        seen = 0
+        for i, c in enumerate(counts):
+            seen += c
+            if c and seen >= target:
+                if i < len(self.bounds):
+                    return self.bounds[i]
+                return float('inf')
+        return None
+
+    def summary(self):
+        """Return a jsonable dict describing the current window."""
+        counts = self._merged()
+        n = sum(counts)
+        info = dict(count=n, total=self.total, window=self.window)
+        if not n:
+            info.update(mean=None, p50=None, p90=None, p99=None, max=None)
+            return info
+        info['mean'] = sum(self._sums) / n
+        for name, q in (('p50', .5), ('p90', .9), ('p99', .99), ('max', 1.)):
+            info[name] = self._quantile(counts, n, q)
+        # bucket bounds are not jsonable if infinite
+        for key in ('p50', 'p90', 'p99', 'max'):
+            if info[key] == float('inf'):
+                info[key] = self.bounds[-1]
+        return info
+
+
+class RateCounter(object):
+    """Count events over a rolling window, for reporting rates."""
+
+    def __init__(self, window=60, slices=6, clock=time.time):
+        self.window = window
+        self.slices = slices
+        self.clock = clock
+        self._width = window / slices
+        self._counts = [0] * slices
+        self._epoch = int(clock() // self._width)
+        self.total = 0
+
+    def _advance(self):
+        epoch = int(self.clock() // self._width)
+        elapsed = epoch - self._epoch
+        if elapsed <= 0:
+            return
+        for i in range(min(elapsed, self.slices)):
+            self._counts[(self._epoch + 1 + i) % self.slices] = 0
+        self._epoch = epoch
+
+    def incr(self, n=1):
+        self._advance()
+        self._counts[self._epoch % self.slices] += n
+        self.total += n
+
+    def summary(self):
+        self._advance()
+        count = sum(self._counts)
+        return dict(count=count, total=self.total, rate=count / self.window)
+
+
+class Metrics(object):
+    """A named collection of rolling histograms and rate counters.
+
+    Histograms and counters are created lazily on first use.
+
+    Parameters
+    ----------
+
+    window : float
+        The length in seconds of the rolling window.
+    """
+
+    def __init__(self, window=60, clock=time.time):
+        self.window = window
+        self.clock = clock
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, value):
+        """Record a latency sample (seconds) in histogram `name`."""
+        if value is None:
+            return
+        h = self.histograms.get(name)
+        if h is None:
+            h = self.histograms[name] = RollingHistogram(self.window, clock=self.clock)
+        h.add(value)
+
+    def incr(self, name, n=1):
+        """Increment rate counter `name`."""
+        c = self.counters.get(name)
+        if c is None:
+            c = self.counters[name] = RateCounter(self.window, clock=self.clock)
+        c.incr(n)
+
+    def timer(self, name):
+        """Context manager recording the duration of a block in `name`."""
+        return _Timer(self, name)
+
+    def snapshot(self):
+        """Return a jsonable dict of all current summaries."""
+        return dict(
+            window=self.window,
+            latency=dict((k, h.summary()) for k, h in self.histograms.items()),
+            rates=dict((k, c.summary()) for k, c in self.counters.items()),
+        )
+
+
+class _Timer(object):
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.time() - self.start)
@@ -29,7 +29,7 @@
 from IPython.external.decorator import decorator
 from IPython.config.application import Application
 from IPython.config.loader import Config
-from IPython.utils.traitlets import Instance, Dict, List, Set, Integer, Enum, CBytes
+from IPython.utils.traitlets import Instance, Dict, List, Set, Integer, Enum, CBytes, Float
 from IPython.utils.py3compat import cast_bytes
 
 from IPython.parallel import error, util
@@ -37,6 +37,7 @@
 from IPython.parallel.util import connect_logger, local_logger
 
 from .dependency import Dependency
+from .metrics import Metrics
 
 @decorator
 def logged(f,self,*args,**kwargs):
@@ -179,6 +180,16 @@ def _scheme_name_changed(self, old, new):
         self.log.debug("Using scheme %r"%new)
         self.scheme = globals()[new]
 
+    metrics_interval = Float(10, config=True,
+        help="""The interval (in seconds) at which the scheduler publishes its
+        queue depths, message rates and queue wait times to the Hub.
+        0 disables publishing."""
+    )
+    metrics_window = Float(60, config=True,
+        help="""The length (in seconds) of the rolling window over which the
+        scheduler collects queue wait times and message rates."""
+    )
+
     # input arguments:
     scheme = Instance(FunctionType) # function for determining the destination
     def _scheme_default(self):
@@ -209,6 +220,9 @@ def _queue_default(self):
     all_failed = Set() # set of all failed tasks
     all_done = Set() # set of all finished tasks=union(completed,failed)
     all_ids = Set() # set of all submitted task IDs
+    metrics = Instance(Metrics)
+    def _metrics_default(self):
+        return Metrics(window=self.metrics_window)
 
     ident = CBytes() # ZMQ identity. This should just be self.session.session
                      # but ensure Bytes
@@ -227,6 +241,10 @@ def start(self):
             unregistration_notification = self._unregister_engine
         )
         self.notifier_stream.on_recv(self.dispatch_notification)
+        if self.metrics_interval > 0:
+            pc = ioloop.PeriodicCallback(self.publish_metrics,
+                1000 * self.metrics_interval, self.loop)
+            pc.start()
         self.log.info("Scheduler started [%s]" % self.scheme_name)
 
     def resume_receiving(self):
@@ -238,6 +256,17 @@ def stop_receiving(self):
         Leave them in the ZMQ queue."""
         self.client_stream.on_recv(None)
 
+    def publish_metrics(self):
+        """Send a snapshot of our metrics and queue depths to the Hub."""
+        content = self.metrics.snapshot()
+        content['queues'] = dict(
+            waiting=len(self.queue_map),
+            running=sum(len(p) for p in self.pending.values()),
+            loads=dict((t.decode('ascii'), load) for t, load in zip(self.targets, self.loads)),
+        )
+        self.session.send(self.mon_stream, 'scheduler_metrics', content=content,
+                        ident=[b'schedmetrics', self.ident])
+
     #-----------------------------------------------------------------------
     # [Un]Registration Handling
     #-----------------------------------------------------------------------
@@ -383,6 +412,7 @@ def dispatch_submission(self, raw_msg):
 
         # send to monitor
         self.mon_stream.send_multipart([b'intask']+raw_msg, copy=False)
+        self.metrics.incr('client.submission')
 
         header = msg['header']
         md = msg['metadata']
@@ -605,8 +635,11 @@ def submit_task(self, job, indices=None):
         # update load
         self.add_job(idx)
         self.pending[target][job.msg_id] = job
+        queued = time.time() - job.timestamp
+        self.metrics.observe('queue_wait', queued)
         # notify Hub
-        content = dict(msg_id=job.msg_id, engine_id=target.decode('ascii'))
+        content = dict(msg_id=job.msg_id, engine_id=target.decode('ascii'),
+                       queued=queued)
         self.session.send(self.mon_stream, 'task_destination', content=content,
                         ident=[b'tracktask',self.ident])
 
@@ -632,6 +665,7 @@ def dispatch_result(self, raw_msg):
         except Exception:
             self.log.error("task::Invalid result: %r", raw_msg, exc_info=True)
             return
+        self.metrics.incr('engine.result')
 
         md = msg['metadata']
         parent = msg['parent_header']
@@ -280,6 +280,20 @@ def test_db_query_in(self):
         found = [ r['msg_id'] for r in recs ]
         self.assertEqual(set(odd), set(found))
     
+    def test_metrics(self):
+        self.client[-1].apply_sync(lambda : 1)
+        self.client.load_balanced_view().apply_sync(lambda : 1)
+        metrics = self.client.metrics()
+        self.assertEqual(sorted(metrics.keys()),
+            ['latency', 'queues', 'rates', 'scheduler', 'window'])
+        latency = metrics['latency']
+        for key in ('dispatch', 'execution', 'result_relay'):
+            self.assertTrue(latency[key]['count'] >= 1)
+        self.assertTrue(metrics['rates']['query.metrics_request']['count'] >= 1)
+        queues = metrics['queues']
+        self.assertTrue('pending' in queues)
+        self.assertTrue('unassigned' in queues)
+    
     def test_hub_history(self):
         hist = self.client.hub_history()
         recs = self.client.db_query({ 'msg_id' : {"$ne":''}})
@@ -0,0 +1,85 @@
+"""Tests for the Hub's metrics collection"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+from __future__ import division
+
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+import nose.tools as nt
+
+from IPython.parallel.controller.metrics import (
+    Metrics, RollingHistogram, RateCounter, timedelta_seconds,
+)
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.t = 1000.
+    
+    def __call__(self):
+        return self.t
+
+
+class TestMetrics(TestCase):
+    
+    def setUp(self):
+        self.clock = FakeClock()
+    
+    def test_histogram_summary(self):
+        h = RollingHistogram(window=60, clock=self.clock)
+        for i in range(100):
+            h.add(0.001)
+        h.add(1)
+        info = h.summary()
+        nt.assert_equal(info['count'], 101)
+        nt.assert_true(0.001 <= info['p50'] < 0.002)
+        nt.assert_true(info['max'] >= 1)
+        nt.assert_almost_equal(info['mean'], 1.1 / 101)
+    
+    def test_histogram_empty(self):
+        h = RollingHistogram(clock=self.clock)
+        info = h.summary()
+        nt.assert_equal(info['count'], 0)
+        nt.assert_is_none(info['p50'])
+    
+    def test_histogram_rolls(self):
+        h = RollingHistogram(window=60, slices=6, clock=self.clock)
+        h.add(0.5)
+        self.clock.t += 30
+        h.add(0.5)
+        nt.assert_equal(h.summary()['count'], 2)
+        self.clock.t += 40
+        nt.assert_equal(h.summary()['count'], 1)
+        self.clock.t += 600
+        info = h.summary()
+        nt.assert_equal(info['count'], 0)
+        nt.assert_equal(info['total'], 2)
+    
+    def test_rate(self):
+        c = RateCounter(window=10, clock=self.clock)
+        c.incr(50)
+        info = c.summary()
+        nt.assert_equal(info['rate'], 5)
+        self.clock.t += 20
+        nt.assert_equal(c.summary()['rate'], 0)
+    
+    def test_snapshot(self):
+        m = Metrics(window=10, clock=self.clock)
+        m.observe('execution', 0.1)
+        m.observe('execution', None)
+        m.incr('query.queue_request')
+        with m.timer('db_write'):
+            pass
+        snap = m.snapshot()
+        nt.assert_equal(sorted(snap['latency']), ['db_write', 'execution'])
+        nt.assert_equal(snap['latency']['execution']['count'], 1)
+        nt.assert_equal(snap['rates']['query.queue_request']['count'], 1)
+    
+    def test_timedelta_seconds(self):
+        now = datetime.now()
+        nt.assert_equal(timedelta_seconds(now, now + timedelta(seconds=2)), 2)
+        nt.assert_is_none(timedelta_seconds(now + timedelta(seconds=2), now))
+        nt.assert_is_none(timedelta_seconds(None, now))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""Benchmark completing names and LaTeX symbols, as on every keystroke in the notebook.
+
+Compares checking the prefix against every name, as the completer used to,
+with looking it up in the completer's prefix indexes.
+
+Usage:
+
+    python tools/bench_completer.py [names in the namespace, default 100000]
+"""
+from __future__ import print_function
+
+import keyword
+import sys
+import time
+
+from IPython.core.completer import Completer, _latex_index
+from IPython.core.latex_symbols import latex_symbols
+from IPython.utils.py3compat import builtin_mod
+
+PREFIXES = [u'v', u'va', u'var', u'var_1', u'var_12', u'var_123']
+
+
+def scan_global_matches(completer, text):
+    """global_matches before the indexes"""
+    matches = []
+    n = len(text)
+    for lst in [keyword.kwlist,
+                builtin_mod.__dict__.keys(),
+                completer.namespace.keys(),
+                completer.global_namespace.keys()]:
+        for word in lst:
+            if word[:n] == text and word != "__builtins__":
+                matches.append(word)
+    return matches
+
+
+def timeit(label, f, n=20):
+    tic = time.time()
+    for i in range(n):
+        f()
+    t = (time.time() - tic) / n
+    print(u'%-40s %8.3f ms' % (label, t * 1000))
+    return t
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    ns = dict((u'var_%i' % i, i) for i in range(size))
+    completer = Completer(namespace=ns)
+    print(u'%i names, typing %s' % (size, u' '.join(PREFIXES)))
+
+    def scan():
+        for p in PREFIXES:
+            scan_global_matches(completer, p)
+
+    def index():
+        for p in PREFIXES:
+            completer.global_matches(p)
+
+    # the first lookup builds the index
+    completer.global_matches(u'v')
+    t0 = timeit(u'names: scan (before)', scan)
+    t1 = timeit(u'names: index (after)', index)
+    print(u'speedup: %.1fx' % (t0 / t1))
+
+    latex = [u'\\a', u'\\al', u'\\alp', u'\\alph']
+    t0 = timeit(u'latex: scan (before)', lambda : [
+        [k for k in latex_symbols if k.startswith(s)] for s in latex], n=200)
+    t1 = timeit(u'latex: index (after)', lambda : [
+        _latex_index.matches(s) for s in latex], n=200)
+    print(u'speedup: %.1fx' % (t0 / t1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Benchmark many processes writing their history to one database.
+
+Each process is a HistoryManager, like a kernel, writing its inputs in small
+batches. Compares the default journal mode with WAL, and counts the batches
+still locked out after the retries.
+
+Usage:
+
+    python tools/bench_history_writers.py [processes, default 50] [batches per process, default 20]
+"""
+from __future__ import print_function
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from IPython.core.history import HistoryManager
+
+
+def write_history(args):
+    hist_file, journal_mode, batches = args
+    hm = HistoryManager(hist_file=hist_file, journal_mode=journal_mode,
+                        db_cache_size=1000)
+    hm.save_thread.stop()
+    locked = 0
+    line = 0
+    for b in range(batches):
+        for i in range(10):
+            line += 1
+            hm.store_inputs(line, u'x = %i' % line)
+        hm.writeout_cache()
+        # inputs still in the cache were locked out
+        locked += bool(hm.db_input_cache)
+    hm.end_session()
+    hm.db.close()
+    return locked
+
+
+def bench(journal_mode, processes, batches):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        hist_file = os.path.join(tmpdir, 'history.sqlite')
+        # create the database once
+        HistoryManager(hist_file=hist_file, journal_mode=journal_mode).save_thread.stop()
+        pool = multiprocessing.Pool(processes)
+        tic = time.time()
+        locked = sum(pool.map(write_history, [(hist_file, journal_mode, batches)] * processes))
+        toc = time.time() - tic
+        pool.terminate()
+    finally:
+        shutil.rmtree(tmpdir)
+    print(u'%-10s %8.3f s  %i locked batches' % (journal_mode or u'default', toc, locked))
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    batches = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(u'%i processes writing %i batches of 10 inputs' % (processes, batches))
+    bench(u'', processes, batches)
+    bench(u'WAL', processes, batches)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""Benchmark checking the trust of a large notebook when it is opened.
+
+Compares checking the signature stored in the notebook (computed by walking
+the notebook with yield_everything) with looking up the notebook's signature
+in the signatures database (computed over its canonical JSON encoding).
+
+Usage:
+
+    python tools/bench_nbsign.py [size in MB, default 100]
+"""
+from __future__ import print_function
+
+import base64
+import os
+import sys
+import time
+
+from IPython.nbformat import current
+from IPython.nbformat.sign import NotebookNotary
+
+
+def make_notebook(mb):
+    """Make a notebook of roughly `mb` MB, with images and text outputs"""
+    png = base64.b64encode(os.urandom(192 * 1024)).decode('ascii')
+    text = u'\n'.join(u'line %i of some output' % i for i in range(2000))
+    cells = []
+    size = 0
+    i = 0
+    while size < mb * 1024 * 1024:
+        outputs = [
+            current.new_output('display_data', output_png=png),
+            current.new_output('stream', output_text=text),
+        ]
+        cells.append(current.new_code_cell(u'plot(%i)' % i, outputs=outputs))
+        size += len(png) + len(text)
+        i += 1
+    ws = current.new_worksheet(cells=cells)
+    return current.new_notebook(worksheets=[ws])
+
+
+def timeit(label, f, n=3):
+    best = min(_time(f) for i in range(n))
+    print(u'%-40s %8.3f s' % (label, best))
+    return best
+
+
+def _time(f):
+    tic = time.time()
+    f()
+    return time.time() - tic
+
+
+def main():
+    mb = float(sys.argv[1]) if len(sys.argv) > 1 else 100
+    nb = make_notebook(mb)
+    print(u'notebook with %i cells, ~%i MB' % (len(nb.worksheets[0].cells), mb))
+
+    before = NotebookNotary(secret=b'secret', db_file=':memory:', profile_dir=None)
+    # no database: only the signature stored in the notebook
+    before.db = None
+    before.sign(nb)
+    after = NotebookNotary(secret=b'secret', db_file=':memory:', profile_dir=None)
+    after.sign(nb)
+
+    t0 = timeit(u'check signature in notebook (before)', lambda : before.check_signature(nb))
+    t1 = timeit(u'check signature in database (after)', lambda : after.check_signature(nb))
+    print(u'speedup: %.1fx' % (t0 / t1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Benchmark relaying large display_data messages from a kernel to a websocket.
+
+Compares deserializing every message and serializing it again as JSON
+with relaying the JSON parts of the message without decoding its content.
+
+Usage:
+
+    python tools/bench_relay.py [size of each message in MB, default 5] [number of messages, default 50]
+"""
+from __future__ import print_function
+
+import base64
+import os
+import sys
+import time
+
+from IPython.html.base.zmqhandlers import reserialize_reply
+from IPython.kernel.zmq.session import Session
+
+
+def make_messages(session, mb, n):
+    """Make n serialized display_data messages of roughly `mb` MB each"""
+    png = base64.b64encode(os.urandom(int(mb * 1024 * 1024 * 3 / 4))).decode('ascii')
+    text = u'\n'.join(u'line %i of some output' % i for i in range(2000))
+    msg_lists = []
+    for i in range(n):
+        msg = session.msg('display_data', content={
+            'data': {'image/png': png, 'text/plain': text},
+            'metadata': {},
+        })
+        msg_lists.append(session.serialize(msg))
+    return msg_lists
+
+
+def timeit(label, f, n=3):
+    best = min(_time(f) for i in range(n))
+    print(u'%-40s %8.3f s' % (label, best))
+    return best
+
+
+def _time(f):
+    tic = time.time()
+    f()
+    return time.time() - tic
+
+
+def main():
+    mb = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    kernel_session = Session(key=b'secret')
+    msg_lists = make_messages(kernel_session, mb, n)
+    print(u'%i display_data messages of ~%g MB' % (n, mb))
+
+    def relay(relay):
+        # a new session each time, because signatures can't be checked twice
+        session = Session(key=kernel_session.key)
+        for msg_list in msg_lists:
+            reserialize_reply(session, msg_list, relay=relay)
+
+    t0 = timeit(u'deserialize and serialize (before)', lambda : relay(False))
+    t1 = timeit(u'relay (after)', lambda : relay(True))
+    print(u'speedup: %.1fx' % (t0 / t1))
+    print(u'throughput: %.0f MB/s' % (n * mb / t1))
+
+
+if __name__ == '__main__':
+    main()